@@ -0,0 +1,537 @@
+"""
+this program writes the action logs of the robot simulators through a buffer, instead of one
+write call per action, can keep them in a compact binary format, and replays a log on a start
+snapshot of the grids to get the state it leads to without running the commands again
+
+a text log is the format perform_cleaning always wrote, one performed action per line
+('' for an action that did nothing). a binary log starts with a header:
+- MAGIC (b"RLOG"), the format version (1 byte), the width of the robot number (1 byte, 0, 1, 2 or 4)
+  and the flags of the log (1 byte, TILES when the records keep the tiles every action changed)
+
+followed by one record per action:
+- one byte with the opcode of the performed action (see robot_commands), plus BUMPED when the
+  robot was told to go forward and did something else (turned at a wall, pushed a cat, ...)
+  and SLID when a forward step slipped over the next tile and landed two tiles ahead
+- the robot number in width bytes (little endian), nothing for a log of one robot
+- with TILES only: the number of changed tiles (a varint, 7 bits per byte), then for every tile
+  its position (row * columns + col, 4 bytes little endian) and its packed code (see
+  grids.PackedGrid) before and after the action (1 byte each)
+
+so a log of one robot takes one byte per action, and a few more for the tiles an action changed
+when it keeps them. a log that keeps its tiles is replayed by writing the tiles back, without
+running anything, the logger finds them by comparing the tiles an action can reach with its
+own packed copy of the grids. the other logs are replayed by running their actions again:
+BUMPED lets replay redo the forward command, which the text format cannot tell apart from a
+plain turn, so a text log cannot be replayed on a room with cats (a push would be lost)
+"""
+
+import importlib
+import json
+from array import array
+
+from checkpoints import packed_code, pack_grids
+from grids import CLEANING_MASK, CLEANING_VALUES, OBSTRUCTION_SHIFT, OBSTRUCTION_VALUES, cleaning_code, obstruction_code
+from robot_commands import (ACTION_NAMES, DELTA_COL, DELTA_ROW, DIR_INDEX, DIRECTIONS, OP_CLEAN, OP_FORWARD, OP_NOOP,
+    OP_TURN_LEFT, OP_TURN_RIGHT, OPCODES, compress_program, run_compressed)
+
+MAGIC = b"RLOG"
+VERSION = 2
+HEADER_SIZE = len(MAGIC) + 3
+# added to the opcode of an action that came from a 'forward' command but was not a forward step
+BUMPED = 0x80
+# added to the opcode of a forward step that slipped and landed two tiles ahead
+SLID = 0x40
+# the opcode of a record without its flags
+OP_MASK = 0x07
+# flag of the header: the records keep the tiles every action changed
+TILES = 0x01
+# bytes of one changed tile: its position and its code before and after the action
+CHANGE_SIZE = 6
+ROBOT_CODE = obstruction_code("r")
+CLEAN_CODE = cleaning_code(True)
+
+def id_width(robots):
+    """
+    args:
+    - robots (int): number of robots that write to the log
+
+    returns:
+    - int: bytes needed for a robot number, 0 for a single robot
+    """
+    if robots <= 1:
+        return 0
+    if robots <= 1 << 8:
+        return 1
+    if robots <= 1 << 16:
+        return 2
+    return 4
+
+class ActionLogger:
+    """
+    buffered writer of one action log file, text or binary
+    """
+
+    def __init__(self, path, binary=False, robots=1, buffer_size=8192, sim=None, vacuums=None):
+        """
+        args:
+        - path (str): log file, it is overwritten
+        - binary (bool): write the binary format instead of text lines
+        - robots (int): number of robots that write to the log, the text format keeps no robot numbers
+        - buffer_size (int): actions kept before they are written to the file
+        - sim: the simulation the logged run changes, to keep the tiles every action changed
+          (binary logs only). the logger has to be created right before the run and get every
+          action right after it is performed, so runs that log after the fact (compiled programs,
+          runs, the parallel ticks) cannot use it
+        - vacuums (list): with sim, the states of the robots that run by robot number, the same
+          lists the run updates in place, sim.vacuums (or [sim.vacuum]) if None
+        """
+        if sim is not None and not binary:
+            raise ValueError("only binary action logs can keep the tiles every action changed")
+        self.path = path
+        self.binary = binary
+        self.width = id_width(robots) if binary else 0
+        self.buffer_size = buffer_size
+        self.count = 0
+        self.sim = sim
+        self.keeps_tiles = sim is not None
+        if binary:
+            self.buffer = bytearray()
+            self.f = open(path, "wb")
+            self.f.write(MAGIC + bytes([VERSION, self.width, TILES if self.keeps_tiles else 0]))
+        else:
+            self.buffer = []
+            self.f = open(path, "w")
+        if self.keeps_tiles:
+            if vacuums is None:
+                vacuums = sim.vacuums if hasattr(sim, "vacuums") else [sim.vacuum]
+            self.vacuums = vacuums
+            self.snapshot()
+
+    def snapshot(self):
+        """
+        takes the packed tiles and the robot states the next logged actions start from, done when
+        the logger is created and again when the grids were changed outside of a logged action
+        (like the markers run_ticks puts under every robot before the first tick)
+        """
+        sim = self.sim
+        self.n_rows, self.n_cols = len(sim.cleaning_space), len(sim.cleaning_space[0])
+        self.tiles = bytearray(pack_grids(sim.cleaning_space, sim.obstruction_space))
+        # tiles holding a robot marker, a clean of a clean tile can clear all of them
+        self.markers = set()
+        for code in range(len(CLEANING_VALUES)):
+            marker = bytes([ROBOT_CODE << OBSTRUCTION_SHIFT | code])
+            tile = self.tiles.find(marker)
+            while tile != -1:
+                self.markers.add(tile)
+                tile = self.tiles.find(marker, tile + 1)
+        self.states = [list(vacuum) for vacuum in self.vacuums]
+
+    def tile_changes(self, robot, op):
+        """
+        finds the tiles the last action of a robot changed, only the tiles it can reach are compared:
+        where the robot stood, the two tiles ahead of it (the tile moved to, and where a pushed cat
+        or a slip ends up), where it stands now and the robot markers it can clear
+
+        args:
+        - robot (int): number of the robot
+        - op (int): opcode of the performed action
+
+        returns:
+        - list: (tile, code before, code after) of every changed tile, tile is row * columns + col
+        """
+        sim = self.sim
+        cleaning, obstruction = sim.cleaning_space, sim.obstruction_space
+        n_rows, n_cols = self.n_rows, self.n_cols
+        robot_row, robot_col, robot_dir = self.states[robot][0], self.states[robot][1], DIR_INDEX[self.states[robot][2]]
+        vacuum = self.vacuums[robot]
+
+        tiles = {robot_row * n_cols + robot_col, vacuum[0] * n_cols + vacuum[1]}
+        row, col = robot_row, robot_col
+        for _ in range(2):
+            row += DELTA_ROW[robot_dir]
+            col += DELTA_COL[robot_dir]
+            if 0 <= row < n_rows and 0 <= col < n_cols:
+                tiles.add(row * n_cols + col)
+        markers = sim.rules["markers"]
+        if markers == "index" or (markers == "own" and op == OP_CLEAN
+                                  and self.tiles[robot_row * n_cols + robot_col] & CLEANING_MASK == CLEAN_CODE):
+            tiles.update(self.markers)
+
+        changes = []
+        for tile in sorted(tiles):
+            code = packed_code(cleaning, obstruction, *divmod(tile, n_cols))
+            if code != self.tiles[tile]:
+                changes.append((tile, self.tiles[tile], code))
+                self.tiles[tile] = code
+                if code >> OBSTRUCTION_SHIFT == ROBOT_CODE:
+                    self.markers.add(tile)
+                else:
+                    self.markers.discard(tile)
+        return changes
+
+    def log(self, action, robot=0, command=None):
+        """
+        adds one performed action to the log, a log that keeps the changed tiles has to get it
+        right after the action was performed
+
+        args:
+        - action (str): the action the robot ended performing
+        - robot (int): number of the robot, only kept by binary logs of many robots
+        - command (str): the command the robot was given, to mark forward commands that were bumped
+        """
+        if self.binary:
+            op = OPCODES.get(action, OP_NOOP)
+            flags = BUMPED if command == "forward" and op != OP_FORWARD else 0
+            if self.keeps_tiles:
+                changes = self.tile_changes(robot, op)
+                state, vacuum = self.states[robot], self.vacuums[robot]
+                if op == OP_FORWARD and max(abs(vacuum[0] - state[0]), abs(vacuum[1] - state[1])) == 2:
+                    flags |= SLID
+                self.states[robot] = list(vacuum)
+            self.buffer.append(op | flags)
+            if self.width:
+                self.buffer += robot.to_bytes(self.width, "little")
+            if self.keeps_tiles:
+                count = len(changes)
+                while count >= 0x80:
+                    self.buffer.append(count & 0x7F | 0x80)
+                    count >>= 7
+                self.buffer.append(count)
+                for tile, before, after in changes:
+                    self.buffer += tile.to_bytes(4, "little")
+                    self.buffer.append(before)
+                    self.buffer.append(after)
+        else:
+            self.buffer.append(action + "\n")
+        self.count += 1
+        if self.count >= self.buffer_size:
+            self.flush()
+
+    def log_program(self, performed, program=None, robot=0):
+        """
+        adds the performed actions of a compiled run to the log
+
+        args:
+        - performed (iterable): opcodes of the performed actions, as returned by run_program
+        - program (iterable): the opcodes the robot was given, to mark forward commands that were bumped
+        - robot (int): number of the robot, only kept by binary logs of many robots
+        """
+        if self.keeps_tiles:
+            raise ValueError("a log that keeps the changed tiles needs every action as it is performed, not a whole run")
+        if not self.binary:
+            self.buffer += [ACTION_NAMES[op] + "\n" for op in performed]
+        else:
+            ops = bytearray(performed)
+            if program is not None:
+                for step, op in enumerate(program):
+                    if op == OP_FORWARD and ops[step] != OP_FORWARD:
+                        ops[step] |= BUMPED
+            if self.width:
+                robot_bytes = robot.to_bytes(self.width, "little")
+                ops = b"".join([bytes([op]) + robot_bytes for op in ops])
+            self.buffer += ops
+        self.count += len(performed)
+        if self.count >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """
+        writes the buffered actions to the file
+        """
+        if self.binary:
+            self.f.write(self.buffer)
+            self.buffer = bytearray()
+        else:
+            self.f.write("".join(self.buffer))
+            self.buffer = []
+        self.count = 0
+        self.f.flush()
+
+    def close(self):
+        """
+        writes what is left in the buffer and closes the file
+        """
+        if not self.f.closed:
+            self.flush()
+            self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_log(path):
+    """
+    reads a text or binary action log
+
+    args:
+    - path (str): log file
+
+    returns:
+    - dict: "ops" (bytearray, opcode of every action, with BUMPED and SLID in binary logs),
+      "robots" (array of the robot number of every action, None when the log has no robot numbers),
+      "text" (True for a text log) and "changes" (None when the log does not keep its tiles,
+      otherwise a dict of "tiles" (array), "before" and "after" (bytearrays) of every changed tile,
+      and "ends" (array), where the tiles of every action end)
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    if not data.startswith(MAGIC):
+        ops = bytearray([OPCODES.get(line.strip(), OP_NOOP) for line in data.decode().splitlines()])
+        return {"ops": ops, "robots": None, "text": True, "changes": None}
+
+    version = data[len(MAGIC)]
+    if version not in (1, VERSION):
+        raise ValueError(f"unknown action log version {version}")
+    width = data[len(MAGIC) + 1]
+    # version 1 logs have no flags, their records never keep tiles
+    flags = data[len(MAGIC) + 2] if version == VERSION else 0
+    records = memoryview(data)[HEADER_SIZE if version == VERSION else HEADER_SIZE - 1:]
+    if flags & TILES:
+        return read_tile_records(path, records, width)
+    if width == 0:
+        return {"ops": bytearray(records), "robots": None, "text": False, "changes": None}
+
+    size = width + 1
+    if len(records) % size:
+        raise ValueError(f"action log {path!r} ends in the middle of a record")
+    ops = bytearray(records[::size])
+    robots = array("L", [int.from_bytes(records[idx + 1:idx + size], "little") for idx in range(0, len(records), size)])
+    return {"ops": ops, "robots": robots, "text": False, "changes": None}
+
+def read_tile_records(path, records, width):
+    """
+    reads the records of a binary log that keeps the tiles every action changed, they have
+    different sizes so they are read one after the other
+
+    args:
+    - path (str): log file, for the error messages
+    - records (memoryview): the log after its header
+    - width (int): bytes of a robot number
+
+    returns:
+    - dict: the same as read_log
+    """
+    ops = bytearray()
+    robots = array("L") if width else None
+    changes = {"tiles": array("L"), "before": bytearray(), "after": bytearray(), "ends": array("L")}
+    pos, size = 0, len(records)
+    while pos < size:
+        ops.append(records[pos])
+        pos += 1
+        if width:
+            robots.append(int.from_bytes(records[pos:pos + width], "little"))
+            pos += width
+        count = shift = 0
+        while pos < size:
+            part = records[pos]
+            pos += 1
+            count |= (part & 0x7F) << shift
+            shift += 7
+            if not part & 0x80:
+                break
+        else:
+            raise ValueError(f"action log {path!r} ends in the middle of a record")
+        end = pos + count * CHANGE_SIZE
+        if end > size:
+            raise ValueError(f"action log {path!r} ends in the middle of a record")
+        for change in range(pos, end, CHANGE_SIZE):
+            changes["tiles"].append(int.from_bytes(records[change:change + 4], "little"))
+            changes["before"].append(records[change + 4])
+            changes["after"].append(records[change + 5])
+        changes["ends"].append(len(changes["tiles"]))
+        pos = end
+    return {"ops": ops, "robots": robots, "text": False, "changes": changes}
+
+def binary_to_text(path, logs):
+    """
+    converts a binary action log to the text format of perform_cleaning
+
+    args:
+    - path (str): binary log file
+    - logs: path of the text log for a log of one robot, or a list (or dict) of text log paths
+      by robot number for a log of many robots, only the robots in the log get a file
+    """
+    log = read_log(path)
+    if isinstance(logs, str):
+        with open(logs, "w") as fl:
+            fl.write("".join([ACTION_NAMES[op & OP_MASK] + "\n" for op in log["ops"]]))
+        return
+
+    # a log without robot numbers has a single robot, number 0
+    robots = log["robots"] if log["robots"] is not None else [0] * len(log["ops"])
+    lines = {}
+    for op, robot_no in zip(log["ops"], robots):
+        lines.setdefault(robot_no, []).append(ACTION_NAMES[op & OP_MASK] + "\n")
+    for robot_no, robot_lines in lines.items():
+        with open(logs[robot_no], "w") as fl:
+            fl.write("".join(robot_lines))
+
+def save_snapshot(path, sim, vacuums=None):
+    """
+    saves the grids and robot states of a simulation as json, to replay a log from them later
+
+    args:
+    - path (str): snapshot file, it is overwritten
+    - sim: a Simulation of robot_revolution, unexpected_obstruction, sticky_businness or scrub_a_dub_dub
+    - vacuums (list): state of every robot, sim.vacuums (or [sim.vacuum]) if None
+    """
+    if vacuums is None:
+        vacuums = sim.vacuums if hasattr(sim, "vacuums") else [sim.vacuum]
+    snapshot = {
+        "simulator": type(sim).__module__,
+        "cleaning_space": sim.cleaning_space,
+        "obstruction_space": sim.obstruction_space,
+        "vacuums": vacuums
+    }
+    with open(path, "w") as f:
+        json.dump(snapshot, f)
+
+def load_snapshot(path):
+    """
+    loads a snapshot saved by save_snapshot
+
+    args:
+    - path (str): snapshot file
+
+    returns:
+    - Simulation: a simulation of the snapshot's simulator on its grids, its robots are in
+      sim.vacuums (and sim.vacuum for the simulators of one robot)
+    """
+    with open(path, "r") as f:
+        snapshot = json.load(f)
+    module = importlib.import_module(snapshot["simulator"])
+    vacuums = snapshot["vacuums"]
+
+    if snapshot["obstruction_space"] is None:
+        sim = module.Simulation(snapshot["cleaning_space"], vacuums[0])
+    elif hasattr(module, "group_command_by_robot_no"):
+        sim = module.Simulation(snapshot["cleaning_space"], snapshot["obstruction_space"], vacuums)
+    else:
+        sim = module.Simulation(snapshot["cleaning_space"], snapshot["obstruction_space"], vacuums[0])
+    sim.vacuums = vacuums
+    return sim
+
+def replay(sim, log, vacuums=None, ticks=False, check=True):
+    """
+    replays an action log on a simulation, which ends in the state the logged run ended in
+
+    a log that keeps its tiles is replayed by writing the tiles of every action back (see
+    apply_changes), nothing is run. other logs run their actions again (see rerun_actions)
+
+    args:
+    - sim: a Simulation set up with the start grids, they are changed in place
+    - log: path of a text or binary log, or what read_log returned
+    - vacuums (list): state of every robot by robot number, updated in place,
+      sim.vacuums (or [sim.vacuum]) if None
+    - ticks (bool): the log comes from scrub_a_dub_dub's tick scheduler, which marks every robot
+      before the first tick (and puts a marker back under a robot that slipped against the edge)
+    - check (bool): raise ValueError when the log does not fit the start grids
+      (they are not the ones the log was written from)
+
+    returns:
+    - int: number of actions replayed
+    """
+    if isinstance(log, str):
+        log = read_log(log)
+    if vacuums is None:
+        vacuums = sim.vacuums if hasattr(sim, "vacuums") else [sim.vacuum]
+
+    if ticks and len(log["ops"]):
+        # the robots of the log, a log without robot numbers has robot 0
+        sim.mark_robots(sorted(set(log["robots"])) if log["robots"] is not None else [0], vacuums)
+    if log["changes"] is not None:
+        return apply_changes(sim, log, vacuums, check)
+    return rerun_actions(sim, log, vacuums, ticks, check)
+
+def apply_changes(sim, log, vacuums, check=True):
+    """
+    replays a log that keeps its tiles: the tiles every action changed are written back and the
+    robot is turned or moved as the action says, without running anything
+
+    args:
+    - sim: a Simulation set up with the start grids, they are changed in place
+    - log (dict): what read_log returned for a log that keeps its tiles
+    - vacuums (list): state of every robot by robot number, updated in place
+    - check (bool): raise ValueError when a tile does not hold what the log had before the action
+
+    returns:
+    - int: number of actions replayed
+    """
+    ops, robots, changes = log["ops"], log["robots"], log["changes"]
+    tiles, before, after, ends = changes["tiles"], changes["before"], changes["after"], changes["ends"]
+    cleaning, obstruction = sim.cleaning_space, sim.obstruction_space
+    n_cols = len(cleaning[0])
+    n_tiles = len(cleaning) * n_cols
+
+    start = 0
+    for action, op in enumerate(ops):
+        for change in range(start, ends[action]):
+            tile = tiles[change]
+            if check and (tile >= n_tiles or packed_code(cleaning, obstruction, *divmod(tile, n_cols)) != before[change]):
+                raise ValueError(f"action log does not match the start grids at action {action + 1}")
+            row, col = divmod(tile, n_cols)
+            cleaning[row][col] = CLEANING_VALUES[after[change] & CLEANING_MASK]
+            if obstruction is not None:
+                obstruction[row][col] = OBSTRUCTION_VALUES[after[change] >> OBSTRUCTION_SHIFT]
+        start = ends[action]
+
+        vacuum = vacuums[robots[action] if robots is not None else 0]
+        code = op & OP_MASK
+        if code == OP_TURN_LEFT:
+            vacuum[2] = DIRECTIONS[(DIR_INDEX[vacuum[2]] - 1) & 7]
+        elif code == OP_TURN_RIGHT:
+            vacuum[2] = DIRECTIONS[(DIR_INDEX[vacuum[2]] + 1) & 7]
+        elif code == OP_FORWARD:
+            steps = 2 if op & SLID else 1
+            vacuum[0] += steps * DELTA_ROW[DIR_INDEX[vacuum[2]]]
+            vacuum[1] += steps * DELTA_COL[DIR_INDEX[vacuum[2]]]
+
+    # the tiles were written behind the indexes of the simulation
+    sim.forget_indexes()
+    return len(ops)
+
+def rerun_actions(sim, log, vacuums, ticks=False, check=True):
+    """
+    replays a log that does not keep its tiles by running its actions again, every run of actions
+    of one robot as one compressed program (see robot_commands.run_compressed). bumped forward
+    commands of a binary log are run as forward commands
+
+    args:
+    - sim: a Simulation set up with the start grids, they are changed in place
+    - log (dict): what read_log returned
+    - vacuums (list): state of every robot by robot number, updated in place
+    - ticks (bool): the log comes from scrub_a_dub_dub's tick scheduler (see replay)
+    - check (bool): raise ValueError when the actions performed differ from the log
+
+    returns:
+    - int: number of actions replayed
+    """
+    ops, robots = log["ops"], log["robots"]
+    if log["text"] and sim.obstruction_space is not None and sim.get_occupancy()["cats"]:
+        raise ValueError("a text action log cannot be replayed on a room with cats, it does not tell "
+                         "the pushes of a cat apart from turns, write a binary log instead")
+
+    # bumped forward commands run as forward commands again
+    program = array("B", [OP_FORWARD if op & BUMPED else op & OP_MASK for op in ops])
+    expected = bytearray([op & OP_MASK for op in ops])
+
+    start = 0
+    while start < len(program):
+        robot_no = robots[start] if robots is not None else 0
+        end = start + 1
+        if not ticks:
+            while end < len(program) and (robots is None or robots[end] == robot_no):
+                end += 1
+        vacuum = vacuums[robot_no]
+        performed = run_compressed(sim, *compress_program(program[start:end]), vacuum)
+        if ticks and sim.obstruction_space[vacuum[0]][vacuum[1]] is None:
+            sim.obstruction_space[vacuum[0]][vacuum[1]] = "r"
+        if check and performed != expected[start:end]:
+            differs = next(step for step in range(len(performed)) if performed[step] != expected[start + step])
+            raise ValueError(f"action log does not match the start grids at action {start + differs + 1}")
+        start = end
+
+    return len(program)
@@ -0,0 +1,334 @@
+"""
+this program lets the robots of the obstruction aware simulators (unexpected_obstruction,
+sticky_businness and scrub_a_dub_dub) clean without a command file: every robot keeps going
+after the nearest dirty tile it can reach, cleans it, and picks the next one
+
+- the dirty tiles are kept in the simulation's dirt index (see dirt_index), which every clean
+  and every tile a robot dirties keeps up to date, so finding the nearest one takes O(log n)
+  steps and never scans the room
+- which tiles a robot can reach at all is worked out once at the start with a flood fill (see
+  route_planner), walls and cats are what split a room
+- the way to a target is found with A* over (row, column, direction) states like route_planner
+  does, on the grids as they are when the target is picked. a step off a tile the floor rules
+  make the robot slip on (water) lands where the rules say, and a step that would slip out of
+  the grid is not planned. what a step writes on the tile the robot moves onto (leaving mud
+  smears mud onto water) is kept with the state, since it decides how the robot leaves that tile.
+  when a step does not end where it should (another robot in the way, a tile that changed since
+  the plan) the robot plans again from where it is
+- a robot standing on a dirty tile cleans it first, so it never spreads dirt by moving off it
+- robots take turns one action each per tick, like scrub_a_dub_dub's tick scheduler, and a
+  target picked by one robot is left to it by the others
+
+limits:
+- reachability is an approximation: the flood fill ignores slips, so it can count a dirty tile
+  as reachable when every way there leaves water the robot would slip past it on. the plans only follow the
+  tile under the robot, not what earlier steps wrote further along the way, nor other robots
+- a robot gives up on a target after MAX_FAILURES steps towards it go wrong, or when no way is
+  found. it only gives up on it from the tile it was standing on, from anywhere else it tries
+  again, but dirt that keeps failing from everywhere is left and shows in "dirty_left"
+
+    autopilot = Autopilot(sim, vacuums)
+    result = autopilot.run(max_ticks=100000)
+"""
+
+import heapq
+
+from robot_commands import DELTA_COL, DELTA_ROW, DIR_INDEX, OP_NOOP, OPCODES
+from dirt_index import DirtIndex
+from route_planner import TURN_COST, RoutePlanner
+from tile_rules import EDGE_CODE, KEEP, N_CODES, N_TARGETS, OTHER_CODE, TILE_CODE
+
+# forward steps on the way to one target that may go wrong before the robot gives up on it
+# (the floor keeps changing under its plan, or robots keep meeting head on)
+MAX_FAILURES = 3
+
+def find_path(sim, vacuum, goal):
+    """
+    finds the cheapest way from a robot state to a tile with A*, a forward step and a turn by
+    45 degrees cost one command each (see route_planner.RoutePlanner.find_path)
+
+    walls and cats block the way, other robots only when they stand next to the robot: the ones
+    further away will have moved by the time it gets there. a step off a tile the floor rules
+    make the robot slip on lands where the rules say (two tiles ahead, or nowhere at the edge)
+
+    args:
+    - sim: the simulation, its grids are not changed
+    - vacuum (list): state of the robot [row, column, direction]
+    - goal (tuple): (row, col) of the tile to reach
+
+    returns:
+    - list: (direction index, row, col) of every forward step on the way, with the tile it ends on,
+      None when the goal cannot be reached
+    """
+    grid = sim.cleaning_space
+    obst = sim.obstruction_space
+    floor = sim.rules["floor"]
+    # a smearing floor never moves the robot more than one tile
+    slippery = floor != "smear"
+    if slippery:
+        table, needs_target, plain, tile_code = floor["table"], floor["needs_target"], floor["plain"], TILE_CODE.get
+    n_rows, n_cols = len(obst), len(obst[0])
+    start_row, start_col = vacuum[0], vacuum[1]
+    goal_row, goal_col = goal
+    goal_cell = goal_row * n_cols + goal_col
+
+    # a state is (tile << 3 | direction) << 4 | code of the tile under the robot, the step onto a
+    # tile can change it (leaving mud smears mud onto water), and that decides the next slip
+    start_code = tile_code(grid[start_row][start_col], OTHER_CODE) if slippery else 0
+    start_tile = start_row * n_cols + start_col
+    start = (start_tile << 3 | DIR_INDEX[vacuum[2]]) << 4 | start_code
+    cost = {start: 0}
+    came_from = {start: -1}
+    # cheapest known way onto every (tile, code under the robot), (cost, direction)
+    best_at = {start_tile << 4 | start_code: (0, DIR_INDEX[vacuum[2]])}
+    # ties go to the state furthest along, it is closer to the goal
+    heap = [(0, 0, start)]
+    while heap:
+        _, neg_cost, state = heapq.heappop(heap)
+        here = state >> 7
+        if here == goal_cell:
+            steps = []
+            while state != start:
+                steps.append(((state >> 4) & 7,) + divmod(state >> 7, n_cols))
+                state = came_from[state]
+            steps.reverse()
+            return steps
+        here_cost = -neg_cost
+        if here_cost > cost[state]:
+            continue
+
+        row, col = divmod(here, n_cols)
+        turn_costs = TURN_COST[(state >> 4) & 7]
+        cur_code = state & 15
+        for direction in range(8):
+            n_row, n_col = row + DELTA_ROW[direction], col + DELTA_COL[direction]
+            if not (0 <= n_row < n_rows and 0 <= n_col < n_cols):
+                continue
+            blocker = obst[n_row][n_col]
+            if blocker is not None and (blocker != "r" or here == start_tile):
+                continue
+            n_code = tile_code(grid[n_row][n_col], OTHER_CODE) if slippery else 0
+            if slippery and not plain[cur_code]:
+                # the same lookup vacuum_action does, see tile_rules
+                s_row, s_col = n_row + DELTA_ROW[direction], n_col + DELTA_COL[direction]
+                target_code = 0
+                if needs_target[cur_code]:
+                    if 0 <= s_row < n_rows and 0 <= s_col < n_cols:
+                        target_code = tile_code(grid[s_row][s_col], OTHER_CODE)
+                    else:
+                        target_code = EDGE_CODE
+                written, moved = table[(cur_code * N_CODES + n_code) * N_TARGETS + target_code]
+                if moved == 0:
+                    continue
+                if moved == 2:
+                    if obst[s_row][s_col] is not None:
+                        continue
+                    n_row, n_col = s_row, s_col
+                    n_code = tile_code(grid[n_row][n_col], OTHER_CODE)
+                elif written != KEEP:
+                    n_code = tile_code(written, OTHER_CODE)
+            ahead = n_row * n_cols + n_col
+            n_state = (ahead << 3 | direction) << 4 | n_code
+            n_cost = here_cost + 1 + turn_costs[direction]
+            if n_cost >= cost.get(n_state, n_cost + 1):
+                continue
+            best = best_at.get(ahead << 4 | n_code)
+            if best is not None:
+                # reaching the tile (with the same floor under the robot) cheaper and turning there is at least as good
+                if n_cost >= best[0] + TURN_COST[best[1]][direction]:
+                    continue
+                if n_cost < best[0]:
+                    best_at[ahead << 4 | n_code] = (n_cost, direction)
+            else:
+                best_at[ahead << 4 | n_code] = (n_cost, direction)
+            cost[n_state] = n_cost
+            came_from[n_state] = state
+            d_row, d_col = goal_row - n_row, goal_col - n_col
+            steps = max(abs(d_row), abs(d_col))
+            if steps and (d_row != DELTA_ROW[direction] * steps or d_col != DELTA_COL[direction] * steps):
+                steps += 1
+            heapq.heappush(heap, (n_cost + steps, -n_cost, n_state))
+    return None
+
+class Autopilot:
+    """
+    robots of one simulation cleaning on their own, each going after the nearest dirt it can reach
+    """
+
+    def __init__(self, sim, vacuums=None):
+        """
+        args:
+        - sim: a Simulation of unexpected_obstruction, sticky_businness or scrub_a_dub_dub
+        - vacuums (list): state of every robot, updated in place, sim.vacuums (or [sim.vacuum]) if None.
+          only scrub_a_dub_dub's robots keep their own markers, the other simulators take one robot
+        """
+        if not sim.rules["obstacles"]:
+            raise ValueError("the autonomous mode needs a simulation with an obstruction space")
+        if vacuums is None:
+            vacuums = sim.vacuums if hasattr(sim, "vacuums") else [sim.vacuum]
+        if len(vacuums) > 1 and sim.rules["markers"] != "own":
+            raise ValueError(f"the {sim.rules['name']} rules keep the marker of one robot only")
+        self.sim = sim
+        self.vacuums = vacuums
+        self.index = sim.get_dirt_index()
+
+        # tiles every robot can reach, robots in the same part of the room share one grid
+        planner = RoutePlanner(sim.cleaning_space, sim.obstruction_space)
+        self.reach = []
+        for vacuum in vacuums:
+            reach = next((known for known in self.reach if known[vacuum[0]][vacuum[1]]), None)
+            self.reach.append(reach if reach is not None else planner.reachable(vacuum[0], vacuum[1]))
+        # dirty tiles no robot can reach, left out of every nearest dirt query
+        self.excluded = DirtIndex(self.index.n_rows, self.index.n_cols, self.index.dirt_values)
+        for row, col in self.index.tiles():
+            if not any(reach[row][col] for reach in self.reach):
+                self.excluded.add(row, col)
+
+        # directions of the forward steps left to every robot's target, the next one last
+        self.paths = [[] for _ in vacuums]
+        self.targets = [None] * len(vacuums)
+        # target tile: number of the robot going after it
+        self.claimed = {}
+        # (tile the robot stood on, dirty tile) of the targets a robot gave up on from that tile,
+        # it does not try them again from there
+        self.unreachable = [set() for _ in vacuums]
+        # forward steps that went wrong on the way to the current target
+        self.failures = [0] * len(vacuums)
+        # robots that found nothing to go after wait, as (dirty tiles, targets given up) at that time,
+        # until there is more dirt or another robot gives up a target
+        self.waiting = [None] * len(vacuums)
+        self.given_up = 0
+        self.performed = [bytearray() for _ in vacuums]
+        self.ticks = 0
+
+        if hasattr(sim, "mark_robots"):
+            # robots that have not moved yet are seen by the others too
+            sim.mark_robots(range(len(vacuums)), vacuums)
+
+    def act(self, vacuum, action):
+        """
+        performs one action of a robot, scrub_a_dub_dub's robots also get their marker put back
+
+        returns:
+        - str: the action the robot ended performing
+        """
+        if hasattr(self.sim, "tick_robot"):
+            return self.sim.tick_robot(vacuum, action)
+        return self.sim.vacuum_action(vacuum, action, False)
+
+    def choose_target(self, robot):
+        """
+        picks the nearest dirty tile a robot can get to and plans the way there
+
+        args:
+        - robot (int): number of the robot
+
+        returns:
+        - bool: False when the robot has nothing left to go after
+        """
+        vacuum = self.vacuums[robot]
+        waiting = self.waiting[robot]
+        if waiting is not None and len(self.index) <= waiting[0] and self.given_up == waiting[1]:
+            return False
+        self.waiting[robot] = None
+        previous = self.targets[robot]
+        if self.claimed.get(previous) == robot:
+            del self.claimed[previous]
+            if previous in self.index:
+                self.given_up += 1
+        self.targets[robot] = None
+        self.paths[robot] = []
+        reach, unreachable, claimed = self.reach[robot], self.unreachable[robot], self.claimed
+        here = (vacuum[0], vacuum[1])
+
+        def skip(tile):
+            return not reach[tile[0]][tile[1]] or (here, tile) in unreachable or claimed.get(tile, robot) != robot
+
+        while True:
+            tile = self.index.nearest(vacuum[0], vacuum[1], skip, self.excluded)
+            if tile is None:
+                self.waiting[robot] = (len(self.index), self.given_up)
+                return False
+            path = find_path(self.sim, vacuum, tile)
+            if path is not None:
+                path.reverse()
+                self.paths[robot] = path
+                self.targets[robot] = tile
+                if tile != previous:
+                    self.failures[robot] = 0
+                claimed[tile] = robot
+                return True
+            unreachable.add((here, tile))
+
+    def step(self, robot):
+        """
+        lets one robot perform its next action: clean the tile it stands on when it is dirty,
+        otherwise turn towards or move to the next tile on the way to its target
+
+        args:
+        - robot (int): number of the robot
+
+        returns:
+        - str: the action the robot ended performing, None when it has nothing left to do
+        """
+        vacuum = self.vacuums[robot]
+        row, col = vacuum[0], vacuum[1]
+        direction = None
+        if (row, col) in self.index:
+            action = "clean"
+        else:
+            path = self.paths[robot]
+            if not path or self.targets[robot] not in self.index:
+                if not self.choose_target(robot):
+                    return None
+                path = self.paths[robot]
+            direction, land_row, land_col = path[-1]
+            turns = (direction - DIR_INDEX[vacuum[2]]) % 8
+            if turns == 0:
+                action = "forward"
+            elif turns <= 4:
+                action = "turn-right"
+            else:
+                action = "turn-left"
+
+        performed = self.act(vacuum, action)
+        self.performed[robot].append(OPCODES.get(performed, OP_NOOP))
+        if action == "forward":
+            if performed == "forward" and vacuum[0] == land_row and vacuum[1] == land_col:
+                self.paths[robot].pop()
+            else:
+                # blocked, or the floor changed since the plan, plan again from where the robot is
+                self.paths[robot].clear()
+                self.failures[robot] += 1
+                if self.failures[robot] >= MAX_FAILURES:
+                    self.unreachable[robot].add(((vacuum[0], vacuum[1]), self.targets[robot]))
+        return performed
+
+    def run(self, max_ticks=None, stop=None):
+        """
+        lets the robots take turns, one action each per tick, until none has anything left to do
+
+        args:
+        - max_ticks (int): most ticks to run, None for no limit
+        - stop: optional function stop(sim, vacuums) called after every tick, the run ends when it returns True
+
+        returns:
+        - dict: "ticks" (ticks run), "performed" (one bytearray of action opcodes per robot),
+          "dirty_left" (dirty tiles left) and "stopped" (True if stop or max_ticks ended the run)
+        """
+        stopped = False
+        while True:
+            if max_ticks is not None and self.ticks >= max_ticks:
+                stopped = True
+                break
+            active = False
+            for robot in range(len(self.vacuums)):
+                if self.step(robot) is not None:
+                    active = True
+            if not active:
+                break
+            self.ticks += 1
+            if stop is not None and stop(self.sim, self.vacuums):
+                stopped = True
+                break
+        return {"ticks": self.ticks, "performed": self.performed, "dirty_left": len(self.index), "stopped": stopped}
@@ -0,0 +1,167 @@
+"""
+this program runs many robot cleaning scenarios at once on a pool of worker processes,
+instead of starting a new interpreter for every (grid, start vacuum, command file)
+
+a manifest lists the scenarios, either as a json list or as one json object per line:
+
+    {"id": "room-1", "simulator": "unexpected_obstruction",
+     "cleaning_space": [[true, false], [true, true]],
+     "obstruction_space": [[null, "w"], [null, null]],
+     "vacuum": [1, 0, "N"], "commands": "room-1.txt"}
+
+- simulator: robot_revolution, unexpected_obstruction, sticky_businness or scrub_a_dub_dub
+- obstruction_space: left out for robot_revolution
+- vacuum: start state of the robot, scrub_a_dub_dub takes "vacuums" (one per robot) instead
+- commands: command file, relative paths are taken from the manifest's folder
+
+the workers are started once and import the simulators once, then take scenarios in chunks.
+every result (final grids, robot positions and the actions performed) is written as one json
+line to the results file. a scenario that fails gets {"id", "error"} instead, the others still run
+"""
+
+import argparse
+import importlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from robot_commands import compile_commands, decompile
+
+SIMULATORS = ("robot_revolution", "unexpected_obstruction", "sticky_businness", "scrub_a_dub_dub")
+
+def load_manifest(path):
+    """
+    reads the scenarios of a manifest file
+
+    args:
+    - path (str): manifest file, a json list or json lines
+
+    returns:
+    - list: scenario dicts, with command file paths made absolute
+    """
+    with open(path, "r") as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        scenarios = json.loads(text)
+    else:
+        scenarios = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    base = os.path.dirname(os.path.abspath(path))
+    for idx, scenario in enumerate(scenarios):
+        scenario.setdefault("id", idx)
+        if scenario.get("commands") is not None:
+            scenario["commands"] = os.path.join(base, scenario["commands"])
+    return scenarios
+
+def warm_worker():
+    """
+    runs once in every worker process, so scenarios do not pay for the imports
+    """
+    for name in SIMULATORS:
+        importlib.import_module(name)
+
+def run_scenario(scenario):
+    """
+    runs one scenario headless in the current process, a scenario that fails does not stop the batch
+
+    args:
+    - scenario (dict): one manifest entry
+
+    returns:
+    - dict: id, final grids, final robot state(s), actions performed and seconds taken,
+      or id and "error" (the exception as text) when the scenario failed
+    """
+    try:
+        return simulate_scenario(scenario)
+    except Exception as e:
+        return {"id": scenario.get("id") if isinstance(scenario, dict) else None, "error": f"{type(e).__name__}: {e}"}
+
+def simulate_scenario(scenario):
+    """
+    runs one scenario headless in the current process (see run_scenario)
+
+    args:
+    - scenario (dict): one manifest entry
+
+    returns:
+    - dict: id, final grids, final robot state(s), actions performed and seconds taken
+    """
+    name = scenario["simulator"]
+    if name not in SIMULATORS:
+        raise ValueError(f"unknown simulator {name!r}")
+    module = importlib.import_module(name)
+
+    started = time.perf_counter()
+    result = {"id": scenario["id"], "simulator": name}
+
+    if name == "robot_revolution":
+        sim = module.Simulation(scenario["cleaning_space"], list(scenario["vacuum"]))
+        performed = sim.run_program(compile_commands(scenario["commands"]), sim.vacuum)
+        result["vacuum"] = sim.vacuum
+        result["actions"] = decompile(performed)
+    elif name == "scrub_a_dub_dub":
+        vacuums = [list(vacuum) for vacuum in scenario["vacuums"]]
+        sim = module.Simulation(scenario["cleaning_space"], scenario["obstruction_space"], vacuums)
+        sim.perform_cleaning(scenario["commands"], headless=True)
+        result["vacuums"] = vacuums
+        # json object keys are strings, keep the robot numbers as a list instead
+        result["actions"] = [sim.actions.get(robot_no, []) for robot_no in range(len(vacuums))]
+    else:
+        sim = module.Simulation(scenario["cleaning_space"], scenario["obstruction_space"], list(scenario["vacuum"]))
+        performed = sim.run_program(compile_commands(scenario["commands"]), sim.vacuum)
+        result["vacuum"] = sim.vacuum
+        result["actions"] = decompile(performed)
+
+    result["seconds"] = time.perf_counter() - started
+    result["cleaning_space"] = sim.cleaning_space
+    if name != "robot_revolution":
+        result["obstruction_space"] = sim.obstruction_space
+    return result
+
+def run_batch(scenarios, results_path, workers=None, chunksize=8):
+    """
+    runs every scenario on a process pool and writes the results in manifest order
+
+    args:
+    - scenarios (list): scenario dicts, see load_manifest
+    - results_path (str): json lines file for the results, it is overwritten
+    - workers (int): number of worker processes, one per cpu if None
+    - chunksize (int): scenarios sent to a worker at a time
+
+    returns:
+    - dict: number of scenarios, of failed scenarios, seconds taken and scenarios per second
+    """
+    started = time.perf_counter()
+    count = 0
+    errors = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=warm_worker) as pool, open(results_path, "w") as out:
+        for result in pool.map(run_scenario, scenarios, chunksize=chunksize):
+            out.write(json.dumps(result) + "\n")
+            count += 1
+            if "error" in result:
+                errors += 1
+    seconds = time.perf_counter() - started
+    return {
+        "scenarios": count,
+        "errors": errors,
+        "seconds": seconds,
+        "scenarios_per_sec": count / seconds if seconds > 0 else 0.0
+    }
+
+# WARNING!!! *DO NOT* REMOVE THIS LINE
+# THIS ENSURES THAT THE CODE BELLOW ONLY RUNS WHEN YOU HIT THE GREEN `Run` BUTTON, AND NOT THE BLUE `Test` BUTTON
+if __name__ == "__main__":
+    """
+    main function to run a manifest from the command line:
+    python batch_runner.py manifest.jsonl results.jsonl [--workers N] [--chunksize N]
+    """
+    parser = argparse.ArgumentParser(description="run many robot cleaning scenarios on a process pool")
+    parser.add_argument("manifest")
+    parser.add_argument("results")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunksize", type=int, default=8)
+    args = parser.parse_args()
+
+    summary = run_batch(load_manifest(args.manifest), args.results, args.workers, args.chunksize)
+    print(f"{summary['scenarios']} scenarios in {summary['seconds']:.2f}s ({summary['scenarios_per_sec']:.1f} scenarios/sec), {summary['errors']} failed")
@@ -0,0 +1,348 @@
+"""
+this program measures how fast vacuum_action runs in the four robot simulators (robot_revolution,
+unexpected_obstruction, sticky_businness and scrub_a_dub_dub) and how that changes with the size
+of the room and the number of robots
+
+every benchmark builds a seeded random room (walls, cats and dirty tiles at the given densities)
+and a seeded random command stream, so two runs with the same settings do the same work.
+a benchmark runs the commands three times on fresh copies of the room:
+- throughput: the commands back to back, steps per second
+- latency: every step timed on its own, the percentiles of the step times
+- memory: with tracemalloc on, the peak bytes allocated for the room, the simulation and the run
+  (tracemalloc slows the run down, which is why it is kept apart from the timings)
+
+scrub_a_dub_dub's robots take turns one step each, like its tick scheduler, the other simulators
+take one robot. the results are written as json, one object per benchmark:
+
+    python benchmarks.py --sizes 100 1000 --robots 1 8 --steps 100000 --out bench.json
+    python benchmarks.py --sizes 100 1000 --robots 1 8 --baseline bench.json
+"""
+
+import argparse
+import gc
+import importlib
+import json
+import platform
+import random
+import time
+import tracemalloc
+
+from robot_commands import DIRECTIONS
+
+SIMULATORS = ("robot_revolution", "unexpected_obstruction", "sticky_businness", "scrub_a_dub_dub")
+
+# what a clean tile holds in every simulator, and the tiles a dirty one is picked from
+CLEAN_TILE = {
+    "robot_revolution": True,
+    "unexpected_obstruction": True,
+    "sticky_businness": None,
+    "scrub_a_dub_dub": None
+}
+DIRTY_TILES = {
+    "robot_revolution": (False,),
+    "unexpected_obstruction": (False,),
+    "sticky_businness": ("d", "l", "m"),
+    "scrub_a_dub_dub": ("d", "l", "m")
+}
+
+# share of every action in a random command stream, the robot mostly moves
+COMMAND_WEIGHTS = {"forward": 0.6, "turn-left": 0.125, "turn-right": 0.125, "clean": 0.15}
+
+# latency percentiles reported
+PERCENTILES = (50, 90, 99, 99.9)
+
+def random_grids(simulator, n_rows, n_cols, walls=0.1, cats=0.02, tiles=0.3, seed=None):
+    """
+    makes a random room for a simulator
+
+    args:
+    - simulator (str): name of the simulator module
+    - n_rows, n_cols (int): size of the room
+    - walls, cats (float): share of tiles holding a wall or a cat (left out for robot_revolution)
+    - tiles (float): share of dirty tiles (dirt, water or mud for sticky_businness and scrub_a_dub_dub)
+    - seed: seed of the random generator, None for a random one
+
+    returns:
+    - tuple: (cleaning_space, obstruction_space), obstruction_space is None for robot_revolution
+    """
+    rnd = random.Random(seed)
+    clean, dirty = CLEAN_TILE[simulator], DIRTY_TILES[simulator]
+    cleaning_space = [
+        [rnd.choice(dirty) if rnd.random() < tiles else clean for _ in range(n_cols)]
+        for _ in range(n_rows)
+    ]
+    if simulator == "robot_revolution":
+        return cleaning_space, None
+
+    obstruction_space = []
+    for _ in range(n_rows):
+        row = []
+        for _ in range(n_cols):
+            pick = rnd.random()
+            row.append("w" if pick < walls else "c" if pick < walls + cats else None)
+        obstruction_space.append(row)
+    return cleaning_space, obstruction_space
+
+def random_vacuums(obstruction_space, n_rows, n_cols, n, seed=None):
+    """
+    picks start states for the robots, on different tiles without an obstruction
+
+    args:
+    - obstruction_space (list): the obstruction space grid, None when the simulator has none
+    - n_rows, n_cols (int): size of the room
+    - n (int): number of robots
+    - seed: seed of the random generator, None for a random one
+
+    returns:
+    - list: n vacuum states [row, column, direction]
+    """
+    rnd = random.Random(seed)
+    if obstruction_space is None:
+        free = [(row, col) for row in range(n_rows) for col in range(n_cols)]
+    else:
+        free = [(row, col) for row in range(n_rows) for col in range(n_cols) if obstruction_space[row][col] is None]
+    if len(free) < n:
+        raise ValueError(f"the room has {len(free)} free tiles, not enough for {n} robots")
+    return [[row, col, rnd.choice(DIRECTIONS)] for row, col in rnd.sample(free, n)]
+
+def random_commands(n, seed=None, weights=None):
+    """
+    makes a random command stream
+
+    args:
+    - n (int): number of commands
+    - seed: seed of the random generator, None for a random one
+    - weights (dict): share of every action, COMMAND_WEIGHTS if None
+
+    returns:
+    - list: the commands, action names like a command file holds
+    """
+    if weights is None:
+        weights = COMMAND_WEIGHTS
+    rnd = random.Random(seed)
+    return rnd.choices(list(weights), list(weights.values()), k=n)
+
+def build_simulation(simulator, settings):
+    """
+    builds a simulation on a fresh random room, with its occupancy index built before any step is timed
+
+    args:
+    - simulator (str): name of the simulator module
+    - settings (dict): "rows", "cols", "robots", "walls", "cats", "tiles" and "seed" of the benchmark
+
+    returns:
+    - tuple: (sim, vacuums, step) where step(robot, command) performs one command of a robot
+    """
+    module = importlib.import_module(simulator)
+    n_rows, n_cols, seed = settings["rows"], settings["cols"], settings["seed"]
+    cleaning_space, obstruction_space = random_grids(
+        simulator, n_rows, n_cols, settings["walls"], settings["cats"], settings["tiles"], seed
+    )
+    vacuums = random_vacuums(obstruction_space, n_rows, n_cols, settings["robots"], seed)
+
+    if obstruction_space is None:
+        sim = module.Simulation(cleaning_space, vacuums[0])
+        vacuum = vacuums[0]
+        step = lambda robot, command: sim.vacuum_action(vacuum, command)
+    elif simulator == "scrub_a_dub_dub":
+        sim = module.Simulation(cleaning_space, obstruction_space, vacuums)
+        sim.mark_robots(range(len(vacuums)), vacuums)
+        step = lambda robot, command: sim.tick_robot(vacuums[robot], command)
+    else:
+        sim = module.Simulation(cleaning_space, obstruction_space, vacuums[0])
+        obstruction_space[vacuums[0][0]][vacuums[0][1]] = "r"
+        sim.get_occupancy()
+        vacuum = vacuums[0]
+        step = lambda robot, command: sim.vacuum_action(vacuum, command, False)
+    return sim, vacuums, step
+
+def percentile(ordered, pct):
+    """
+    args:
+    - ordered (list): sorted values
+    - pct (float): percentile, 0 to 100
+
+    returns:
+    - the value below which pct percent of the values lie (nearest rank)
+    """
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+def bench_simulator(simulator, rows, cols, robots=1, steps=100000, walls=0.1, cats=0.02, tiles=0.3, seed=0, memory=True):
+    """
+    benchmarks vacuum_action of one simulator on one random room
+
+    args:
+    - simulator (str): name of the simulator module
+    - rows, cols (int): size of the room
+    - robots (int): number of robots, only scrub_a_dub_dub takes more than one
+    - steps (int): commands performed, shared out between the robots in turns
+    - walls, cats, tiles (float): densities of the room (see random_grids)
+    - seed (int): seed of the room, the start states and the commands
+    - memory (bool): also run the commands with tracemalloc on for the peak memory
+
+    returns:
+    - dict: the settings, "steps_per_sec", "latency_ns" (percentiles, mean and max of one step)
+      and "peak_memory_bytes" (None when memory is False)
+    """
+    if robots > 1 and simulator != "scrub_a_dub_dub":
+        raise ValueError(f"{simulator} takes one robot only")
+    settings = {
+        "simulator": simulator, "rows": rows, "cols": cols, "robots": robots, "steps": steps,
+        "walls": walls, "cats": cats, "tiles": tiles, "seed": seed
+    }
+    commands = random_commands(steps, seed)
+    turns = [step % robots for step in range(steps)]
+
+    # the collector would otherwise stop the run at random points, counting against whichever step it hits
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        sim, vacuums, step = build_simulation(simulator, settings)
+        started = time.perf_counter()
+        for robot, command in zip(turns, commands):
+            step(robot, command)
+        elapsed = time.perf_counter() - started
+
+        sim, vacuums, step = build_simulation(simulator, settings)
+        timer = time.perf_counter_ns
+        latencies = [0] * steps
+        for idx, (robot, command) in enumerate(zip(turns, commands)):
+            before = timer()
+            step(robot, command)
+            latencies[idx] = timer() - before
+        del sim, vacuums, step
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    peak = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            sim, vacuums, step = build_simulation(simulator, settings)
+            for robot, command in zip(turns, commands):
+                step(robot, command)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    latencies.sort()
+    result = dict(settings)
+    result["seconds"] = elapsed
+    result["steps_per_sec"] = steps / elapsed if elapsed > 0 else None
+    result["latency_ns"] = {f"p{pct:g}": percentile(latencies, pct) for pct in PERCENTILES} if steps else {}
+    if steps:
+        result["latency_ns"]["mean"] = sum(latencies) / steps
+        result["latency_ns"]["max"] = latencies[-1]
+    result["peak_memory_bytes"] = peak
+    return result
+
+def run_suite(simulators=SIMULATORS, sizes=(100,), robot_counts=(1,), steps=100000, walls=0.1, cats=0.02, tiles=0.3, seed=0, memory=True, progress=None):
+    """
+    benchmarks every simulator on every room size, scrub_a_dub_dub also with every robot count
+
+    args:
+    - simulators (iterable): names of the simulator modules
+    - sizes (iterable): room sizes, a size N is an N x N room
+    - robot_counts (iterable): numbers of robots for scrub_a_dub_dub
+    - steps, walls, cats, tiles, seed, memory: see bench_simulator
+    - progress: optional function progress(result) called after every benchmark
+
+    returns:
+    - dict: "environment" (python version and platform) and "results" (one dict per benchmark, see bench_simulator)
+    """
+    results = []
+    for simulator in simulators:
+        for size in sizes:
+            for robots in (robot_counts if simulator == "scrub_a_dub_dub" else (1,)):
+                result = bench_simulator(simulator, size, size, robots, steps, walls, cats, tiles, seed, memory)
+                results.append(result)
+                if progress is not None:
+                    progress(result)
+    environment = {"python": platform.python_version(), "implementation": platform.python_implementation(), "platform": platform.platform()}
+    return {"environment": environment, "results": results}
+
+def benchmark_key(result):
+    """
+    returns:
+    - tuple: what tells a benchmark apart from the others of a suite
+    """
+    return (result["simulator"], result["rows"], result["cols"], result["robots"], result["steps"],
+            result["walls"], result["cats"], result["tiles"], result["seed"])
+
+def compare(baseline, current, tolerance=0.1):
+    """
+    finds the benchmarks that got slower than a baseline run of the same suite
+
+    args:
+    - baseline (dict): an earlier result of run_suite
+    - current (dict): the new result of run_suite
+    - tolerance (float): share of throughput a benchmark may lose before it counts as slower
+
+    returns:
+    - list: (result, change) for every slower benchmark, change is the share of throughput lost
+    """
+    before = {benchmark_key(result): result for result in baseline["results"]}
+    slower = []
+    for result in current["results"]:
+        old = before.get(benchmark_key(result))
+        if old is None or not old["steps_per_sec"] or not result["steps_per_sec"]:
+            continue
+        change = 1 - result["steps_per_sec"] / old["steps_per_sec"]
+        if change > tolerance:
+            slower.append((result, change))
+    return slower
+
+def describe(result):
+    """
+    returns:
+    - str: one line summary of a benchmark
+    """
+    latency = result["latency_ns"]
+    memory = f", peak {result['peak_memory_bytes'] / 1e6:.1f} MB" if result["peak_memory_bytes"] is not None else ""
+    return (f"{result['simulator']} {result['rows']}x{result['cols']} robots={result['robots']}: "
+            f"{result['steps_per_sec']:,.0f} steps/s, p50 {latency['p50']} ns, p99 {latency['p99']} ns{memory}")
+
+# WARNING!!! *DO NOT* REMOVE THIS LINE
+# THIS ENSURES THAT THE CODE BELLOW ONLY RUNS WHEN YOU HIT THE GREEN `Run` BUTTON, AND NOT THE BLUE `Test` BUTTON
+if __name__ == "__main__":
+    """
+    main function to run the benchmark suite:
+    python benchmarks.py [--simulators ...] [--sizes N ...] [--robots N ...] [--steps N] [--seed S]
+                         [--walls P] [--cats P] [--tiles P] [--no-memory] [--out FILE] [--baseline FILE]
+    """
+    parser = argparse.ArgumentParser(description="measure vacuum_action throughput, latency and memory of the robot simulators")
+    parser.add_argument("--simulators", nargs="+", choices=SIMULATORS, default=list(SIMULATORS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100], help="room sizes, N for an N x N room")
+    parser.add_argument("--robots", nargs="+", type=int, default=[1], help="robot counts for scrub_a_dub_dub")
+    parser.add_argument("--steps", type=int, default=100000)
+    parser.add_argument("--walls", type=float, default=0.1)
+    parser.add_argument("--cats", type=float, default=0.02)
+    parser.add_argument("--tiles", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("--out", default=None, help="json file for the results, printed when left out")
+    parser.add_argument("--baseline", default=None, help="json file of an earlier run to compare the throughput with")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="throughput share a benchmark may lose against the baseline")
+    args = parser.parse_args()
+
+    suite = run_suite(
+        args.simulators, args.sizes, args.robots, args.steps, args.walls, args.cats, args.tiles, args.seed,
+        not args.no_memory, progress=lambda result: print(describe(result))
+    )
+    if args.out is not None:
+        with open(args.out, "w") as f:
+            json.dump(suite, f, indent=2)
+    else:
+        print(json.dumps(suite, indent=2))
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        slower = compare(baseline, suite, args.tolerance)
+        for result, change in slower:
+            print(f"slower: {describe(result)} ({change:.0%} less throughput)")
+        if slower:
+            raise SystemExit(1)
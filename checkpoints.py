@@ -0,0 +1,247 @@
+"""
+this program records a long cleaning run so the state at any step can be looked at later
+without running it again from the start
+
+every `interval` steps a keyframe is taken, the packed tiles of grids.PackedGrid with both
+grids in one byte per tile (a grid that is already packed is copied as it is). between keyframes
+only the tiles a step changed are kept, as deltas.
+the state at step N is the nearest keyframe before it with at most interval - 1 steps of deltas
+applied, so a larger interval takes less memory and a smaller one gives faster lookups
+
+a step can only change the robot's own tile, the two tiles ahead of it (the tile moved to,
+and where a pushed cat or a slip ends up) and the tiles holding robot markers, so only those
+tiles are compared after every step
+
+    checkpoints = Checkpoints(sim, vacuum, interval=10000)
+    checkpoints.run_program(compile_commands("commands.txt"))
+    state = checkpoints.state_at(7345210)
+"""
+
+from array import array
+from bisect import bisect_right
+
+from grids import OBSTRUCTION_SHIFT, OBSTRUCTION_VALUES, GridView, PackedGrid
+from robot_commands import DELTA_COL, DELTA_ROW, DIR_INDEX, DIRECTIONS, OP_CLEAN, OP_FORWARD, compile_commands
+from tile_rules import TILE_CODE
+
+OBSTRUCTION_CODE = {value: code for code, value in enumerate(OBSTRUCTION_VALUES)}
+# obstruction codes already moved to their bits of a packed tile
+OBSTRUCTION_BITS = {value: code << OBSTRUCTION_SHIFT for value, code in OBSTRUCTION_CODE.items()}
+
+def pack_grids(cleaning_space, obstruction_space=None):
+    """
+    copies grids into the tiles of grids.PackedGrid, a grid that is already packed is copied as
+    it is and lists of lists are packed a row at a time
+
+    args:
+    - cleaning_space (list): cleaning grid
+    - obstruction_space (list): obstruction grid, or None
+
+    returns:
+    - bytes: one packed tile per tile, row by row
+    """
+    grid = cleaning_space.grid if isinstance(cleaning_space, GridView) else None
+    if isinstance(grid, PackedGrid) and (obstruction_space is None or getattr(obstruction_space, "grid", None) is grid):
+        return bytes(grid.data)
+
+    tiles = bytearray()
+    for row in cleaning_space:
+        tiles += bytes(map(TILE_CODE.__getitem__, row))
+    if obstruction_space is None:
+        return bytes(tiles)
+    marks = bytearray()
+    for row in obstruction_space:
+        marks += bytes(map(OBSTRUCTION_BITS.__getitem__, row))
+    # the two layers use different bits of a tile, so adding both as one big number never carries
+    return (int.from_bytes(tiles, "big") + int.from_bytes(marks, "big")).to_bytes(len(tiles), "big")
+
+def packed_code(cleaning_space, obstruction_space, row, col):
+    """
+    gets the packed code of one tile (see grids.PackedGrid), both grids in one byte
+
+    args:
+    - cleaning_space (list): cleaning grid
+    - obstruction_space (list): obstruction grid, or None
+    - row, col (int): position of the tile
+
+    returns:
+    - int: code of the tile
+    """
+    code = TILE_CODE[cleaning_space[row][col]]
+    if obstruction_space is not None:
+        code |= OBSTRUCTION_BITS[obstruction_space[row][col]]
+    return code
+
+class Checkpoints:
+    """
+    keyframes and per step deltas of one robot's run on a simulation
+    """
+
+    def __init__(self, sim, vacuum=None, interval=1000, keep=None):
+        """
+        args:
+        - sim: a Simulation of robot_revolution, unexpected_obstruction, sticky_businness or
+          scrub_a_dub_dub, the run changes its grids in place
+        - vacuum (list): state of the robot that runs, sim.vacuum if None
+        - interval (int): steps between keyframes
+        - keep (int): keyframes kept, older ones and their deltas are dropped
+          (their steps cannot be looked at anymore), None to keep every keyframe
+        """
+        if interval < 1:
+            raise ValueError("the keyframe interval must be at least 1")
+        self.sim = sim
+        self.vacuum = vacuum if vacuum is not None else sim.vacuum
+        self.interval = interval
+        self.keep = keep
+        self.n_rows = len(sim.cleaning_space)
+        self.n_cols = len(sim.cleaning_space[0])
+        self.step = 0
+        # one segment per keyframe: the keyframe and the deltas of the steps after it
+        self.segments = []
+        self.starts = []
+        self.keyframe()
+
+    def keyframe(self):
+        """
+        starts a new segment with the packed tiles of the current grids
+        """
+        self.segments.append({
+            "step": self.step,
+            "tiles": pack_grids(self.sim.cleaning_space, self.sim.obstruction_space),
+            "vacuum": list(self.vacuum),
+            # changed tiles (row * columns + col) and their new packed codes, ends[i] is where step i + 1 ends
+            "cells": array("L"),
+            "codes": bytearray(),
+            "ends": array("L"),
+            # robot state after every step
+            "rows": array("i"),
+            "cols": array("i"),
+            "dirs": bytearray()
+        })
+        self.starts.append(self.step)
+        if self.keep is not None and len(self.segments) > self.keep:
+            del self.segments[0]
+            del self.starts[0]
+
+    def footprint(self, op):
+        """
+        gets the tiles the next step can change
+
+        args:
+        - op (int): opcode of the step
+
+        returns:
+        - set: (row, col) of the tiles
+        """
+        sim = self.sim
+        robot_row, robot_col, robot_dir = self.vacuum[0], self.vacuum[1], DIR_INDEX[self.vacuum[2]]
+        tiles = {(robot_row, robot_col)}
+        if op == OP_FORWARD:
+            row, col = robot_row, robot_col
+            for _ in range(2):
+                row += DELTA_ROW[robot_dir]
+                col += DELTA_COL[robot_dir]
+                if 0 <= row < self.n_rows and 0 <= col < self.n_cols:
+                    tiles.add((row, col))
+
+        markers = sim.rules["markers"]
+        if markers == "index":
+            tiles.update(sim.get_occupancy()["robots"])
+        elif markers == "own" and op == OP_CLEAN and sim.cleaning_space[robot_row][robot_col] == True:
+            # cleaning a clean tile clears the markers of every robot
+            obstruction = sim.obstruction_space
+            tiles.update([(row, col) for row in range(self.n_rows) for col in range(self.n_cols) if obstruction[row][col] == "r"])
+        return tiles
+
+    def tile_code(self, row, col):
+        """
+        gets the packed code of a tile (see grids.PackedGrid), both grids in one byte
+
+        args:
+        - row, col (int): position of the tile
+
+        returns:
+        - int: code of the tile
+        """
+        return packed_code(self.sim.cleaning_space, self.sim.obstruction_space, row, col)
+
+    def run_program(self, program):
+        """
+        runs a compiled program (see robot_commands.compile_commands) on the simulation, one step
+        at a time, recording every step
+
+        args:
+        - program (array): opcodes to run
+        """
+        sim, vacuum = self.sim, self.vacuum
+        n_cols, tile_code = self.n_cols, self.tile_code
+        step_program = array("B", [0])
+
+        for op in program:
+            before = [(row, col, tile_code(row, col)) for row, col in self.footprint(op)]
+            step_program[0] = op
+            sim.run_program(step_program, vacuum)
+
+            segment = self.segments[-1]
+            for row, col, code_before in before:
+                code = tile_code(row, col)
+                if code != code_before:
+                    segment["cells"].append(row * n_cols + col)
+                    segment["codes"].append(code)
+            segment["ends"].append(len(segment["cells"]))
+            segment["rows"].append(vacuum[0])
+            segment["cols"].append(vacuum[1])
+            segment["dirs"].append(DIR_INDEX[vacuum[2]])
+
+            self.step += 1
+            if self.step % self.interval == 0:
+                self.keyframe()
+
+    def perform_cleaning(self, instructions):
+        """
+        runs a command file on the simulation, recording every step
+
+        args:
+        - instructions (str): path to a text file with commands for the robot
+        """
+        self.run_program(compile_commands(instructions))
+
+    def state_at(self, step):
+        """
+        rebuilds the state after a step from the nearest keyframe before it
+
+        args:
+        - step (int): number of steps run, 0 for the start
+
+        returns:
+        - dict: "step", "cleaning_space" and "obstruction_space" (lists of lists,
+          obstruction_space is None for robot_revolution) and "vacuum"
+        """
+        if not self.starts[0] <= step <= self.step:
+            raise IndexError(f"step {step} is not recorded, steps {self.starts[0]} to {self.step} are")
+        segment = self.segments[bisect_right(self.starts, step) - 1]
+        tiles = bytearray(segment["tiles"])
+        done = step - segment["step"]
+        vacuum = list(segment["vacuum"])
+        if done:
+            end = segment["ends"][done - 1]
+            for cell, code in zip(segment["cells"][:end], segment["codes"][:end]):
+                tiles[cell] = code
+            vacuum = [segment["rows"][done - 1], segment["cols"][done - 1], DIRECTIONS[segment["dirs"][done - 1]]]
+
+        cleaning_space, obstruction_space = PackedGrid.from_buffer(self.n_rows, self.n_cols, tiles).to_lists()
+        if self.sim.obstruction_space is None:
+            obstruction_space = None
+        return {"step": step, "cleaning_space": cleaning_space, "obstruction_space": obstruction_space, "vacuum": vacuum}
+
+    def memory(self):
+        """
+        returns:
+        - int: bytes taken by the keyframes and deltas (without the python objects around them)
+        """
+        total = 0
+        for segment in self.segments:
+            total += len(segment["tiles"]) + len(segment["codes"]) + len(segment["dirs"])
+            for name in ("cells", "ends", "rows", "cols"):
+                total += len(segment[name]) * segment[name].itemsize
+        return total
@@ -0,0 +1,166 @@
+"""
+this program keeps the dirty tiles of a room in a spatial index, so a robot can find the
+nearest one without scanning the room
+
+the index is a quadtree kept as a pyramid of counts: level 0 has one byte per tile (1 when it
+is dirty) and every level above has one count per block of 2 x 2 entries of the level below,
+up to one count for the whole room. adding or removing a dirty tile changes one count per level,
+and the nearest dirty tile is found by a best-first search down the pyramid that only opens
+blocks holding dirt, so both take O(log n) steps in a room of n tiles
+
+distances are chebyshev distances, the number of forward steps between two tiles for a robot
+moving in 8 directions
+
+    index = DirtIndex.from_grid(cleaning_space, {False})
+    index.discard(3, 4)
+    index.nearest(0, 0)
+"""
+
+import heapq
+from array import array
+
+class DirtIndex:
+    """
+    dirty tiles of one room, with nearest tile queries
+    """
+
+    def __init__(self, n_rows, n_cols, dirt_values):
+        """
+        args:
+        - n_rows, n_cols (int): size of the room, the index starts empty
+        - dirt_values (set): tile values that count as dirt (see update)
+        """
+        self.n_rows = n_rows
+        self.n_cols = n_cols
+        self.dirt_values = dirt_values
+        # grid the index was built from, see from_grid
+        self.grid = None
+        # (rows, cols, counts) of every level, level 0 first
+        self.levels = [(n_rows, n_cols, bytearray(n_rows * n_cols))]
+        while n_rows > 1 or n_cols > 1:
+            n_rows, n_cols = (n_rows + 1) // 2, (n_cols + 1) // 2
+            self.levels.append((n_rows, n_cols, array("L", [0]) * (n_rows * n_cols)))
+
+    @classmethod
+    def from_grid(cls, cleaning_space, dirt_values):
+        """
+        builds the index of a cleaning space with one scan
+
+        args:
+        - cleaning_space (list): the cleaning space grid, it is not changed
+        - dirt_values (set): tile values that count as dirt
+
+        returns:
+        - DirtIndex: index of every dirty tile of the grid
+        """
+        index = cls(len(cleaning_space), len(cleaning_space[0]), dirt_values)
+        index.grid = cleaning_space
+        tiles = index.levels[0][2]
+        n_cols = index.n_cols
+        for row, cells in enumerate(cleaning_space):
+            tiles[row * n_cols:(row + 1) * n_cols] = bytes([cell in dirt_values for cell in cells])
+
+        # every count is the sum of the (up to) 4 counts below it
+        for (rows, cols, below), (_, up_cols, counts) in zip(index.levels, index.levels[1:]):
+            for row in range(rows):
+                base = row * cols
+                up_base = (row >> 1) * up_cols
+                for col in range(cols):
+                    if below[base + col]:
+                        counts[up_base + (col >> 1)] += below[base + col]
+        return index
+
+    def __len__(self):
+        return self.levels[-1][2][0]
+
+    def __contains__(self, tile):
+        row, col = tile
+        return 0 <= row < self.n_rows and 0 <= col < self.n_cols and self.levels[0][2][row * self.n_cols + col] == 1
+
+    def change(self, row, col, delta):
+        """
+        adds delta to the counts of a tile and the blocks above it
+        """
+        for _, cols, counts in self.levels:
+            counts[row * cols + col] += delta
+            row >>= 1
+            col >>= 1
+
+    def add(self, row, col):
+        """
+        marks a tile as dirty
+        """
+        if not self.levels[0][2][row * self.n_cols + col]:
+            self.change(row, col, 1)
+
+    def discard(self, row, col):
+        """
+        marks a tile as clean
+        """
+        if self.levels[0][2][row * self.n_cols + col]:
+            self.change(row, col, -1)
+
+    def update(self, row, col, value):
+        """
+        brings a tile up to date after its value changed
+
+        args:
+        - row, col (int): position of the tile
+        - value: new value of the tile, dirty when it is one of dirt_values
+        """
+        if value in self.dirt_values:
+            self.add(row, col)
+        else:
+            self.discard(row, col)
+
+    def tiles(self):
+        """
+        returns:
+        - generator: (row, col) of every dirty tile, row by row
+        """
+        tiles = self.levels[0][2]
+        cell = tiles.find(1)
+        while cell >= 0:
+            yield divmod(cell, self.n_cols)
+            cell = tiles.find(1, cell + 1)
+
+    def nearest(self, row, col, skip=None, exclude=None):
+        """
+        finds the dirty tile closest to a position
+
+        args:
+        - row, col (int): the position
+        - skip: optional function skip((row, col)) -> bool, dirty tiles it returns True for are passed over
+        - exclude (DirtIndex): optional index of the same room holding dirty tiles to leave out,
+          unlike skip the blocks holding only such tiles are not even opened
+
+        returns:
+        - tuple: (row, col) of the nearest dirty tile, None when there is none
+        """
+        top = len(self.levels) - 1
+        if len(self) <= (len(exclude) if exclude is not None else 0):
+            return None
+        # (smallest distance from the position to the block, level, block row, block col)
+        heap = [(0, top, 0, 0)]
+        while heap:
+            _, level, block_row, block_col = heapq.heappop(heap)
+            if level == 0:
+                if skip is not None and skip((block_row, block_col)):
+                    continue
+                return block_row, block_col
+
+            rows, cols, counts = self.levels[level - 1]
+            excluded = exclude.levels[level - 1][2] if exclude is not None else None
+            size = 1 << (level - 1)
+            for child_row in (block_row * 2, block_row * 2 + 1):
+                if child_row >= rows:
+                    continue
+                first_row = child_row * size
+                d_row = max(first_row - row, row - (first_row + size - 1), 0)
+                for child_col in (block_col * 2, block_col * 2 + 1):
+                    child = child_row * cols + child_col
+                    if child_col < cols and counts[child] > (excluded[child] if excluded is not None else 0):
+                        first_col = child_col * size
+                        d_col = max(first_col - col, col - (first_col + size - 1), 0)
+                        heapq.heappush(heap, (max(d_row, d_col), level - 1, child_row, child_col))
+        return None
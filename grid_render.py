@@ -0,0 +1,170 @@
+"""
+this program draws the grids of the robot simulators for visual tracing,
+without printing the whole grid before every command
+
+symbols:
+- 'w', 'c', 'r': wall, cat and robot (anything in the obstruction space)
+- '.': clean tile (None or True)
+- 'd': dirty tile (False)
+- 'd', 'l', 'm', 's': dirt, water, mud and soap tiles
+
+a renderer can:
+- draw only every N steps
+- write only the cells that changed since the last drawing (diff mode)
+- keep the last K drawings in a ring buffer instead of writing them out
+
+diff mode relies on vacuum_action only changing cells within two steps of the robot
+(smearing, slipping and pushing a cat), so only those cells (and any cells the
+simulator reports as touched) are compared
+"""
+
+import sys
+from collections import deque
+
+def new_renderer(every=1, diff=True, ring=0, out=None):
+    """
+    creates a renderer
+
+    args:
+    - every (int): draw every N steps
+    - diff (bool): write only the cells that changed, instead of full frames
+    - ring (int): if > 0, keep that many recent drawings in memory instead of writing them
+    - out (file): where drawings are written, sys.stdout if None
+
+    returns:
+    - dict: renderer state
+    """
+    return {
+        "every": max(1, every),
+        "diff": diff,
+        "frames": deque(maxlen=ring) if ring > 0 else None,
+        "out": out,
+        "frame": None,
+        "touched": set()
+    }
+
+def cell_symbol(cell, obstruction):
+    """
+    gets the symbol of one tile
+
+    args:
+    - cell: value from the cleaning space
+    - obstruction: value from the obstruction space
+
+    returns:
+    - str: symbol of the tile
+    """
+    if obstruction is not None:
+        return obstruction
+    if cell is None or cell is True:
+        return "."
+    if cell is False:
+        return "d"
+    return cell
+
+def draw_cell(cleaning_space, obstruction_space, vacuum, row, col):
+    """
+    gets the symbol of a tile, showing the vacuum even before its marker is placed
+
+    args:
+    - cleaning_space (list): cleaning grid
+    - obstruction_space (list): obstruction grid, or None for simulators without one
+    - vacuum (list): [row, column, direction] of the robot
+    - row, col (int): tile to draw
+
+    returns:
+    - str: symbol of the tile
+    """
+    obstruction = None if obstruction_space is None else obstruction_space[row][col]
+    if obstruction is None and row == vacuum[0] and col == vacuum[1]:
+        return "r"
+    return cell_symbol(cleaning_space[row][col], obstruction)
+
+def draw_grid(cleaning_space, obstruction_space, vacuum):
+    """
+    draws the whole grid
+
+    args:
+    - cleaning_space (list): cleaning grid
+    - obstruction_space (list): obstruction grid, or None
+    - vacuum (list): [row, column, direction] of the robot
+
+    returns:
+    - list: one list of symbols per row
+    """
+    return [
+        [draw_cell(cleaning_space, obstruction_space, vacuum, row, col) for col in range(len(cleaning_space[row]))]
+        for row in range(len(cleaning_space))
+    ]
+
+def emit(renderer, drawing):
+    """
+    writes a drawing, or keeps it in the ring buffer
+
+    args:
+    - renderer (dict): renderer state
+    - drawing (str): text to write
+    """
+    if renderer["frames"] is not None:
+        renderer["frames"].append(drawing)
+    else:
+        out = renderer["out"] if renderer["out"] is not None else sys.stdout
+        out.write(drawing + "\n")
+
+def render_step(renderer, step, cleaning_space, obstruction_space, vacuum, touched=()):
+    """
+    called after every action, draws the grid when the step is due
+
+    args:
+    - renderer (dict): renderer state
+    - step (int): number of actions performed so far (0 for the initial grid)
+    - cleaning_space (list): cleaning grid
+    - obstruction_space (list): obstruction grid, or None
+    - vacuum (list): [row, column, direction] of the robot
+    - touched (iterable): other (row, col) cells the step may have changed, such as robot
+      markers that were cleared away from the robot
+    """
+    renderer["touched"].add((vacuum[0], vacuum[1]))
+    renderer["touched"].update(touched)
+    if renderer["frame"] is not None and step % renderer["every"] != 0:
+        return
+
+    if renderer["frame"] is None or not renderer["diff"]:
+        frame = draw_grid(cleaning_space, obstruction_space, vacuum)
+        renderer["frame"] = frame
+        renderer["touched"] = {(vacuum[0], vacuum[1])}
+        emit(renderer, "STEP " + str(step) + "\n" + "\n".join(["".join(row) for row in frame]))
+        return
+
+    # only tiles within two steps of where the robot has been can have changed
+    frame = renderer["frame"]
+    n_rows, n_cols = len(frame), len(frame[0])
+    checked = set()
+    changes = []
+    for robot_row, robot_col in renderer["touched"]:
+        for row in range(max(0, robot_row - 2), min(n_rows, robot_row + 3)):
+            for col in range(max(0, robot_col - 2), min(n_cols, robot_col + 3)):
+                if (row, col) in checked:
+                    continue
+                checked.add((row, col))
+                symbol = draw_cell(cleaning_space, obstruction_space, vacuum, row, col)
+                if frame[row][col] != symbol:
+                    frame[row][col] = symbol
+                    changes.append((row, col, symbol))
+    renderer["touched"] = {(vacuum[0], vacuum[1])}
+
+    if changes:
+        changes.sort()
+        emit(renderer, "STEP " + str(step) + " " + " ".join([f"{row},{col}={symbol}" for row, col, symbol in changes]))
+
+def recent_frames(renderer):
+    """
+    gets the drawings kept in the ring buffer, oldest first
+
+    args:
+    - renderer (dict): renderer state
+
+    returns:
+    - list: drawings (empty if the renderer has no ring buffer)
+    """
+    return list(renderer["frames"]) if renderer["frames"] is not None else []
@@ -0,0 +1,481 @@
+"""
+this program stores the grids of the robot simulators compactly, so very large rooms fit in memory
+
+a PackedGrid keeps one byte per tile in a bytearray:
+- bits 0-2: cleaning state, None (clean), True (clean), False (dirty), 'd' (dirt),
+  'l' (water), 'm' (mud) or 's' (soap)
+- bits 3-4: obstruction, None (empty), 'w' (wall), 'c' (cat) or 'r' (robot)
+
+a 10000 x 10000 room takes 100 MB this way, instead of several GB for two lists of lists
+
+a SparseGrid only stores the tiles that are not clean and empty, in dicts keyed by
+(row, col), and keeps the bounds as two numbers. memory grows with the number of dirty or
+blocked tiles instead of the floor area, which suits huge floors that are mostly clean
+
+the simulators index their grids as cleaning_space[row][col], so both grid types give out
+list-of-lists compatible views of their two layers:
+
+    grid = PackedGrid.from_lists(cleaning_space, obstruction_space)
+    unexpected_obstruction.cleaning_space = grid.cleaning_view()
+    unexpected_obstruction.obstruction_space = grid.obstruction_view()
+
+map_files loads packed grids from text and binary map files
+"""
+
+from collections import Counter
+
+CLEANING_VALUES = (None, True, False, "d", "l", "m", "s")
+OBSTRUCTION_VALUES = (None, "w", "c", "r")
+
+CLEANING_MASK = 0b00000111
+OBSTRUCTION_SHIFT = 3
+
+def cleaning_code(value):
+    """
+    gets the 3-bit code of a cleaning state
+
+    args:
+    - value: None, True, False, 'd', 'l', 'm' or 's'
+
+    returns:
+    - int: code of the state
+    """
+    # True == 1 and False == 0, so look the value up by identity first
+    for code, known in enumerate(CLEANING_VALUES):
+        if value is known:
+            return code
+    if value in CLEANING_VALUES[3:]:
+        return CLEANING_VALUES.index(value, 3)
+    raise ValueError(f"cannot pack cleaning state {value!r}")
+
+def obstruction_code(value):
+    """
+    gets the 2-bit code of an obstruction
+
+    args:
+    - value: None, 'w', 'c' or 'r'
+
+    returns:
+    - int: code of the obstruction
+    """
+    if value is None:
+        return 0
+    if value in OBSTRUCTION_VALUES[1:]:
+        return OBSTRUCTION_VALUES.index(value, 1)
+    raise ValueError(f"cannot pack obstruction {value!r}")
+
+class PackedGrid:
+    """
+    both layers of a simulator grid packed into one byte per tile
+    """
+
+    def __init__(self, n_rows, n_cols, clean=None):
+        """
+        creates a grid where every tile has the same cleaning state and no obstruction
+
+        args:
+        - n_rows (int): number of rows
+        - n_cols (int): number of columns
+        - clean: cleaning state of every tile (None for sticky_businness / scrub_a_dub_dub,
+          True for robot_revolution / unexpected_obstruction)
+        """
+        self.n_rows = n_rows
+        self.n_cols = n_cols
+        self.data = bytearray([cleaning_code(clean)]) * (n_rows * n_cols)
+
+    @classmethod
+    def from_lists(cls, cleaning_space, obstruction_space=None):
+        """
+        packs grids stored as lists of lists
+
+        args:
+        - cleaning_space (list): cleaning grid
+        - obstruction_space (list): obstruction grid, or None if every tile is empty
+
+        returns:
+        - PackedGrid: the packed grid
+        """
+        n_rows, n_cols = len(cleaning_space), len(cleaning_space[0])
+        grid = cls(n_rows, n_cols)
+        data = grid.data
+        pos = 0
+        for row in range(n_rows):
+            for col in range(n_cols):
+                code = cleaning_code(cleaning_space[row][col])
+                if obstruction_space is not None:
+                    code |= obstruction_code(obstruction_space[row][col]) << OBSTRUCTION_SHIFT
+                data[pos] = code
+                pos += 1
+        return grid
+
+    @classmethod
+    def from_buffer(cls, n_rows, n_cols, data):
+        """
+        wraps bytes that already hold packed tiles, without copying them
+
+        args:
+        - n_rows (int): number of rows
+        - n_cols (int): number of columns
+        - data: writable buffer of n_rows * n_cols packed tiles, row by row
+          (a bytearray, or a memoryview of a memory-mapped file)
+
+        returns:
+        - PackedGrid: the grid, it reads and writes data directly
+        """
+        if len(data) != n_rows * n_cols:
+            raise ValueError(f"expected {n_rows * n_cols} packed tiles, got {len(data)}")
+        grid = cls.__new__(cls)
+        grid.n_rows = n_rows
+        grid.n_cols = n_cols
+        grid.data = data
+        return grid
+
+    def get_cleaning(self, row, col):
+        """
+        args:
+        - row, col (int): tile position
+
+        returns:
+        - the cleaning state of the tile
+        """
+        return CLEANING_VALUES[self.data[row * self.n_cols + col] & CLEANING_MASK]
+
+    def set_cleaning(self, row, col, value):
+        """
+        args:
+        - row, col (int): tile position
+        - value: new cleaning state of the tile
+        """
+        pos = row * self.n_cols + col
+        self.data[pos] = (self.data[pos] & ~CLEANING_MASK) | cleaning_code(value)
+
+    def get_obstruction(self, row, col):
+        """
+        args:
+        - row, col (int): tile position
+
+        returns:
+        - the obstruction on the tile
+        """
+        return OBSTRUCTION_VALUES[self.data[row * self.n_cols + col] >> OBSTRUCTION_SHIFT]
+
+    def set_obstruction(self, row, col, value):
+        """
+        args:
+        - row, col (int): tile position
+        - value: new obstruction on the tile
+        """
+        pos = row * self.n_cols + col
+        self.data[pos] = (self.data[pos] & CLEANING_MASK) | (obstruction_code(value) << OBSTRUCTION_SHIFT)
+
+    def positions(self, layer, value):
+        """
+        finds every tile holding a value, scanning the bytes in C instead of tile by tile
+
+        args:
+        - layer (str): "cleaning" or "obstruction"
+        - value: the value to look for
+
+        returns:
+        - list: (row, col) of every matching tile
+        """
+        if layer == "cleaning":
+            table = bytes([code & CLEANING_MASK for code in range(256)])
+            wanted = cleaning_code(value)
+        else:
+            table = bytes([(code >> OBSTRUCTION_SHIFT) & 0b11 for code in range(256)])
+            wanted = obstruction_code(value)
+        # a memoryview (of a memory-mapped grid) has no translate, it is copied to bytes first
+        data = self.data if isinstance(self.data, bytearray) else bytes(self.data)
+        layer_bytes = data.translate(table)
+        found = []
+        pos = layer_bytes.find(wanted)
+        while pos != -1:
+            found.append(divmod(pos, self.n_cols))
+            pos = layer_bytes.find(wanted, pos + 1)
+        return found
+
+    def counts(self, layer):
+        """
+        counts the tiles holding every value, with one count over the bytes per value
+
+        args:
+        - layer (str): "cleaning" or "obstruction"
+
+        returns:
+        - Counter: number of tiles holding every value of the layer
+        """
+        if layer == "cleaning":
+            table, values = bytes([code & CLEANING_MASK for code in range(256)]), CLEANING_VALUES
+        else:
+            table, values = bytes([(code >> OBSTRUCTION_SHIFT) & 0b11 for code in range(256)]), OBSTRUCTION_VALUES
+        data = self.data if isinstance(self.data, bytearray) else bytes(self.data)
+        layer_bytes = data.translate(table)
+        counts = Counter()
+        for code, value in enumerate(values):
+            found = layer_bytes.count(code)
+            if found:
+                counts[value] = found
+        return counts
+
+    def cleaning_view(self):
+        """
+        returns:
+        - GridView: the cleaning layer, usable as cleaning_space
+        """
+        return GridView(self, "cleaning")
+
+    def obstruction_view(self):
+        """
+        returns:
+        - GridView: the obstruction layer, usable as obstruction_space
+        """
+        return GridView(self, "obstruction")
+
+    def to_lists(self):
+        """
+        unpacks the grid a row at a time, the codes of a row are split into the two layers in C
+
+        returns:
+        - tuple: (cleaning_space, obstruction_space) as lists of lists
+        """
+        cleaning_table = bytes([code & CLEANING_MASK for code in range(256)])
+        obstruction_table = bytes([(code >> OBSTRUCTION_SHIFT) & 0b11 for code in range(256)])
+        cleaning_value, obstruction_value = CLEANING_VALUES.__getitem__, OBSTRUCTION_VALUES.__getitem__
+        cleaning_space, obstruction_space = [], []
+        for row in range(self.n_rows):
+            codes = bytes(self.data[row * self.n_cols:(row + 1) * self.n_cols])
+            cleaning_space.append(list(map(cleaning_value, codes.translate(cleaning_table))))
+            obstruction_space.append(list(map(obstruction_value, codes.translate(obstruction_table))))
+        return cleaning_space, obstruction_space
+
+class SparseGrid:
+    """
+    both layers of a simulator grid, storing only the tiles that differ from a clean, empty tile
+    """
+
+    def __init__(self, n_rows, n_cols, clean=None):
+        """
+        creates a grid where every tile is clean and empty
+
+        args:
+        - n_rows (int): number of rows
+        - n_cols (int): number of columns
+        - clean: cleaning state of a clean tile (None for sticky_businness / scrub_a_dub_dub,
+          True for robot_revolution / unexpected_obstruction)
+        """
+        self.n_rows = n_rows
+        self.n_cols = n_cols
+        self.clean = clean
+        self.cleaning = {}
+        self.obstruction = {}
+
+    @classmethod
+    def from_lists(cls, cleaning_space, obstruction_space=None, clean=None):
+        """
+        converts grids stored as lists of lists
+
+        args:
+        - cleaning_space (list): cleaning grid
+        - obstruction_space (list): obstruction grid, or None if every tile is empty
+        - clean: cleaning state of a clean tile, these tiles are not stored
+
+        returns:
+        - SparseGrid: the sparse grid
+        """
+        grid = cls(len(cleaning_space), len(cleaning_space[0]), clean)
+        for row in range(grid.n_rows):
+            for col in range(grid.n_cols):
+                grid.set_cleaning(row, col, cleaning_space[row][col])
+                if obstruction_space is not None:
+                    grid.set_obstruction(row, col, obstruction_space[row][col])
+        return grid
+
+    def get_cleaning(self, row, col):
+        """
+        args:
+        - row, col (int): tile position
+
+        returns:
+        - the cleaning state of the tile
+        """
+        return self.cleaning.get((row, col), self.clean)
+
+    def set_cleaning(self, row, col, value):
+        """
+        args:
+        - row, col (int): tile position
+        - value: new cleaning state of the tile
+        """
+        if value is self.clean:
+            self.cleaning.pop((row, col), None)
+        else:
+            self.cleaning[(row, col)] = value
+
+    def get_obstruction(self, row, col):
+        """
+        args:
+        - row, col (int): tile position
+
+        returns:
+        - the obstruction on the tile
+        """
+        return self.obstruction.get((row, col))
+
+    def set_obstruction(self, row, col, value):
+        """
+        args:
+        - row, col (int): tile position
+        - value: new obstruction on the tile
+        """
+        if value is None:
+            self.obstruction.pop((row, col), None)
+        else:
+            self.obstruction[(row, col)] = value
+
+    def positions(self, layer, value):
+        """
+        finds every tile holding a value, only the stored tiles are looked at
+        (unless the value is the clean / empty default, then every tile is)
+
+        args:
+        - layer (str): "cleaning" or "obstruction"
+        - value: the value to look for
+
+        returns:
+        - list: (row, col) of every matching tile
+        """
+        cells, default = (self.cleaning, self.clean) if layer == "cleaning" else (self.obstruction, None)
+        if value is default:
+            return [(row, col) for row in range(self.n_rows) for col in range(self.n_cols) if (row, col) not in cells]
+        return sorted([pos for pos, cell in cells.items() if cell is value or (type(cell) is type(value) and cell == value)])
+
+    def counts(self, layer):
+        """
+        counts the tiles holding every value, only the stored tiles are looked at,
+        every other tile holds the clean / empty default
+
+        args:
+        - layer (str): "cleaning" or "obstruction"
+
+        returns:
+        - Counter: number of tiles holding every value of the layer
+        """
+        cells, default = (self.cleaning, self.clean) if layer == "cleaning" else (self.obstruction, None)
+        counts = Counter(cells.values())
+        if len(cells) < self.n_rows * self.n_cols:
+            counts[default] += self.n_rows * self.n_cols - len(cells)
+        return counts
+
+    def cleaning_view(self):
+        """
+        returns:
+        - GridView: the cleaning layer, usable as cleaning_space
+        """
+        return GridView(self, "cleaning")
+
+    def obstruction_view(self):
+        """
+        returns:
+        - GridView: the obstruction layer, usable as obstruction_space
+        """
+        return GridView(self, "obstruction")
+
+    def to_lists(self):
+        """
+        expands the grid, only sensible for small grids
+
+        returns:
+        - tuple: (cleaning_space, obstruction_space) as lists of lists
+        """
+        return self.cleaning_view().tolist(), self.obstruction_view().tolist()
+
+class GridView:
+    """
+    one layer of a grid that can be indexed like a list of lists, view[row][col]
+    """
+
+    def __init__(self, grid, layer):
+        self.grid = grid
+        self.layer = layer
+        self.rows = {}
+
+    def __len__(self):
+        return self.grid.n_rows
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += self.grid.n_rows
+        row_view = self.rows.get(row)
+        if row_view is None:
+            if not 0 <= row < self.grid.n_rows:
+                raise IndexError("grid row out of range")
+            row_view = RowView(self.grid, self.layer, row)
+            self.rows[row] = row_view
+        return row_view
+
+    def __iter__(self):
+        for row in range(self.grid.n_rows):
+            yield self[row]
+
+    def positions(self, value):
+        """
+        finds every tile of this layer holding a value
+
+        args:
+        - value: the value to look for
+
+        returns:
+        - list: (row, col) of every matching tile
+        """
+        return self.grid.positions(self.layer, value)
+
+    def counts(self):
+        """
+        counts the tiles of this layer holding every value, from the grid's own storage
+
+        returns:
+        - Counter: number of tiles holding every value
+        """
+        return self.grid.counts(self.layer)
+
+    def tolist(self):
+        """
+        returns:
+        - list: the layer copied into a list of lists
+        """
+        return [list(row) for row in self]
+
+class RowView:
+    """
+    one row of a GridView
+    """
+
+    def __init__(self, grid, layer, row):
+        self.grid = grid
+        self.row = row
+        if layer == "cleaning":
+            self.get, self.set = grid.get_cleaning, grid.set_cleaning
+        else:
+            self.get, self.set = grid.get_obstruction, grid.set_obstruction
+
+    def __len__(self):
+        return self.grid.n_cols
+
+    def __getitem__(self, col):
+        if col < 0:
+            col += self.grid.n_cols
+        if not 0 <= col < self.grid.n_cols:
+            raise IndexError("grid column out of range")
+        return self.get(self.row, col)
+
+    def __setitem__(self, col, value):
+        if col < 0:
+            col += self.grid.n_cols
+        if not 0 <= col < self.grid.n_cols:
+            raise IndexError("grid column out of range")
+        self.set(self.row, col, value)
+
+    def __iter__(self):
+        for col in range(self.grid.n_cols):
+            yield self.get(self.row, col)
@@ -0,0 +1,239 @@
+"""
+this program loads the grids of the robot simulators from map files, so rooms do not have to be
+written as python literals
+
+a text map has one line per row and one symbol per tile, the symbols of grid_render:
+- '.': clean tile (None or True, whichever the simulator uses, see clean below)
+- 'd': dirty tile (False when clean tiles are True, 'd' otherwise)
+- 'l', 'm', 's': water, mud and soap tiles
+- 'w', 'c', 'r': wall, cat and robot, on a clean tile
+
+a binary map starts with a header:
+- MAGIC (b"RMAP"), the format version (1 byte), the number of rows and of columns (4 bytes each, little endian)
+
+followed by the packed tiles of grids.PackedGrid, one byte per tile row by row, so loading it
+is a memory map of the file and nothing else. both loaders turn a whole map into packed tiles
+with one bytes.translate call instead of tile by tile, a 10000 x 10000 binary map loads in
+milliseconds and its pages are only read from disk when the simulation touches them
+
+    grid = load_map("room.txt", clean=True)
+    unexpected_obstruction.cleaning_space = grid.cleaning_view()
+    unexpected_obstruction.obstruction_space = grid.obstruction_view()
+
+or, from the command line, to turn a text map into a binary one:
+
+    python map_files.py room.txt room.rmap --clean true
+"""
+
+import argparse
+import mmap
+import os
+
+from grids import CLEANING_MASK, CLEANING_VALUES, OBSTRUCTION_SHIFT, OBSTRUCTION_VALUES, PackedGrid, cleaning_code, obstruction_code
+
+MAGIC = b"RMAP"
+VERSION = 1
+HEADER_SIZE = len(MAGIC) + 9
+# byte of the translate table for a symbol that is not part of the map format
+INVALID = 0xFF
+
+def symbol_table(clean=None):
+    """
+    gets the table that turns the symbols of a text map into packed tiles
+
+    args:
+    - clean: cleaning state of a clean tile, None (sticky_businness / scrub_a_dub_dub)
+      or True (robot_revolution / unexpected_obstruction)
+
+    returns:
+    - bytes: table for bytes.translate, INVALID for every byte that is not a symbol
+    """
+    clean_code = cleaning_code(clean)
+    codes = {
+        ".": clean_code,
+        "d": cleaning_code(False if clean is True else "d"),
+        "l": cleaning_code("l"),
+        "m": cleaning_code("m"),
+        "s": cleaning_code("s")
+    }
+    for value in OBSTRUCTION_VALUES[1:]:
+        codes[value] = clean_code | obstruction_code(value) << OBSTRUCTION_SHIFT
+    table = bytearray([INVALID]) * 256
+    for symbol, code in codes.items():
+        table[ord(symbol)] = code
+    return bytes(table)
+
+def tile_table():
+    """
+    gets the table that turns packed tiles into the symbols of a text map
+
+    returns:
+    - bytes: table for bytes.translate
+    """
+    table = bytearray(256)
+    for code in range(256):
+        obstruction = OBSTRUCTION_VALUES[(code >> OBSTRUCTION_SHIFT) & 0b11]
+        cell = CLEANING_VALUES[code & CLEANING_MASK] if code & CLEANING_MASK < len(CLEANING_VALUES) else None
+        if obstruction is not None:
+            symbol = obstruction
+        elif cell is None or cell is True:
+            symbol = "."
+        elif cell is False:
+            symbol = "d"
+        else:
+            symbol = cell
+        table[code] = ord(symbol)
+    return bytes(table)
+
+def parse_text_map(text, clean=None):
+    """
+    packs the rows of a text map
+
+    args:
+    - text (bytes): the map, one line per row, line breaks at the end are left out
+    - clean: cleaning state of a clean tile (see symbol_table)
+
+    returns:
+    - PackedGrid: the grid of the map
+    """
+    if b"\r" in text:
+        text = text.replace(b"\r\n", b"\n")
+    text = text.rstrip(b"\n")
+    if not text:
+        raise ValueError("the map has no rows")
+    n_cols = text.find(b"\n")
+    if n_cols == -1:
+        n_cols = len(text)
+    n_rows = (len(text) + 1) // (n_cols + 1)
+    # the rows all have n_cols tiles exactly when every line break is where a row of that width ends
+    if len(text) != n_rows * (n_cols + 1) - 1 or text[n_cols::n_cols + 1] != b"\n" * (n_rows - 1):
+        for row, line in enumerate(text.split(b"\n")):
+            if len(line) != n_cols:
+                raise ValueError(f"row {row} of the map has {len(line)} tiles, expected {n_cols}")
+
+    # the line breaks are dropped by the same pass that packs the tiles
+    data = bytearray(text.translate(symbol_table(clean), b"\n"))
+    bad = data.find(INVALID)
+    if bad != -1:
+        row, col = divmod(bad, n_cols)
+        raise ValueError(f"unknown map symbol {chr(text[row * (n_cols + 1) + col])!r} at row {row}, column {col}")
+    return PackedGrid.from_buffer(n_rows, n_cols, data)
+
+def load_text_map(path, clean=None):
+    """
+    loads a text map
+
+    args:
+    - path (str): map file
+    - clean: cleaning state of a clean tile (see symbol_table)
+
+    returns:
+    - PackedGrid: the grid of the map
+    """
+    with open(path, "rb") as f:
+        return parse_text_map(f.read(), clean)
+
+def save_text_map(path, grid):
+    """
+    saves a grid as a text map, clean tiles are written as '.' and dirty ones as 'd'
+    whichever values they hold
+
+    args:
+    - path (str): map file, it is overwritten
+    - grid (PackedGrid): the grid
+    """
+    symbols = bytes(grid.data).translate(tile_table())
+    n_cols = grid.n_cols
+    with open(path, "wb") as f:
+        f.write(b"\n".join([symbols[row * n_cols:(row + 1) * n_cols] for row in range(grid.n_rows)]) + b"\n")
+
+def save_binary_map(path, grid):
+    """
+    saves a grid as a binary map
+
+    args:
+    - path (str): map file, it is overwritten
+    - grid (PackedGrid): the grid
+    """
+    with open(path, "wb") as f:
+        f.write(MAGIC + bytes([VERSION]) + grid.n_rows.to_bytes(4, "little") + grid.n_cols.to_bytes(4, "little"))
+        f.write(grid.data)
+
+def load_binary_map(path, writable=False):
+    """
+    memory-maps a binary map, the tiles are not read until they are used
+
+    args:
+    - path (str): map file
+    - writable (bool): write the changes the simulation makes back to the file,
+      by default they stay in memory and the file is left as it was
+
+    returns:
+    - PackedGrid: the grid of the map, backed by the mapped file
+    """
+    with open(path, "r+b" if writable else "rb") as f:
+        if os.fstat(f.fileno()).st_size < HEADER_SIZE:
+            raise ValueError(f"map {path!r} is too short for a binary map")
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_COPY)
+
+    header = mapped[:HEADER_SIZE]
+    if not header.startswith(MAGIC):
+        raise ValueError(f"map {path!r} is not a binary map")
+    if header[len(MAGIC)] != VERSION:
+        raise ValueError(f"unknown map version {header[len(MAGIC)]}")
+    n_rows = int.from_bytes(header[len(MAGIC) + 1:len(MAGIC) + 5], "little")
+    n_cols = int.from_bytes(header[len(MAGIC) + 5:HEADER_SIZE], "little")
+    if len(mapped) != HEADER_SIZE + n_rows * n_cols:
+        raise ValueError(f"map {path!r} should hold {n_rows} x {n_cols} tiles")
+    return PackedGrid.from_buffer(n_rows, n_cols, memoryview(mapped)[HEADER_SIZE:])
+
+def load_map(path, clean=None, writable=False):
+    """
+    loads a text or binary map, the format is told by the start of the file
+
+    args:
+    - path (str): map file
+    - clean: cleaning state of a clean tile, for text maps (see symbol_table)
+    - writable (bool): for binary maps, write the changes back to the file (see load_binary_map)
+
+    returns:
+    - PackedGrid: the grid of the map
+    """
+    with open(path, "rb") as f:
+        start = f.read(len(MAGIC))
+    if start == MAGIC:
+        return load_binary_map(path, writable)
+    return load_text_map(path, clean)
+
+def load_lists(path, clean=None):
+    """
+    loads a map into the lists of lists the simulators start with, only sensible for rooms that fit
+    in memory that way
+
+    args:
+    - path (str): map file, text or binary
+    - clean: cleaning state of a clean tile, for text maps (see symbol_table)
+
+    returns:
+    - tuple: (cleaning_space, obstruction_space) as lists of lists
+    """
+    return load_map(path, clean).to_lists()
+
+def main():
+    parser = argparse.ArgumentParser(description="converts robot simulator maps between the text and binary formats")
+    parser.add_argument("source", help="map to convert, text or binary")
+    parser.add_argument("target", help="map file to write, the other format")
+    parser.add_argument("--clean", choices=("none", "true"), default="none",
+                        help="what a clean text tile holds, none (sticky_businness / scrub_a_dub_dub) "
+                             "or true (robot_revolution / unexpected_obstruction)")
+    args = parser.parse_args()
+
+    with open(args.source, "rb") as f:
+        binary = f.read(len(MAGIC)) == MAGIC
+    if binary:
+        save_text_map(args.target, load_binary_map(args.source))
+    else:
+        save_binary_map(args.target, load_text_map(args.source, True if args.clean == "true" else None))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""
+this program runs one command stream for many robots at once, to compare cleaning strategies
+from thousands of start positions and directions without a perform_cleaning call per robot
+
+the robots follow the rules of unexpected_obstruction (turning, moving forward, cleaning,
+turning right at the edge or a wall, pushing cats) and run in lockstep: every command is applied
+to all robots before the next one is read. each robot works on its own copy of the room, the
+copies are kept as one flat bytearray per layer with one byte per tile (the codes of grids.py),
+so a thousand robots in a 10 x 10 room take 100 KB per layer
+
+- turn commands turn every robot by the same amount, so they only change one shared offset
+  added to every robot's own direction
+- the obstruction layer is only copied for every robot when it can differ between them (a cat
+  that gets pushed, or a robot that starts on a wall), otherwise all robots share one layer
+  and only their markers are added at the end
+
+the results match running unexpected_obstruction.Simulation.run_program once for every robot
+"""
+
+import argparse
+import copy
+import random
+from array import array
+
+from grids import CLEANING_VALUES, OBSTRUCTION_VALUES, cleaning_code, obstruction_code
+from robot_commands import DELTA_COL, DELTA_ROW, DIR_INDEX, DIRECTIONS, OP_CLEAN, OP_FORWARD, OP_TURN_LEFT, OP_TURN_RIGHT, compile_commands
+
+# tile codes the rules look at (see grids.CLEANING_VALUES and grids.OBSTRUCTION_VALUES)
+CLEAN = cleaning_code(True)
+DIRTY = cleaning_code(False)
+EMPTY = obstruction_code(None)
+WALL = obstruction_code("w")
+CAT = obstruction_code("c")
+ROBOT = obstruction_code("r")
+
+class BatchSimulation:
+    """
+    many robots running the same commands in lockstep, each in its own copy of the room
+    """
+
+    def __init__(self, cleaning_space, obstruction_space, vacuums):
+        """
+        args:
+        - cleaning_space (list): grid of True (clean) and False (dirty), it is copied and not changed
+        - obstruction_space (list): grid of None, 'w', 'c' and 'r', it is copied and not changed
+        - vacuums (list): start state [row, column, direction] of every robot
+        """
+        self.n_rows = len(cleaning_space)
+        self.n_cols = len(cleaning_space[0])
+        self.cells = self.n_rows * self.n_cols
+        self.n_robots = len(vacuums)
+
+        cleaning = bytes([cleaning_code(cell) for row in cleaning_space for cell in row])
+        obstruction = bytearray([obstruction_code(cell) for row in obstruction_space for cell in row])
+        self.cleaning = bytearray(cleaning * self.n_robots)
+
+        self.rows = array("i", [vacuum[0] for vacuum in vacuums])
+        self.cols = array("i", [vacuum[1] for vacuum in vacuums])
+        # a robot's direction is its own dirs entry plus the shared turn offset (mod 8)
+        self.dirs = array("B", [DIR_INDEX[vacuum[2]] for vacuum in vacuums])
+        self.turn_offset = 0
+
+        # robot markers found in the room, the first action of every robot removes them
+        self.stray_markers = [cell for cell in range(self.cells) if obstruction[cell] == ROBOT]
+        # a cat that gets pushed, or a robot that starts on a wall (its first marker replaces it),
+        # makes the rooms of the robots differ, otherwise they share one obstruction layer
+        self.shared = CAT not in obstruction and all(
+            obstruction[row * self.n_cols + col] in (EMPTY, ROBOT) for row, col in zip(self.rows, self.cols)
+        )
+        if self.shared:
+            self.obstruction = obstruction
+        else:
+            self.obstruction = obstruction * self.n_robots
+        # set once every robot has performed its first action and placed its marker
+        self.marked = False
+
+        # per robot counters: steps moved, forward commands turned into a right turn
+        # (edge, wall or cat) and forward commands that did nothing (another robot ahead)
+        self.moves = array("L", [0]) * self.n_robots
+        self.bumps = array("L", [0]) * self.n_robots
+        self.idle = array("L", [0]) * self.n_robots
+
+    def mark_robots(self):
+        """
+        does what the first action of a robot does to the obstruction space: removes the robot
+        markers that were in the room and puts the robot's own marker down
+        """
+        if self.shared:
+            # the robots' own markers are only added when the rooms are read back
+            for cell in self.stray_markers:
+                self.obstruction[cell] = EMPTY
+        else:
+            obstruction = self.obstruction
+            for robot in range(self.n_robots):
+                base = robot * self.cells
+                for cell in self.stray_markers:
+                    if obstruction[base + cell] == ROBOT:
+                        obstruction[base + cell] = EMPTY
+                obstruction[base + self.rows[robot] * self.n_cols + self.cols[robot]] = ROBOT
+        self.marked = True
+
+    def forward(self):
+        """
+        moves every robot one step forward, or turns it right when blocked
+        """
+        rows, cols, dirs = self.rows, self.cols, self.dirs
+        cleaning, obstruction = self.cleaning, self.obstruction
+        n_rows, n_cols, cells = self.n_rows, self.n_cols, self.cells
+        offset, shared, marked = self.turn_offset, self.shared, self.marked
+        moves, bumps, idle = self.moves, self.bumps, self.idle
+
+        for robot in range(self.n_robots):
+            robot_dir = (dirs[robot] + offset) & 7
+            robot_row, robot_col = rows[robot], cols[robot]
+            n_row = robot_row + DELTA_ROW[robot_dir]
+            n_col = robot_col + DELTA_COL[robot_dir]
+            if not (0 <= n_row < n_rows and 0 <= n_col < n_cols):
+                dirs[robot] = (dirs[robot] + 1) & 7
+                bumps[robot] += 1
+                continue
+
+            base = robot * cells
+            here = robot_row * n_cols + robot_col
+            ahead = n_row * n_cols + n_col
+            blocker = obstruction[ahead] if shared else obstruction[base + ahead]
+            if blocker == EMPTY:
+                if cleaning[base + here] == DIRTY:
+                    cleaning[base + ahead] = DIRTY
+                if marked and not shared:
+                    obstruction[base + here] = EMPTY
+                    obstruction[base + ahead] = ROBOT
+                rows[robot], cols[robot] = n_row, n_col
+                moves[robot] += 1
+            elif blocker == CAT:
+                cat_row = n_row + DELTA_ROW[robot_dir]
+                cat_col = n_col + DELTA_COL[robot_dir]
+                if 0 <= cat_row < n_rows and 0 <= cat_col < n_cols and obstruction[base + cat_row * n_cols + cat_col] == EMPTY:
+                    obstruction[base + ahead] = EMPTY
+                    obstruction[base + cat_row * n_cols + cat_col] = CAT
+                dirs[robot] = (dirs[robot] + 1) & 7
+                bumps[robot] += 1
+            elif blocker == WALL:
+                dirs[robot] = (dirs[robot] + 1) & 7
+                bumps[robot] += 1
+            else:
+                idle[robot] += 1
+
+    def clean(self):
+        """
+        every robot cleans the tile it stands on
+        """
+        cleaning, n_cols, cells = self.cleaning, self.n_cols, self.cells
+        for robot, (robot_row, robot_col) in enumerate(zip(self.rows, self.cols)):
+            cleaning[robot * cells + robot_row * n_cols + robot_col] = CLEAN
+
+    def run_program(self, program):
+        """
+        runs a compiled program (see robot_commands.compile_commands) on all robots
+
+        args:
+        - program (array): opcodes to run
+        """
+        for op in program:
+            if op == OP_FORWARD:
+                self.forward()
+            elif op == OP_TURN_RIGHT:
+                self.turn_offset = (self.turn_offset + 1) & 7
+            elif op == OP_TURN_LEFT:
+                self.turn_offset = (self.turn_offset - 1) & 7
+            elif op == OP_CLEAN:
+                self.clean()
+            if not self.marked:
+                self.mark_robots()
+
+    def perform_cleaning(self, instructions):
+        """
+        runs a command file on all robots
+
+        args:
+        - instructions (str): path to a text file with commands for the robots
+        """
+        self.run_program(compile_commands(instructions))
+
+    def vacuum(self, robot):
+        """
+        args:
+        - robot (int): number of the robot
+
+        returns:
+        - list: state of the robot as [row, column, direction]
+        """
+        return [self.rows[robot], self.cols[robot], DIRECTIONS[(self.dirs[robot] + self.turn_offset) & 7]]
+
+    def grids(self, robot):
+        """
+        gets the room as one robot left it
+
+        args:
+        - robot (int): number of the robot
+
+        returns:
+        - tuple: (cleaning_space, obstruction_space) as lists of lists
+        """
+        base = robot * self.cells
+        cleaning = [CLEANING_VALUES[code] for code in self.cleaning[base:base + self.cells]]
+        if self.shared:
+            obstruction = [OBSTRUCTION_VALUES[code] for code in self.obstruction]
+            if self.marked:
+                obstruction[self.rows[robot] * self.n_cols + self.cols[robot]] = "r"
+        else:
+            obstruction = [OBSTRUCTION_VALUES[code] for code in self.obstruction[base:base + self.cells]]
+        return (
+            [cleaning[row * self.n_cols:(row + 1) * self.n_cols] for row in range(self.n_rows)],
+            [obstruction[row * self.n_cols:(row + 1) * self.n_cols] for row in range(self.n_rows)]
+        )
+
+    def outcomes(self):
+        """
+        gets how every robot did
+
+        returns:
+        - list: one dict per robot with its final "vacuum" state, the steps it moved ("moves"),
+          forward commands turned into a right turn ("bumps"), forward commands that did nothing
+          ("idle") and the dirty tiles left in its room ("dirty")
+        """
+        return [
+            {
+                "vacuum": self.vacuum(robot),
+                "moves": self.moves[robot],
+                "bumps": self.bumps[robot],
+                "idle": self.idle[robot],
+                "dirty": self.cleaning.count(DIRTY, robot * self.cells, (robot + 1) * self.cells)
+            }
+            for robot in range(self.n_robots)
+        ]
+
+def random_vacuums(obstruction_space, n, seed=None):
+    """
+    picks random start states on tiles without an obstruction
+
+    args:
+    - obstruction_space (list): the obstruction space grid
+    - n (int): number of robots
+    - seed: seed of the random generator, None for a random one
+
+    returns:
+    - list: n vacuum states [row, column, direction]
+    """
+    rnd = random.Random(seed)
+    free = [(i, j) for i, row in enumerate(obstruction_space) for j, cell in enumerate(row) if cell is None]
+    if not free:
+        raise ValueError("the room has no free tile to start from")
+    return [list(rnd.choice(free)) + [rnd.choice(DIRECTIONS)] for _ in range(n)]
+
+def run_monte_carlo(cleaning_space, obstruction_space, instructions, n, seed=None):
+    """
+    runs a command file from n random start states
+
+    args:
+    - cleaning_space (list): the cleaning space grid, it is not changed
+    - obstruction_space (list): the obstruction space grid, it is not changed
+    - instructions (str): path to a text file with commands for the robots
+    - n (int): number of robots
+    - seed: seed of the random generator, None for a random one
+
+    returns:
+    - list: outcome of every robot (see BatchSimulation.outcomes), with its "start" state
+    """
+    vacuums = random_vacuums(obstruction_space, n, seed)
+    batch = BatchSimulation(cleaning_space, obstruction_space, vacuums)
+    batch.perform_cleaning(instructions)
+    outcomes = batch.outcomes()
+    for outcome, vacuum in zip(outcomes, vacuums):
+        outcome["start"] = vacuum
+    return outcomes
+
+# WARNING!!! *DO NOT* REMOVE THIS LINE
+# THIS ENSURES THAT THE CODE BELLOW ONLY RUNS WHEN YOU HIT THE GREEN `Run` BUTTON, AND NOT THE BLUE `Test` BUTTON
+if __name__ == "__main__":
+    """
+    main function to run a command file from random starts in the room of unexpected_obstruction:
+    python monte_carlo.py commands.txt [--robots N] [--seed S]
+    """
+    import unexpected_obstruction
+
+    parser = argparse.ArgumentParser(description="run one command file for many robots from random start states")
+    parser.add_argument("commands")
+    parser.add_argument("--robots", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    outcomes = run_monte_carlo(
+        copy.deepcopy(unexpected_obstruction.cleaning_space),
+        copy.deepcopy(unexpected_obstruction.obstruction_space),
+        args.commands, args.robots, args.seed
+    )
+    dirty = sorted(outcome["dirty"] for outcome in outcomes)
+    print(f"{len(outcomes)} robots, dirty tiles left: best {dirty[0]}, median {dirty[len(dirty) // 2]}, worst {dirty[-1]}")
+    best = min(outcomes, key=lambda outcome: (outcome["dirty"], -outcome["moves"]))
+    print(f"best start {best['start']}: {best['dirty']} dirty, {best['moves']} moves, {best['bumps']} bumps")
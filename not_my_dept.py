@@ -4,6 +4,11 @@ program allows 'patches' to be applied to the base price list, so each departmen
 this program also validates sales records and generates structured reports, identifying both valid and incorrect entries.
 """
 
+import hashlib
+import math
+import time
+import tracemalloc
+
 def is_valid_sale(price: dict[str,float], item_type: str, item_quantity: int, sale_total: float) -> bool:
   """
   checks if a sale is valid, a valid sale is considered if:
@@ -60,31 +65,140 @@ def flag_valid_sales(sales: list, invalid_sales: list) -> list:
   """
   return [item for item in sales if item not in invalid_sales]
 
-def generate_sales_report(price: dict[str,float], sales: list) -> dict[str,tuple]:
+def sale_fingerprint(sale: list) -> int:
   """
-  create a sales report for each item using valid and invalid sales data
-  for each item, the report includes:
-  - number of units sold
-  - valid sales amount
-  - average revenue per valid sale
-  - invalid sales amount
+  builds a stable fingerprint for a sale row, a retried copy of the same row
+  always gets the same fingerprint (also between runs, unlike hash())
+
+  args:
+  - sale (list): a sale record [item_name, quantity, total]
+
+  returns:
+  - int: 64-bit fingerprint of the row
+  """
+  item_type, item_quantity, sale_total = sale
+  row = f"{item_type}\x1f{item_quantity!r}\x1f{sale_total!r}".encode()
+  return int.from_bytes(hashlib.blake2b(row, digest_size=8).digest(), "big")
+
+def new_sale_dedup(limit: int = 100000, bloom_capacity: int = 0, error_rate: float = 0.001) -> dict:
+  """
+  creates the state for the optional duplicate sale check
+  by default the last `limit` fingerprints are kept in an exact set (till retries
+  arrive close together, so older rows are forgotten first)
+  for very large inputs a bloom filter sized for `bloom_capacity` rows can be used
+  instead, it never forgets a row but can drop a unique one with probability `error_rate`
+
+  args:
+  - limit (int): how many fingerprints the exact set keeps
+  - bloom_capacity (int): expected number of rows, 0 keeps the exact set
+  - error_rate (float): false positive rate of the bloom filter
+
+  returns:
+  - dict: dedup state, "dropped" counts the duplicates dropped per item
+  """
+  dedup = {"mode": "exact", "seen": {}, "limit": limit, "dropped": {}}
+  if bloom_capacity > 0:
+    n_bits = max(8, int(-bloom_capacity * math.log(error_rate) / (math.log(2) ** 2)))
+    dedup["mode"] = "bloom"
+    dedup["bits"] = bytearray((n_bits + 7) // 8)
+    dedup["n_bits"] = n_bits
+    dedup["n_hashes"] = max(1, round(n_bits / bloom_capacity * math.log(2)))
+  return dedup
+
+def is_duplicate_sale(dedup: dict, sale: list) -> bool:
+  """
+  checks a sale against the rows seen so far and remembers it,
+  duplicates are counted per item in dedup["dropped"]
+
+  args:
+  - dedup (dict): state from new_sale_dedup
+  - sale (list): a sale record [item_name, quantity, total]
+
+  returns:
+  - bool: True if the same row was already seen
+  """
+  fingerprint = sale_fingerprint(sale)
+  if dedup["mode"] == "bloom":
+    bits, n_bits = dedup["bits"], dedup["n_bits"]
+    # double hashing, both halves of the fingerprint give the k bit positions
+    h1, h2 = fingerprint & 0xFFFFFFFF, (fingerprint >> 32) | 1
+    seen = True
+    for i in range(dedup["n_hashes"]):
+      pos = (h1 + i * h2) % n_bits
+      if not bits[pos >> 3] & (1 << (pos & 7)):
+        seen = False
+        bits[pos >> 3] |= 1 << (pos & 7)
+  else:
+    seen_rows = dedup["seen"]
+    seen = fingerprint in seen_rows
+    if not seen:
+      seen_rows[fingerprint] = None
+      if len(seen_rows) > dedup["limit"]:
+        # dicts keep insertion order, so the first key is the oldest row
+        del seen_rows[next(iter(seen_rows))]
+
+  if seen:
+    dropped = dedup["dropped"]
+    dropped[sale[0]] = dropped.get(sale[0], 0) + 1
+  return seen
+
+def fix_price(price: dict) -> dict[str,float]:
+  """
+  converts every price in the catalog to a float
 
   args:
   - price (dict): a dictionary with item names and prices
-  - sales (list): a list of all sales records
 
   returns:
-  - dict: a dictionary where each key is an item name and its values are a summary of its sales
+  - dict: a copy of the catalog with float prices
   """
-  sale_report = {}
-  fix_price = {k: float(v) for k, v in price.items()}
-  price = fix_price
+  return {k: float(v) for k, v in price.items()}
+
+def split_sales(price: dict[str,float], sales: list, dedup: dict = None) -> tuple[list,list]:
+  """
+  sorts the sales into valid and invalid ones in a single pass,
+  gives the same result as flag_invalid_sales followed by flag_valid_sales
+  if a dedup state is given, repeated copies of a row are dropped in the same pass
 
-  invalid_sales = flag_invalid_sales(price, sales)
-  valid_sales = flag_valid_sales(sales, invalid_sales)
+  args:
+  - price (dict): a dictionary with the name and price of the item
+  - sales (list): a list of sales, where each sale is [item_name, quantity, total]
+  - dedup (dict): optional state from new_sale_dedup
+
+  returns:
+  - tuple: (valid sales, invalid sales)
+  """
+  valid_sales = []
+  invalid_sales = []
+  for sale in sales:
+    if dedup is not None and is_duplicate_sale(dedup, sale):
+      continue
+    item_type, item_quantity, sale_total = sale
+    if item_quantity == 0 and item_type in price:
+      valid_sales.append(sale)
+    elif is_valid_sale(price, item_type, item_quantity, sale_total):
+      valid_sales.append(sale)
+    else:
+      invalid_sales.append(sale)
+  return valid_sales, invalid_sales
+
+def summarise_sales(price: dict[str,float], valid_sales: list, invalid_sales: list) -> dict[str,tuple]:
+  """
+  builds the per item report from sales that are already split into valid and invalid
+
+  args:
+  - price (dict): a dictionary with item names and prices
+  - valid_sales (list): sales that passed the check
+  - invalid_sales (list): sales that failed the check
+
+  returns:
+  - dict: item name -> (units sold, sales amount, average revenue per valid sale, invalid sales amount)
+  """
+  sale_report = {}
 
   all_keys = set(price.keys())
-  all_keys.update([item[0] for item in sales])
+  all_keys.update([item[0] for item in valid_sales])
+  all_keys.update([item[0] for item in invalid_sales])
 
   for key in all_keys:
     sale_report[key] = (0, 0, 0.0, 0)
@@ -109,6 +223,340 @@ def generate_sales_report(price: dict[str,float], sales: list) -> dict[str,tuple
 
   return sale_report
 
+def new_report_metrics(callback=None, trace_memory: bool = False) -> dict:
+  """
+  creates a metrics object for timing the phases of report generation,
+  pass it as `metrics` to generate_sales_report / generate_sales_reports
+  phases are "fix_price", "validate" (the single pass that replaces flag_invalid_sales
+  and flag_valid_sales), "aggregate" and, for departments, "patch"
+
+  args:
+  - callback (function): optional, called as callback(phase, seconds, rows, peak_bytes) after every phase
+  - trace_memory (bool): also record peak allocations per phase with tracemalloc,
+    this slows everything down while it is on
+
+  returns:
+  - dict: metrics, "phases" maps a phase name to its totals and "invalid" counts invalid sales
+  """
+  return {"phases": {}, "invalid": 0, "callback": callback, "trace_memory": trace_memory, "own_trace": False, "trace_base": 0}
+
+def start_phase(metrics: dict) -> float:
+  """
+  marks the start of a phase
+
+  args:
+  - metrics (dict): metrics from new_report_metrics
+
+  returns:
+  - float: start time to pass to end_phase
+  """
+  if metrics["trace_memory"]:
+    if not tracemalloc.is_tracing():
+      tracemalloc.start()
+      metrics["own_trace"] = True
+    tracemalloc.reset_peak()
+    metrics["trace_base"] = tracemalloc.get_traced_memory()[0]
+  return time.perf_counter()
+
+def end_phase(metrics: dict, phase: str, started: float, rows: int):
+  """
+  adds the time, rows and peak allocations of a finished phase to the metrics
+
+  args:
+  - metrics (dict): metrics from new_report_metrics
+  - phase (str): phase name
+  - started (float): value returned by start_phase
+  - rows (int): rows handled in the phase
+  """
+  seconds = time.perf_counter() - started
+  peak_bytes = 0
+  if metrics["trace_memory"]:
+    peak_bytes = tracemalloc.get_traced_memory()[1] - metrics["trace_base"]
+
+  totals = metrics["phases"].setdefault(phase, {"calls": 0, "seconds": 0.0, "rows": 0, "peak_bytes": 0})
+  totals["calls"] += 1
+  totals["seconds"] += seconds
+  totals["rows"] += rows
+  totals["peak_bytes"] = max(totals["peak_bytes"], peak_bytes)
+
+  if metrics["callback"] is not None:
+    metrics["callback"](phase, seconds, rows, peak_bytes)
+
+def finish_report_metrics(metrics: dict, was_tracing: bool = False):
+  """
+  stops memory tracing if it was started for these metrics
+
+  args:
+  - metrics (dict): metrics from new_report_metrics
+  - was_tracing (bool): tracemalloc.is_tracing() from before the call that ran the phases,
+    tracing that was already on then is left on
+  """
+  if metrics["own_trace"] and not was_tracing:
+    tracemalloc.stop()
+    metrics["own_trace"] = False
+
+def build_sales_report(price: dict, sales: list, dedup: dict = None, metrics: dict = None) -> tuple[dict,list]:
+  """
+  runs the report phases (price conversion, validation, aggregation) for one list of sales
+
+  args:
+  - price (dict): a dictionary with item names and prices
+  - sales (list): a list of all sales records
+  - dedup (dict): optional state from new_sale_dedup
+  - metrics (dict): optional metrics from new_report_metrics
+
+  returns:
+  - tuple: (report, invalid sales)
+  """
+  if metrics is None:
+    price = fix_price(price)
+    valid_sales, invalid_sales = split_sales(price, sales, dedup)
+    return summarise_sales(price, valid_sales, invalid_sales), invalid_sales
+
+  # tracing started by these phases is stopped even when one of them raises
+  was_tracing = tracemalloc.is_tracing()
+  try:
+    started = start_phase(metrics)
+    price = fix_price(price)
+    end_phase(metrics, "fix_price", started, len(price))
+
+    started = start_phase(metrics)
+    valid_sales, invalid_sales = split_sales(price, sales, dedup)
+    end_phase(metrics, "validate", started, len(sales))
+    metrics["invalid"] += len(invalid_sales)
+
+    started = start_phase(metrics)
+    sale_report = summarise_sales(price, valid_sales, invalid_sales)
+    end_phase(metrics, "aggregate", started, len(valid_sales) + len(invalid_sales))
+  finally:
+    finish_report_metrics(metrics, was_tracing)
+
+  return sale_report, invalid_sales
+
+def generate_sales_report(price: dict[str,float], sales: list, dedup: dict = None, metrics: dict = None) -> dict[str,tuple]:
+  """
+  create a sales report for each item using valid and invalid sales data
+  for each item, the report includes:
+  - number of units sold
+  - valid sales amount
+  - average revenue per valid sale
+  - invalid sales amount
+
+  args:
+  - price (dict): a dictionary with item names and prices
+  - sales (list): a list of all sales records
+  - dedup (dict): optional state from new_sale_dedup, exact repeats of a row are
+    dropped and counted in dedup["dropped"] instead of being reported
+  - metrics (dict): optional metrics from new_report_metrics, off (None) by default
+
+  returns:
+  - dict: a dictionary where each key is an item name and its values are a summary of its sales
+  """
+  sale_report, invalid_sales = build_sales_report(price, sales, dedup, metrics)
+  return sale_report
+
+def new_report_state(price: dict, dedup: dict = None) -> dict:
+  """
+  creates a running report that sales can be added to one by one,
+  used when sales arrive as a stream instead of one finished list
+
+  args:
+  - price (dict): a dictionary with item names and prices (already patched for the department)
+  - dedup (dict): optional state from new_sale_dedup
+
+  returns:
+  - dict: the running report state
+  """
+  price = fix_price(price)
+  return {
+    "price": price,
+    "report": {key: (0, 0, 0.0, 0) for key in price},
+    "revenue": {},
+    "count": {},
+    "invalid": [],
+    "dedup": dedup
+  }
+
+def add_sale_to_report(state: dict, sale: list) -> bool:
+  """
+  validates a single sale and folds it into a running report,
+  after adding every sale the report matches generate_sales_report for the same list
+
+  args:
+  - state (dict): running report from new_report_state
+  - sale (list): a sale record [item_name, quantity, total]
+
+  returns:
+  - bool: True if the sale was counted as valid, False if invalid or dropped as a duplicate
+  """
+  if state["dedup"] is not None and is_duplicate_sale(state["dedup"], sale):
+    return False
+
+  price = state["price"]
+  sale_report = state["report"]
+  item_type, item_quantity, sale_total = sale
+  sr_unit, sr_sale_count, sr_avg, sr_err = sale_report.get(item_type, (0, 0, 0.0, 0))
+
+  if not (item_quantity == 0 and item_type in price) and not is_valid_sale(price, item_type, item_quantity, sale_total):
+    state["invalid"].append(sale)
+    sale_report[item_type] = (sr_unit, sr_sale_count + 1, sr_avg, sr_err + 1)
+    return False
+
+  store_revenue = state["revenue"]
+  store_count = state["count"]
+  store_revenue[item_type] = store_revenue.get(item_type, 0.0) + sale_total
+  store_count[item_type] = store_count.get(item_type, 0) + 1
+  new_avg = store_revenue[item_type] / store_count[item_type]
+  sale_report[item_type] = (sr_unit + item_quantity, sr_sale_count + 1, new_avg, sr_err)
+  return True
+
+REPORT_FIELDS = ("units", "sales", "avg", "errors")
+
+def fingerprint_sales_report(sale_report: dict) -> dict:
+  """
+  fingerprints every item of a report, keep it next to the report so a later
+  diff only has to compare numbers instead of walking both reports
+
+  args:
+  - sale_report (dict): item name -> (units, sales, avg, errors)
+
+  returns:
+  - dict: {"items": item name -> fingerprint, "digest": fingerprint of the whole report}
+  """
+  items = {}
+  digest = 0
+  for item, values in sale_report.items():
+    # float() so that 0 and 0.0 (or a report loaded back from json) fingerprint the same
+    row = repr((item, tuple(float(v) for v in values))).encode()
+    fingerprint = int.from_bytes(hashlib.blake2b(row, digest_size=8).digest(), "big")
+    items[item] = fingerprint
+    # a sum does not depend on the order of the items
+    digest = (digest + fingerprint) & 0xFFFFFFFFFFFFFFFF
+  return {"items": items, "digest": digest}
+
+def diff_report_item(old_values, new_values) -> dict:
+  """
+  compares the values of one item
+
+  args:
+  - old_values (tuple): (units, sales, avg, errors) before, or None if the item is new
+  - new_values (tuple): (units, sales, avg, errors) after, or None if the item is gone
+
+  returns:
+  - dict: field name -> (old value, new value) for the fields that changed
+  """
+  changes = {}
+  for idx, field in enumerate(REPORT_FIELDS):
+    old_value = None if old_values is None else old_values[idx]
+    new_value = None if new_values is None else new_values[idx]
+    if old_value != new_value or (old_values is None) != (new_values is None):
+      changes[field] = (old_value, new_value)
+  return changes
+
+def diff_sales_reports(old_report: dict, new_report: dict, old_fingerprints: dict = None, new_fingerprints: dict = None) -> dict:
+  """
+  finds what changed between two reports from generate_sales_report
+  when fingerprints from fingerprint_sales_report are given for both reports,
+  only items with a different fingerprint are looked at
+
+  args:
+  - old_report (dict): report before
+  - new_report (dict): report after
+  - old_fingerprints (dict): optional fingerprints of old_report
+  - new_fingerprints (dict): optional fingerprints of new_report
+
+  returns:
+  - dict: item name -> {field name: (old value, new value)}, only changed items and fields
+  """
+  changes = {}
+  if old_fingerprints is not None and new_fingerprints is not None:
+    old_items, new_items = old_fingerprints["items"], new_fingerprints["items"]
+    if old_fingerprints["digest"] == new_fingerprints["digest"] and len(old_items) == len(new_items):
+      return changes
+    for item, fingerprint in new_items.items():
+      if old_items.get(item) != fingerprint:
+        changes[item] = diff_report_item(old_report.get(item), new_report[item])
+    for item in old_items:
+      if item not in new_items:
+        changes[item] = diff_report_item(old_report[item], None)
+  else:
+    for item, new_values in new_report.items():
+      old_values = old_report.get(item)
+      if old_values is None or tuple(old_values) != tuple(new_values):
+        changes[item] = diff_report_item(old_values, new_values)
+    for item, old_values in old_report.items():
+      if item not in new_report:
+        changes[item] = diff_report_item(old_values, None)
+
+  # an item can have the same values with a different fingerprint (e.g. -0.0), drop those
+  return {item: fields for item, fields in changes.items() if fields}
+
+def fingerprint_department_reports(reports: list) -> dict:
+  """
+  fingerprints every department of a generate_sales_reports result
+
+  args:
+  - reports (list): (department name, report data, invalid sales) tuples
+
+  returns:
+  - dict: department name -> fingerprints from fingerprint_sales_report
+  """
+  return {dep: fingerprint_sales_report(report) for dep, report, invalid in reports}
+
+def diff_department_reports(old_reports: list, new_reports: list, old_fingerprints: dict = None, new_fingerprints: dict = None) -> dict:
+  """
+  finds what changed between two generate_sales_reports results,
+  departments with equal fingerprints are skipped without looking at their items
+
+  args:
+  - old_reports (list): result before
+  - new_reports (list): result after
+  - old_fingerprints (dict): optional, from fingerprint_department_reports(old_reports)
+  - new_fingerprints (dict): optional, from fingerprint_department_reports(new_reports)
+
+  returns:
+  - dict: department name -> {"report": item changes like diff_sales_reports,
+    "invalid_added": list, "invalid_removed": list}, only departments that changed
+  """
+  old_deps = {dep: (report, invalid) for dep, report, invalid in old_reports}
+  new_deps = {dep: (report, invalid) for dep, report, invalid in new_reports}
+  changes = {}
+
+  for dep in sorted(set(old_deps) | set(new_deps)):
+    old_report, old_invalid = old_deps.get(dep, ({}, []))
+    new_report, new_invalid = new_deps.get(dep, ({}, []))
+
+    old_fp = new_fp = None
+    if old_fingerprints is not None and new_fingerprints is not None:
+      old_fp = old_fingerprints.get(dep)
+      new_fp = new_fingerprints.get(dep)
+      if old_fp is None:
+        old_fp = fingerprint_sales_report(old_report)
+      if new_fp is None:
+        new_fp = fingerprint_sales_report(new_report)
+    report_changes = diff_sales_reports(old_report, new_report, old_fp, new_fp)
+
+    # invalid sales are compared as multisets, the same row can be invalid more than once
+    remaining = {}
+    for sale in old_invalid:
+      remaining[tuple(sale)] = remaining.get(tuple(sale), 0) + 1
+    invalid_added = []
+    for sale in new_invalid:
+      if remaining.get(tuple(sale), 0) > 0:
+        remaining[tuple(sale)] -= 1
+      else:
+        invalid_added.append(sale)
+    invalid_removed = [list(sale) for sale, n in remaining.items() for _ in range(n)]
+
+    if report_changes or invalid_added or invalid_removed:
+      changes[dep] = {
+        "report": report_changes,
+        "invalid_added": invalid_added,
+        "invalid_removed": invalid_removed
+      }
+
+  return changes
+
 def check_dict(obj):
   """
   checks if an object is a non-empty dictionary
@@ -141,7 +589,7 @@ def patch_item_price(price, patch):
         price[k1] = v1
   return price
 
-def generate_sales_reports(price, patch, sales):
+def generate_sales_reports(price, patch, sales, dedup=None, metrics=None):
   """
   creates a complete sales report for each department,
   the report updates prices based on department rules and includes:
@@ -152,6 +600,9 @@ def generate_sales_reports(price, patch, sales):
   - price(dict): original price
   - patch(dict): price update for each department
   - sales(list): sales data with department info
+  - dedup(dict): optional, department name -> state from new_sale_dedup,
+    pass {} to drop repeated rows with the default settings for every department
+  - metrics(dict): optional metrics from new_report_metrics, phases add up over all departments
 
   returns:
   - list: one entry per department as a tuple:
@@ -161,17 +612,34 @@ def generate_sales_reports(price, patch, sales):
 
   all_dep_sales = {}
 
-  for dep in all_dep_name:
-    dep_price = dict(price)
-
-    if dep in patch:
-      dep_price = patch_item_price(dep_price, patch[dep])
-
-    dep_sales = [ [x[1], x[2], x[3]] for x in sales if x[0] == dep]
-    all_dep_sales[dep] = {
-      "report": generate_sales_report(dep_price, dep_sales),
-      "invalid": flag_invalid_sales(dep_price, dep_sales)
-    }
+  # tracing started by the phases of this call is stopped even when one of them raises
+  was_tracing = tracemalloc.is_tracing()
+  try:
+    for dep in all_dep_name:
+      if metrics is not None:
+        started = start_phase(metrics)
+
+      dep_price = dict(price)
+
+      if dep in patch:
+        dep_price = patch_item_price(dep_price, patch[dep])
+
+      dep_sales = [ [x[1], x[2], x[3]] for x in sales if x[0] == dep]
+      if metrics is not None:
+        end_phase(metrics, "patch", started, len(dep_sales))
+
+      dep_dedup = None
+      if dedup is not None:
+        dep_dedup = dedup.setdefault(dep, new_sale_dedup())
+
+      dep_report, invalid_sales = build_sales_report(dep_price, dep_sales, dep_dedup, metrics)
+      all_dep_sales[dep] = {
+        "report": dep_report,
+        "invalid": invalid_sales
+      }
+  finally:
+    if metrics is not None:
+      finish_report_metrics(metrics, was_tracing)
 
   final_sales = []
 
@@ -0,0 +1,316 @@
+"""
+this program turns robot command files into compact programs of integer opcodes,
+so the simulators can run them without matching action strings on every step
+
+a command file has one command per line:
+- 'turn-left', 'turn-right', 'clean' and 'forward' get their own opcode
+- anything else (an empty line, 'mop', a typo) becomes a no-op, which is what
+  vacuum_action does with an unknown action
+- 'command*N' stands for N lines of the same command, generated files are mostly long runs
+  like 'forward*500' or 'turn-right*8' (see compress_commands)
+
+compressed programs can also be kept as runs, an array of opcodes with an array of repeat
+counts, and run by run_compressed, which moves straight ahead over free tiles in one go and
+only performs what is left of a row of turns after full circles
+
+directions are stored as small integers (0 = N, 1 = NE, ... 7 = NW, clockwise) so turning
+is just adding or subtracting 1 (mod 8) and moving uses the DELTA_ROW / DELTA_COL tables
+"""
+
+import os
+from array import array
+
+# opcodes, also used for the actions a robot ended up performing
+OP_TURN_LEFT = 0
+OP_TURN_RIGHT = 1
+OP_CLEAN = 2
+OP_FORWARD = 3
+OP_NOOP = 4
+
+# action name of every opcode, OP_NOOP is logged as an empty line
+ACTION_NAMES = ("turn-left", "turn-right", "clean", "forward", "")
+OPCODES = {"turn-left": OP_TURN_LEFT, "turn-right": OP_TURN_RIGHT, "clean": OP_CLEAN, "forward": OP_FORWARD}
+
+# list all compass directions clockwise, with the row / column step of each one
+DIRECTIONS = ("N", "NE", "E", "SE", "S", "SW", "W", "NW")
+DIR_INDEX = {name: idx for idx, name in enumerate(DIRECTIONS)}
+DELTA_ROW = (-1, -1, 0, 1, 1, 1, 0, -1)
+DELTA_COL = (0, 1, 1, 1, 0, -1, -1, -1)
+
+def parse_command(line):
+    """
+    reads one command line, which may repeat its command as 'command*N'
+
+    args:
+    - line (str): command string, surrounding whitespace is ignored
+
+    returns:
+    - tuple: (opcode, repeat count), a line with a bad count is a single no-op
+    """
+    name, star, count = line.strip().partition("*")
+    if not star:
+        return OPCODES.get(name, OP_NOOP), 1
+    count = count.strip()
+    if not count.isdigit():
+        return OP_NOOP, 1
+    return OPCODES.get(name.strip(), OP_NOOP), int(count)
+
+def expand_command(line):
+    """
+    turns one command line into the action names it stands for
+
+    args:
+    - line (str): command string, possibly 'command*N'
+
+    returns:
+    - list: the action repeated N times (a plain or unknown line stays a single action)
+    """
+    name, star, count = line.strip().partition("*")
+    count = count.strip()
+    if not star or not count.isdigit():
+        return [line]
+    return [name.strip()] * int(count)
+
+def compile_lines(lines):
+    """
+    compiles command lines into a program
+
+    args:
+    - lines (iterable): command strings, surrounding whitespace is ignored
+
+    returns:
+    - array: one opcode (unsigned byte) per command
+    """
+    program = array("B")
+    for line in lines:
+        op, count = parse_command(line)
+        if count == 1:
+            program.append(op)
+        else:
+            program.extend(array("B", [op]) * count)
+    return program
+
+def command_source(instructions):
+    """
+    reads command lines one at a time, only when the next one is needed, so a run that
+    stops early does not read the rest and a live controller can feed commands through a pipe
+
+    args:
+    - instructions: path to a file containing one command per line, an open text or binary file
+      or pipe (like sys.stdin or sys.stdin.buffer), or any iterable of command lines (a list, a generator, ...)
+
+    returns:
+    - generator: the command lines without surrounding whitespace, close it to close the file
+    """
+    if isinstance(instructions, (str, os.PathLike)):
+        with open(instructions, "r") as f:
+            for line in f:
+                yield line.strip()
+        return
+    if hasattr(instructions, "readline"):
+        # readline gives a line as soon as it is written to a pipe, iterating may wait for more.
+        # the end of the stream is "" for text streams and b"" for binary ones (sys.stdin.buffer)
+        while True:
+            line = instructions.readline()
+            if not line:
+                return
+            yield (line.decode() if isinstance(line, bytes) else line).strip()
+    for line in instructions:
+        yield (line.decode() if isinstance(line, bytes) else line).strip()
+
+def compile_commands(instructions):
+    """
+    compiles a command file into a program
+
+    args:
+    - instructions: path to a file containing one command per line, or any command source (see command_source)
+
+    returns:
+    - array: one opcode (unsigned byte) per command
+    """
+    return compile_lines(command_source(instructions))
+
+def compile_runs(lines):
+    """
+    compiles command lines into runs, neighbouring lines with the same command are merged
+
+    args:
+    - lines (iterable): command strings, possibly 'command*N'
+
+    returns:
+    - tuple: (array of opcodes, array of repeat counts)
+    """
+    ops, counts = array("B"), array("Q")
+    for line in lines:
+        op, count = parse_command(line)
+        if count == 0:
+            continue
+        if ops and ops[-1] == op:
+            counts[-1] += count
+        else:
+            ops.append(op)
+            counts.append(count)
+    return ops, counts
+
+def compress_program(program):
+    """
+    turns a program into runs
+
+    args:
+    - program (iterable): opcodes
+
+    returns:
+    - tuple: (array of opcodes, array of repeat counts)
+    """
+    ops, counts = array("B"), array("Q")
+    for op in program:
+        if ops and ops[-1] == op:
+            counts[-1] += 1
+        else:
+            ops.append(op)
+            counts.append(1)
+    return ops, counts
+
+def expand_runs(ops, counts):
+    """
+    turns runs back into a program
+
+    args:
+    - ops (array): opcodes
+    - counts (array): repeat count of every opcode
+
+    returns:
+    - array: one opcode per command
+    """
+    program = array("B")
+    for op, count in zip(ops, counts):
+        program.extend(array("B", [op]) * count)
+    return program
+
+def compress_commands(instructions, path):
+    """
+    writes a command file in compressed form, one 'command*N' line per run
+
+    args:
+    - instructions (str): command file to read, plain or compressed
+    - path (str): file to write, it is overwritten (no-ops are written as 'noop')
+    """
+    with open(instructions, "r") as f:
+        ops, counts = compile_runs(f)
+    write_runs(path, ops, counts)
+
+def write_runs(path, ops, counts):
+    """
+    writes runs as a compressed command file, one 'command*N' line per run
+
+    args:
+    - path (str): file to write, it is overwritten (no-ops are written as 'noop')
+    - ops (array): opcodes
+    - counts (array): repeat count of every opcode
+    """
+    with open(path, "w") as f:
+        for op, count in zip(ops, counts):
+            name = ACTION_NAMES[op] or "noop"
+            f.write(name + "\n" if count == 1 else f"{name}*{count}\n")
+
+def steps_in_bounds(row, col, direction, n_rows, n_cols):
+    """
+    counts how many steps a robot can go straight ahead before it would leave the grid
+
+    args:
+    - row, col (int): position of the robot
+    - direction (int): direction index of the robot
+    - n_rows, n_cols (int): size of the grid
+
+    returns:
+    - int: number of steps
+    """
+    steps = max(n_rows, n_cols)
+    if DELTA_ROW[direction] > 0:
+        steps = min(steps, n_rows - 1 - row)
+    elif DELTA_ROW[direction] < 0:
+        steps = min(steps, row)
+    if DELTA_COL[direction] > 0:
+        steps = min(steps, n_cols - 1 - col)
+    elif DELTA_COL[direction] < 0:
+        steps = min(steps, col)
+    return steps
+
+def run_compressed(sim, ops, counts, vacuum):
+    """
+    runs compressed runs on a simulation, with the same result as sim.run_program(expand_runs(ops, counts))
+
+    - a run of forward steps goes through sim.forward_run, which takes all the plain moves
+      up to the first obstacle, edge or tile that does something special in one call, and
+      only the step after it is run on its own
+    - a row of turns (left and right mixed) only turns by what is left after full circles,
+      every turn is still logged as performed
+    - anything else is given to sim.run_program as it is
+
+    args:
+    - sim: a Simulation with run_program and forward_run
+    - ops (array): opcodes
+    - counts (array): repeat count of every opcode
+    - vacuum (list): robot state [row, column, direction], updated in place
+
+    returns:
+    - bytearray: opcode of every performed action
+    """
+    performed = bytearray()
+    forward_step = array("B", [OP_FORWARD])
+    idx = 0
+
+    while idx < len(ops):
+        op, count = ops[idx], counts[idx]
+        idx += 1
+        if op == OP_FORWARD:
+            while count:
+                steps = sim.forward_run(vacuum, count)
+                performed += bytes([OP_FORWARD]) * steps
+                count -= steps
+                if count:
+                    performed += sim.run_program(forward_step, vacuum)
+                    count -= 1
+            continue
+
+        if op == OP_TURN_LEFT or op == OP_TURN_RIGHT:
+            net = 0
+            turns = bytearray()
+            while True:
+                net += count if op == OP_TURN_RIGHT else -count
+                turns += bytes([op]) * count
+                if idx == len(ops) or ops[idx] not in (OP_TURN_LEFT, OP_TURN_RIGHT):
+                    break
+                op, count = ops[idx], counts[idx]
+                idx += 1
+            # a full circle is still turned once, the first action of a program also sets the robot marker
+            sim.run_program(array("B", [OP_TURN_RIGHT]) * (net % 8 or 8), vacuum)
+            performed += turns
+            continue
+
+        performed += sim.run_program(array("B", [op]) * count, vacuum)
+
+    return performed
+
+def decompile(program):
+    """
+    turns a program (or a list of performed actions) back into action names
+
+    args:
+    - program (iterable): opcodes
+
+    returns:
+    - list: action name of every opcode
+    """
+    return [ACTION_NAMES[op] for op in program]
+
+def write_action_log(log, performed):
+    """
+    writes performed actions in the text log format of perform_cleaning (one action per line)
+
+    args:
+    - log (str): path of the log file, it is overwritten
+    - performed (iterable): opcodes of the performed actions
+    """
+    with open(log, "w") as fl:
+        fl.write("".join([ACTION_NAMES[op] + "\n" for op in performed]))
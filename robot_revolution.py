@@ -27,99 +27,113 @@ and is capable of:
 #     [True,True,True,True,True,True,True,True,True,True]
 #     ]
 
+import sim_core
+from robot_commands import command_source
+from sim_core import PLAIN
+
 cleaning_space = [
     [True, True, True],
     [True, True, True],
     [True, True, True]
 ]
 
-def validate_bounds(n_row,n_col):
+class Simulation(sim_core.Simulation):
     """
-    check if the given position (row, column) is within the cleaning space limits.
-    
-    args:
-    - n_row (int): target row index
-    - n_col (int): target column index
+    one cleaning run with its own grid and robot, run by the shared engine with the plain rules
+    (see sim_core), so any number of simulations can run in the same process
+    (the module level functions below use one simulation over the global grid)
+    """
+
+    def __init__(self, cleaning_space, vacuum=None):
+        """
+        args:
+        - cleaning_space (list): grid of True (clean) and False (dirty), changed in place (pass a copy to keep the original)
+        - vacuum (list): optional robot state [row, column, direction], used when perform_cleaning gets none
+        """
+        super().__init__(cleaning_space, None, vacuum, PLAIN)
+
+    def vacuum_action(self, vacuum, action):
+        """
+        execute an action (updating position and cleaning space on the robot vacum cleaner)
+
+        args:
+        - vacuum (list): [row, column, direction] representing the status of the vacuum cleaner, updated in place
+        - action (str): one of ['turn left', 'turn right', 'clean', 'forward']
+        """
+        super().vacuum_action(vacuum, action)
+
+    def perform_cleaning(self, instructions, vacuum=None, stop=None):
+        """
+        processes a list of processes from a file and applies it to vacuum
+
+        args:
+        instructions: path to a file containing one command per line, an open file or pipe, or any iterable of commands
+        vacuum (list): initial state of the rows, columns and vacuum directions, the simulation's own vacuum if None
+        stop: optional function stop(sim, vacuum) called after every command, the run ends when it returns True
+        """
+        if vacuum is None:
+            vacuum = self.vacuum
+        commands = command_source(instructions)
+        for command in commands:
+            self.vacuum_action(vacuum, command)
+            if stop is not None and stop(self, vacuum):
+                break
+        commands.close()
+
+# simulation behind the module level functions, it always works on the global grid above
+module_sim = None
+
+def module_simulation():
+    """
+    gets the simulation that works on the module's cleaning_space
 
     returns:
-    - bool: True if within bounds, False otherwise    
+    - Simulation: the shared simulation, pointed at the current global grid
+    """
+    global module_sim
+
+    if module_sim is None:
+        module_sim = Simulation(cleaning_space)
+    module_sim.cleaning_space = cleaning_space
+    # the globals may have been edited in place since the last call
+    module_sim.forget_indexes()
+    return module_sim
+
+def validate_bounds(n_row,n_col):
     """
-    global cleaning_space
-    
-    return n_row < len(cleaning_space) and n_col < len(cleaning_space[0]) and n_row >= 0 and n_col >= 0
+    check if the given position is within the global cleaning_space (see Simulation.validate_bounds)
+    """
+    return module_simulation().validate_bounds(n_row, n_col)
 
 def vacuum_action(vacuum, action):
     """
-    execute an action (updating position and cleaning space on the robot vacum cleaner)
+    execute an action on the global cleaning_space (see Simulation.vacuum_action)
+    """
+    module_simulation().vacuum_action(vacuum, action)
 
-    args:
-    - vacuum (list): [row, column, direction] representing the status of the vacuum cleaner
-    - action (str): one of ['turn left', 'turn right', 'clean', 'forward']
-    
-    returns:
-    - list: updated vacuum state after perform the action
-    """
-    global cleaning_space
-    robot_row, robot_col, robot_dir = vacuum
-    n_row, n_col = robot_row, robot_col
-
-    #list all compass directions clockwise
-    all_dir = ["N","NE","E","SE","S","SW","W","NW"]
-
-    match action:
-        case "turn-left":
-            robot_dir = all_dir[((all_dir.index(robot_dir)-1) % len(all_dir))]
-        case "turn-right":
-            robot_dir = all_dir[((all_dir.index(robot_dir)+1) % len(all_dir))]
-        case "clean":
-            cleaning_space[robot_row][robot_col] = True
-        case "forward":
-            match robot_dir:
-                case "N":
-                    n_row -= 1
-                case "NE":
-                    n_col += 1
-                    n_row -= 1
-                case "E":
-                    n_col += 1
-                case "SE":
-                    n_col += 1
-                    n_row += 1
-                case "S":
-                    n_row += 1
-                case "SW":
-                    n_col -= 1
-                    n_row += 1
-                case "W":
-                    n_col -= 1
-                case "NW":
-                    n_row -= 1
-                    n_col -= 1
-            
-            if validate_bounds(n_row, n_col):
-                # update the robot's position if within bounds
-                if (cleaning_space[robot_row][robot_col] == False):
-                    cleaning_space[n_row][n_col] = False
-                robot_row, robot_col = n_row,n_col
-            else:
-                # turn the robot to the right if it goes out of bounds
-                robot_dir = all_dir[((all_dir.index(robot_dir)+1) % len(all_dir))]
-    
-    vacuum[0] = robot_row
-    vacuum[1] = robot_col
-    vacuum[2] = robot_dir
+def perform_cleaning(instructions, vacuum, stop=None):
+    """
+    processes a command file on the global cleaning_space (see Simulation.perform_cleaning)
+    """
+    module_simulation().perform_cleaning(instructions, vacuum, stop)
+
+def run_program(program, vacuum):
+    """
+    runs a compiled program on the global cleaning_space (see Simulation.run_program)
+    """
+    return module_simulation().run_program(program, vacuum)
 
-def perform_cleaning(instructions, vacuum):
+def perform_cleaning_compiled(instructions, vacuum):
+    """
+    runs a compiled command file on the global cleaning_space (see Simulation.perform_cleaning_compiled)
     """
-    processes a list of processes from a file and applies it to vacuum
+    return module_simulation().perform_cleaning_compiled(instructions, vacuum)
 
-    args:
-    instructions (str): path to a file containing one command per line
-    vacuum (list): initial state of the rows, columns and vacuum directions
+def perform_cleaning_runs(instructions, vacuum):
+    """
+    runs a command file as runs on the global cleaning_space (see Simulation.perform_cleaning_runs)
     """
-    with open(instructions, "r") as f:
-        for line in f:
-            vacuum_action(vacuum, line.strip())
+    return module_simulation().perform_cleaning_runs(instructions, vacuum)
 
 # WARNING!!! *DO NOT* REMOVE THIS LINE
 # THIS ENSURES THAT THE CODE BELLOW ONLY RUNS WHEN YOU HIT THE GREEN `Run` BUTTON, AND NOT THE BLUE `Test` BUTTON
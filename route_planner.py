@@ -0,0 +1,424 @@
+"""
+this program plans the commands for the robot of unexpected_obstruction, so command files do not
+have to be written by hand: given the grids and the robot's start state it gives a program that
+cleans every dirty tile the robot can reach
+
+the plan is made in three parts:
+- a flood fill from the start finds the tiles the robot can reach, walls and cats block it
+  (the planner never walks into a cat, so no cat gets pushed and the room does not change under it)
+- the dirty tiles are put in order with the strip heuristic for the travelling salesman problem:
+  the room is cut into bands of rows that are gone through left to right and right to left in turn,
+  then one pass of 2-opt (on the chebyshev distance, one forward step covers one tile in any of
+  the 8 directions) untangles the long legs
+- the robot goes from one dirty tile to the next in a straight line when nothing is in the way,
+  otherwise along the cheapest path A* finds over (row, column, direction) states, where a
+  forward step and a turn by 45 degrees cost one command each
+
+every dirty tile the robot steps on is cleaned right away, so the robot never spreads dirt
+(moving off a dirty tile dirties the one ahead) and tiles cleaned on the way are not visited again
+
+    plan = plan_route(cleaning_space, obstruction_space, [4, 4, "SE"])
+    write_program("commands.txt", plan["program"])
+"""
+
+import argparse
+import copy
+import heapq
+import math
+import random
+import time
+from array import array
+
+from robot_commands import (
+    DELTA_COL, DELTA_ROW, DIR_INDEX, DIRECTIONS, OP_CLEAN, OP_FORWARD, OP_TURN_LEFT, OP_TURN_RIGHT,
+    compress_program, write_runs
+)
+
+# obstruction values the robot can move onto, markers of other robots are cleared by its first action
+FREE = (None, "r")
+
+# commands turning the robot from one direction (first index) to another, the shorter way round
+TURNS = [
+    [
+        array("B", [OP_TURN_RIGHT]) * ((to - frm) % 8) if (to - frm) % 8 <= 4 else array("B", [OP_TURN_LEFT]) * ((frm - to) % 8)
+        for to in range(8)
+    ]
+    for frm in range(8)
+]
+
+# number of turns from one direction (first index) to another
+TURN_COST = [[len(turns) for turns in row] for row in TURNS]
+
+# direction index of every (row step, column step)
+DIR_OF = {(DELTA_ROW[idx], DELTA_COL[idx]): idx for idx in range(8)}
+
+# how many tiles apart two targets of the order may be swapped by 2-opt
+TWO_OPT_WINDOW = 8
+
+def sign(value):
+    """
+    returns:
+    - int: -1, 0 or 1
+    """
+    return (value > 0) - (value < 0)
+
+class RoutePlanner:
+    """
+    plans cleaning routes in one room, following the rules of unexpected_obstruction
+    """
+
+    def __init__(self, cleaning_space, obstruction_space):
+        """
+        args:
+        - cleaning_space (list): grid of True (clean) and False (dirty), it is not changed
+        - obstruction_space (list): grid of None, 'w', 'c' and 'r', it is not changed
+        """
+        self.cleaning_space = cleaning_space
+        self.obstruction_space = obstruction_space
+        self.n_rows = len(cleaning_space)
+        self.n_cols = len(cleaning_space[0])
+        # tiles are numbered row by row in a grid with a border of blocked tiles around the room,
+        # so a step is one addition and never needs a bounds check
+        self.width = self.n_cols + 2
+        self.offsets = [DELTA_ROW[idx] * self.width + DELTA_COL[idx] for idx in range(8)]
+        self.blocked = bytearray(b"\x01") * (self.width * (self.n_rows + 2))
+        for row, cells in enumerate(obstruction_space):
+            start = self.cell(row, 0)
+            self.blocked[start:start + self.n_cols] = bytes([cell not in FREE for cell in cells])
+
+    def cell(self, row, col):
+        """
+        returns:
+        - int: number of the tile at (row, col) in the bordered grid
+        """
+        return (row + 1) * self.width + col + 1
+
+    def position(self, cell):
+        """
+        returns:
+        - tuple: (row, col) of a tile number of the bordered grid
+        """
+        row, col = divmod(cell, self.width)
+        return row - 1, col - 1
+
+    def reachable(self, row, col):
+        """
+        finds the tiles the robot can reach from a start tile, filling whole runs of free tiles
+        of a row at once (a scanline flood fill)
+
+        args:
+        - row, col (int): start tile, it counts as free even when something is on it
+
+        returns:
+        - list: one bytearray per row, 1 for every reachable tile
+        """
+        n_rows, n_cols = self.n_rows, self.n_cols
+        # free tiles not reached yet
+        avail = [bytearray(self.blocked[self.cell(r, 0):self.cell(r, n_cols)].translate(bytes([1, 0]) + bytes(254))) for r in range(n_rows)]
+        avail[row][col] = 1
+        reach = [bytearray(n_cols) for _ in range(n_rows)]
+        spans = []
+
+        def fill(r, c):
+            # takes the whole run of free tiles around (r, c)
+            left = avail[r].rfind(0, 0, c) + 1
+            right = avail[r].find(0, c)
+            if right < 0:
+                right = n_cols
+            avail[r][left:right] = bytes(right - left)
+            reach[r][left:right] = b"\x01" * (right - left)
+            spans.append((r, left, right))
+            return right
+
+        fill(row, col)
+        while spans:
+            r, left, right = spans.pop()
+            # diagonal steps reach one tile past both ends of the run
+            lo, hi = max(left - 1, 0), min(right + 1, n_cols)
+            for n_row in (r - 1, r + 1):
+                if 0 <= n_row < n_rows:
+                    c = avail[n_row].find(1, lo, hi)
+                    while c >= 0:
+                        c = avail[n_row].find(1, fill(n_row, c), hi)
+        return reach
+
+    def order_targets(self, targets, start, area):
+        """
+        puts the dirty tiles in the order they are cleaned: bands of rows, gone through
+        left to right and right to left in turn, then one pass of 2-opt over the long legs
+
+        args:
+        - targets (list): (row, col) of every dirty tile, row by row and left to right
+        - start (tuple): (row, col) of the robot
+        - area (int): number of reachable tiles, sets the height of the bands
+
+        returns:
+        - list: the targets in order, starting with start
+        """
+        if not targets:
+            return [start]
+        # bands about sqrt(2 * area / n) tall keep the legs short, a dirty room is gone through row by row
+        height = max(1, round(math.sqrt(2 * area / len(targets))))
+        bands = {}
+        for target in targets:
+            bands.setdefault(target[0] // height, []).append(target)
+
+        order = [start]
+        for idx, (_, band_targets) in enumerate(sorted(bands.items())):
+            if height > 1:
+                band_targets.sort(key=lambda target: target[1])
+            if idx % 2:
+                band_targets.reverse()
+            order += band_targets
+
+        # 2-opt: reverse order[i + 1:j + 1] when that makes the legs (i, i + 1) and (j, j + 1) shorter
+        def dist(a, b):
+            return max(abs(a[0] - b[0]), abs(a[1] - b[1]))
+
+        for i in range(len(order) - 3):
+            a, b = order[i], order[i + 1]
+            leg = dist(a, b)
+            if leg <= 1:
+                continue
+            for j in range(i + 2, min(i + TWO_OPT_WINDOW, len(order) - 1)):
+                c, d = order[j], order[j + 1]
+                if dist(a, c) + dist(b, d) < leg + dist(c, d):
+                    order[i + 1:j + 1] = order[j:i:-1]
+                    break
+        return order
+
+    def find_path(self, cell, robot_dir, goal):
+        """
+        finds the cheapest way from a robot state to a tile with A* over (tile, direction) states,
+        a forward step and a turn by 45 degrees cost one command each. a move to any of the 8
+        neighbouring tiles is one edge, its cost is the forward step plus the turns before it
+
+        the heuristic is the chebyshev distance to the goal, plus one when the goal is not
+        straight ahead (the robot has to turn at least once), it never overestimates
+
+        args:
+        - cell (int): tile of the robot in the bordered grid
+        - robot_dir (int): direction index of the robot
+        - goal (int): tile to reach in the bordered grid
+
+        returns:
+        - list: direction of every forward step on the way, None when the goal cannot be reached
+        """
+        width, blocked, offsets = self.width, self.blocked, self.offsets
+        goal_row, goal_col = divmod(goal, width)
+        heappush, heappop = heapq.heappush, heapq.heappop
+
+        start = cell << 3 | robot_dir
+        cost = {start: 0}
+        came_from = {start: -1}
+        # cheapest known way onto every tile, (cost, direction)
+        best_at = {cell: (0, robot_dir)}
+        # ties go to the state furthest along, it is closer to the goal
+        heap = [(0, 0, start)]
+        while heap:
+            _, neg_cost, state = heappop(heap)
+            here = state >> 3
+            if here == goal:
+                steps = []
+                while state != start:
+                    steps.append(state & 7)
+                    state = came_from[state]
+                steps.reverse()
+                return steps
+            here_cost = -neg_cost
+            if here_cost > cost[state]:
+                continue
+
+            here_row, here_col = divmod(here, width)
+            turn_costs = TURN_COST[state & 7]
+            for direction in range(8):
+                ahead = here + offsets[direction]
+                if blocked[ahead]:
+                    continue
+                n_state = ahead << 3 | direction
+                n_cost = here_cost + 1 + turn_costs[direction]
+                if n_cost >= cost.get(n_state, n_cost + 1):
+                    continue
+                best = best_at.get(ahead)
+                if best is not None:
+                    # reaching the tile cheaper and turning there is at least as good
+                    if n_cost >= best[0] + TURN_COST[best[1]][direction]:
+                        continue
+                    if n_cost < best[0]:
+                        best_at[ahead] = (n_cost, direction)
+                else:
+                    best_at[ahead] = (n_cost, direction)
+                cost[n_state] = n_cost
+                came_from[n_state] = state
+                d_row = goal_row - here_row - DELTA_ROW[direction]
+                d_col = goal_col - here_col - DELTA_COL[direction]
+                steps = max(abs(d_row), abs(d_col))
+                if steps and (d_row != DELTA_ROW[direction] * steps or d_col != DELTA_COL[direction] * steps):
+                    steps += 1
+                heappush(heap, (n_cost + steps, -n_cost, n_state))
+        return None
+
+    def plan(self, vacuum):
+        """
+        plans a program that cleans every dirty tile the robot can reach
+
+        args:
+        - vacuum (list): start state of the robot [row, column, direction], it is not changed
+
+        returns:
+        - dict: "program" (array of opcodes, see robot_commands), "vacuum" (state of the robot
+          after the program), "cleaned" (dirty tiles the program cleans) and "unreachable"
+          ((row, col) of the dirty tiles the robot cannot get to)
+        """
+        start_row, start_col = vacuum[0], vacuum[1]
+        reach = self.reachable(start_row, start_col)
+        targets = []
+        unreachable = []
+        for row, cells in enumerate(self.cleaning_space):
+            if False not in cells:
+                continue
+            for col, value in enumerate(cells):
+                if value == False:
+                    if reach[row][col]:
+                        targets.append((row, col))
+                    else:
+                        unreachable.append((row, col))
+        order = self.order_targets(targets, (start_row, start_col), sum(map(sum, reach)))
+
+        width, offsets = self.width, self.offsets
+        blocked = self.blocked
+        cell = self.cell(start_row, start_col)
+        dirty = bytearray(len(blocked))
+        for row, col in targets:
+            dirty[self.cell(row, col)] = 1
+
+        program = array("B")
+        robot_dir = DIR_INDEX[vacuum[2]]
+        cleaned = 0
+        if dirty[cell] or blocked[cell]:
+            # a wall or cat under the robot is replaced by its marker after an action that
+            # keeps it on the tile, from then on the tile is free
+            program.append(OP_CLEAN)
+            cleaned += dirty[cell]
+            dirty[cell] = 0
+            blocked[cell] = 0
+
+        for row, col in order[1:]:
+            goal = self.cell(row, col)
+            if not dirty[goal]:
+                # cleaned on the way to an earlier tile
+                continue
+            goal_row, goal_col = divmod(goal, width)
+            here_row, here_col = divmod(cell, width)
+            d_row, d_col = goal_row - here_row, goal_col - here_col
+            steps = None
+            if d_row == 0 or d_col == 0 or abs(d_row) == abs(d_col):
+                # straight line, taken when nothing is in the way
+                distance = max(abs(d_row), abs(d_col))
+                direction = DIR_OF[(sign(d_row), sign(d_col))]
+                offset = offsets[direction]
+                if not any([blocked[cell + offset * step] for step in range(1, distance + 1)]):
+                    steps = [direction] * distance
+            if steps is None:
+                steps = self.find_path(cell, robot_dir, goal)
+                if steps is None:
+                    continue
+
+            for direction in steps:
+                if direction != robot_dir:
+                    program += TURNS[robot_dir][direction]
+                    robot_dir = direction
+                program.append(OP_FORWARD)
+                cell += offsets[direction]
+                if dirty[cell]:
+                    program.append(OP_CLEAN)
+                    dirty[cell] = 0
+                    cleaned += 1
+
+        if program and program[0] == OP_FORWARD:
+            # a robot marker ahead stops the first step, the first action clears the markers
+            first_row, first_col = self.position(self.cell(start_row, start_col) + offsets[DIR_INDEX[vacuum[2]]])
+            if self.obstruction_space[first_row][first_col] == "r":
+                program.insert(0, OP_CLEAN)
+
+        end_row, end_col = self.position(cell)
+        return {"program": program, "vacuum": [end_row, end_col, DIRECTIONS[robot_dir]], "cleaned": cleaned, "unreachable": unreachable}
+
+def plan_route(cleaning_space, obstruction_space, vacuum):
+    """
+    plans a program that cleans every dirty tile the robot can reach (see RoutePlanner.plan)
+
+    args:
+    - cleaning_space (list): grid of True (clean) and False (dirty), it is not changed
+    - obstruction_space (list): grid of None, 'w', 'c' and 'r', it is not changed
+    - vacuum (list): start state of the robot [row, column, direction]
+
+    returns:
+    - dict: "program", "vacuum", "cleaned" and "unreachable"
+    """
+    return RoutePlanner(cleaning_space, obstruction_space).plan(vacuum)
+
+def write_program(path, program):
+    """
+    writes a program as a compressed command file (see robot_commands.compress_commands)
+
+    args:
+    - path (str): file to write, it is overwritten
+    - program (array): opcodes
+    """
+    write_runs(path, *compress_program(program))
+
+def random_room(n_rows, n_cols, dirt=0.3, walls=0.1, seed=None):
+    """
+    makes a random room to plan in
+
+    args:
+    - n_rows, n_cols (int): size of the room
+    - dirt (float): share of dirty tiles
+    - walls (float): share of walls
+    - seed: seed of the random generator, None for a random one
+
+    returns:
+    - tuple: (cleaning_space, obstruction_space)
+    """
+    rnd = random.Random(seed)
+    cleaning_space = [[rnd.random() >= dirt for _ in range(n_cols)] for _ in range(n_rows)]
+    obstruction_space = [["w" if rnd.random() < walls else None for _ in range(n_cols)] for _ in range(n_rows)]
+    return cleaning_space, obstruction_space
+
+# WARNING!!! *DO NOT* REMOVE THIS LINE
+# THIS ENSURES THAT THE CODE BELLOW ONLY RUNS WHEN YOU HIT THE GREEN `Run` BUTTON, AND NOT THE BLUE `Test` BUTTON
+if __name__ == "__main__":
+    """
+    main function to plan a command file for the room of unexpected_obstruction, or for a
+    random room, and check it on the simulator:
+    python route_planner.py commands.txt [--size N] [--dirt P] [--walls P] [--seed S]
+    """
+    import unexpected_obstruction
+    from robot_commands import run_compressed
+
+    parser = argparse.ArgumentParser(description="plan a command file that cleans the room")
+    parser.add_argument("commands")
+    parser.add_argument("--size", type=int, default=None, help="plan for a random N x N room")
+    parser.add_argument("--dirt", type=float, default=0.3)
+    parser.add_argument("--walls", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.size is None:
+        cleaning_space = copy.deepcopy(unexpected_obstruction.cleaning_space)
+        obstruction_space = copy.deepcopy(unexpected_obstruction.obstruction_space)
+        vacuum = [4, 4, "SE"]
+    else:
+        cleaning_space, obstruction_space = random_room(args.size, args.size, args.dirt, args.walls, args.seed)
+        vacuum = [args.size // 2, args.size // 2, "N"]
+
+    started = time.perf_counter()
+    plan = plan_route(cleaning_space, obstruction_space, vacuum)
+    elapsed = time.perf_counter() - started
+    write_program(args.commands, plan["program"])
+    print(f"planned {len(plan['program'])} commands in {elapsed:.2f}s, {plan['cleaned']} dirty tiles cleaned, {len(plan['unreachable'])} unreachable")
+
+    sim = unexpected_obstruction.Simulation(cleaning_space, obstruction_space, vacuum)
+    run_compressed(sim, *compress_program(plan["program"]), vacuum)
+    print(f"after running it: {sim.dirty_count()} dirty tiles left, robot at {vacuum}")
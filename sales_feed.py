@@ -0,0 +1,301 @@
+"""
+this program collects sales from many department feeds at the same time and keeps
+a running sales report for every department, instead of waiting for one finished list.
+
+each feed is a stream of text lines in the form 'item,quantity,total' for one department.
+feeds can come from:
+- a tailed file that a till keeps appending to
+- a named pipe (fifo)
+- a local unix socket
+- any async iterator of lines (for example fake_feed, for testing)
+
+the feeds put parsed sales on a bounded queue and a validator folds them into the
+per department report state from not_my_dept. when validation falls behind the queue
+fills up and the feeds wait (backpressure) instead of buffering without limit.
+snapshots of the current reports can be taken at any time, or served over a unix socket.
+"""
+
+import asyncio
+import json
+
+from not_my_dept import add_sale_to_report, new_report_state, patch_item_price
+
+def new_sales_service(price, patch, queue_size=1000):
+  """
+  creates the state of the ingestion service
+
+  args:
+  - price (dict): base price list
+  - patch (dict): price update for each department (same format as generate_sales_reports)
+  - queue_size (int): how many parsed sales may wait for validation before feeds are paused
+
+  returns:
+  - dict: service state
+  """
+  return {
+    "price": price,
+    "patch": patch,
+    "queue_size": queue_size,
+    "queue": None,
+    "departments": {},
+    "malformed": {}
+  }
+
+def department_state(service, dep):
+  """
+  gets the running report of a department, creating it with the patched prices on first use
+
+  args:
+  - service (dict): service state
+  - dep (str): department name
+
+  returns:
+  - dict: running report state from new_report_state
+  """
+  if dep not in service["departments"]:
+    dep_price = dict(service["price"])
+    if dep in service["patch"]:
+      dep_price = patch_item_price(dep_price, service["patch"][dep])
+    service["departments"][dep] = new_report_state(dep_price)
+  return service["departments"][dep]
+
+def parse_sale_line(line):
+  """
+  turns a feed line 'item,quantity,total' into a sale record
+
+  args:
+  - line (str): one line from a feed
+
+  returns:
+  - list: [item_name, quantity, total], or None if the line is empty or malformed
+  """
+  parts = line.strip().split(",")
+  if len(parts) != 3:
+    return None
+  try:
+    return [parts[0].strip(), int(parts[1]), float(parts[2])]
+  except ValueError:
+    return None
+
+async def fake_feed(lines, delay=0.0):
+  """
+  feed made from a list of lines, for trying the service without real tills
+
+  args:
+  - lines (list): lines to emit
+  - delay (float): seconds to wait between lines
+  """
+  for line in lines:
+    if delay:
+      await asyncio.sleep(delay)
+    else:
+      await asyncio.sleep(0)
+    yield line
+
+async def stream_lines(reader):
+  """
+  yields decoded lines from an asyncio StreamReader until end of stream
+
+  args:
+  - reader (asyncio.StreamReader): stream to read
+  """
+  while True:
+    line = await reader.readline()
+    if not line:
+      break
+    yield line.decode()
+
+async def tail_file(path, poll=0.1, stop=None):
+  """
+  follows a file like 'tail -f', yielding lines as they are appended
+
+  args:
+  - path (str): file to follow
+  - poll (float): seconds to wait at end of file before checking again
+  - stop (asyncio.Event): when set, stops at the next end of file
+  """
+  with open(path, "r") as f:
+    pending = ""
+    while True:
+      chunk = f.readline()
+      if chunk:
+        pending += chunk
+        if pending.endswith("\n"):
+          yield pending
+          pending = ""
+        continue
+      if stop is not None and stop.is_set():
+        break
+      await asyncio.sleep(poll)
+    if pending:
+      yield pending
+
+async def read_pipe(path):
+  """
+  yields lines written to a named pipe until the writer closes it
+
+  args:
+  - path (str): path of the fifo
+  """
+  loop = asyncio.get_running_loop()
+  reader = asyncio.StreamReader()
+  # opening a fifo blocks until a writer shows up, so do it off the event loop
+  pipe = await asyncio.to_thread(open, path, "rb")
+  transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+  try:
+    async for line in stream_lines(reader):
+      yield line
+  finally:
+    transport.close()
+
+async def read_socket(path):
+  """
+  connects to a local unix socket and yields the lines it sends
+
+  args:
+  - path (str): path of the unix socket
+  """
+  reader, writer = await asyncio.open_unix_connection(path)
+  try:
+    async for line in stream_lines(reader):
+      yield line
+  finally:
+    writer.close()
+
+async def feed_department(service, dep, lines):
+  """
+  reads one department feed and queues its sales for validation,
+  waits while the queue is full
+
+  args:
+  - service (dict): service state
+  - dep (str): department name
+  - lines (async iterator): feed lines
+  """
+  department_state(service, dep)
+  queue = service["queue"]
+  async for line in lines:
+    if not line.strip():
+      continue
+    sale = parse_sale_line(line)
+    if sale is None:
+      service["malformed"][dep] = service["malformed"].get(dep, 0) + 1
+      continue
+    await queue.put((dep, sale))
+
+async def validate_sales(service):
+  """
+  takes queued sales and adds them to the running report of their department,
+  runs until cancelled
+
+  args:
+  - service (dict): service state
+  """
+  queue = service["queue"]
+  while True:
+    dep, sale = await queue.get()
+    add_sale_to_report(department_state(service, dep), sale)
+    queue.task_done()
+
+async def run_sales_service(service, feeds):
+  """
+  reads all department feeds at once and keeps the reports up to date,
+  returns when every feed has ended and all queued sales are validated
+
+  args:
+  - service (dict): service state
+  - feeds (list): (department name, async iterator of lines) pairs
+
+  returns:
+  - list: final snapshot, see report_snapshot
+  """
+  service["queue"] = asyncio.Queue(maxsize=service["queue_size"])
+  validator = asyncio.create_task(validate_sales(service))
+  try:
+    await asyncio.gather(*[feed_department(service, dep, lines) for dep, lines in feeds])
+    await service["queue"].join()
+  finally:
+    validator.cancel()
+    try:
+      await validator
+    except asyncio.CancelledError:
+      pass
+  return report_snapshot(service)
+
+def report_snapshot(service, dep=None):
+  """
+  copies the current reports, safe to keep while the service keeps running
+
+  args:
+  - service (dict): service state
+  - dep (str): only this department, or every department if None
+
+  returns:
+  - list: one entry per department as a tuple:
+    (department name, report data, invalid sales), like generate_sales_reports
+  """
+  names = sorted(service["departments"]) if dep is None else [dep]
+  snapshot = []
+  for name in names:
+    state = service["departments"].get(name)
+    if state is None:
+      continue
+    snapshot.append((name, dict(state["report"]), [list(x) for x in state["invalid"]]))
+  return snapshot
+
+async def serve_snapshots(service, path):
+  """
+  serves report snapshots on a unix socket, a client sends a department name
+  (or an empty line for all departments) and gets the snapshot back as one json line
+
+  args:
+  - service (dict): service state
+  - path (str): path of the unix socket to listen on
+
+  returns:
+  - asyncio.Server: the running server, close it when done
+  """
+  async def handle(reader, writer):
+    request = (await reader.readline()).decode().strip()
+    snapshot = report_snapshot(service, request or None)
+    writer.write((json.dumps(snapshot) + "\n").encode())
+    await writer.drain()
+    writer.close()
+
+  return await asyncio.start_unix_server(handle, path)
+
+# WARNING!!! *DO NOT* REMOVE THIS LINE
+# THIS ENSURES THAT THE CODE BELLOW ONLY RUNS WHEN YOU HIT THE GREEN `Run` BUTTON, AND NOT THE BLUE `Test` BUTTON
+if __name__ == "__main__":
+  """
+  main function to try the service with fake feeds:
+  - two departments stream their sales at different speeds
+  - the validator queue is kept small so the feeds are throttled
+  - prints the final report of each department
+  """
+  price = {
+    'apple': 8.91,
+    'car': 3.57,
+    'laptop': 2.91
+  }
+
+  patch = {
+    'evilDepartmnet': {
+      'car': 5.13
+    }
+  }
+
+  feeds = [
+    ('dep1', fake_feed(['apple,4,35.64', 'lapto,0,0.0', 'laptop,2,5.82'], delay=0.01)),
+    ('evilDepartmnet', fake_feed(['car,9,46.17', 'car,5,17.85', 'not a sale']))
+  ]
+
+  service = new_sales_service(price, patch, queue_size=2)
+  for dep_name, sales_report, invalid_sales in asyncio.run(run_sales_service(service, feeds)):
+    print("Sales Report:", dep_name)
+    for item_name in sales_report:
+      print(item_name, ":", sales_report[item_name])
+    print("Invalid Sales:")
+    for invalid in invalid_sales:
+      print(invalid)
+    print()
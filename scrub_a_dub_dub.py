@@ -23,6 +23,14 @@ special rules:
 - if the vacuum faces another robot, it turns left instead of moving forward
 """
 
+import multiprocessing
+
+import sim_core
+from action_log import ActionLogger
+from autonomous import Autopilot
+from robot_commands import command_source, expand_command
+from sim_core import SCRUB, get_new_position
+
 # initial grid: cleaning status
 cleaning_space = [
    [None, None, 'd', None, None], 
@@ -41,231 +49,549 @@ obstruction_space = [
    ['w', None, None, None, None], 
    [None, None, None, None, None]]
 
-def validate_bounds(n_row, n_col):
+def group_command_by_robot_no(command_file):
     """
-    checks if the given position is within the cleanup area
+    reads robot commands from a file and groups them by robot number
 
     args:
-    - n_row (int): row number to check
-    - n_col (int): column number to check
+    - command_file: path to command file, an open file or pipe, or any iterable of command lines
+      (read one line at a time, see robot_commands.command_source)
 
     returns:
-    - bool: True if the position is valid, False if it is out of bounds
+    - dict: keys are robot numbers, values are list of commands ('command*N' is expanded)
+    """
+    command = {}
+    for line in command_source(command_file):
+        if not line:
+            continue
+        command_split = line.split()
+        robot_no = int(command_split[0])
+        # a command may be repeated as 'command*N'
+        robot_commands = [name for command in command_split[1].split(",") for name in expand_command(command)]
+
+        if (robot_no in command):
+            command[robot_no] += robot_commands
+        else:
+            command[robot_no] = robot_commands
+
+    return command
+
+# a robot reads and changes tiles at most this many steps away in one action
+# (pushing a cat or slipping over water moves things two tiles ahead)
+FOOTPRINT = 2
+
+class Simulation(sim_core.Simulation):
+    """
+    one cleaning run with its own grids, robots and action logs, run by the shared engine with
+    the scrub rules (see sim_core), so any number of simulations can run in the same process
+    (the module level functions below use one simulation over the global grids)
     """
-    global cleaning_space
-    return n_row < len(cleaning_space) and n_col < len(cleaning_space[0]) and n_row >= 0 and n_col >= 0
 
-def get_new_position(n_row, n_col, robot_dir):
+    def __init__(self, cleaning_space, obstruction_space, vacuums=None):
+        """
+        args:
+        - cleaning_space (list): cleaning status grid, changed in place (pass a copy to keep the original)
+        - obstruction_space (list): obstruction status grid, changed in place
+        - vacuums (list): optional vacuum states, one for each robot, used when perform_cleaning gets none
+        """
+        super().__init__(cleaning_space, obstruction_space, None, SCRUB)
+        self.vacuums = vacuums
+        # actions performed by each robot in the last perform_cleaning call
+        self.actions = {}
+
+    def print_space(self, vacuums):
+        """
+        prints the grid, one character per tile
+
+        args:
+        - vacuums (list): list of vacuum states, one for each robot
+        """
+        for row_index, row in enumerate(self.cleaning_space):
+            for col_index, cell in enumerate(row):
+                if self.obstruction_space[row_index][col_index] is not None:
+                    print(self.obstruction_space[row_index][col_index], end='')
+                elif (row_index, col_index) in vacuums:
+                    print("r", end='')
+                elif cell:
+                    print(".", end='')
+                else:
+                    print(".", end='')
+            print()
+
+    def perform_cleaning(self, instructions, vacuums=None, logs=None, headless=False, stop=None):
+        """
+        execute robot movement from a command file and log each move
+
+        args:
+        - instructions: file path to instruction set, or any command source (see group_command_by_robot_no)
+        - vacuums (list): list of vacuum states, one for each robot, the simulation's own vacuums if None
+        - logs: paths to text log files for each robot, one action_log.ActionLogger for all robots
+          (left open, for binary logs with robot numbers), or None to only keep the actions in self.actions
+        - headless (bool): if True nothing is printed
+        - stop: optional function stop(sim, vacuum) called after every command with the robot
+          that just moved, when it returns True the run ends (see sim_core.all_clean)
+        """
+        if vacuums is None:
+            vacuums = self.vacuums
+        self.actions = {}
+        idx = 1
+        stopped = False
+
+        # the commands of one robot run before the next robot's, so all of them are read first
+        all_command = group_command_by_robot_no(instructions)
+
+        for robot_no, arr_robot_commands in all_command.items():
+            actions = self.actions.setdefault(robot_no, [])
+            logger = logs
+            if logs is not None and not isinstance(logs, ActionLogger):
+                logger = ActionLogger(logs[robot_no])
+
+            for command in arr_robot_commands:
+                if not headless:
+                    print("THIS ONE FOR ROBOT NO:", robot_no)
+                    self.print_space(vacuums)
+                idx += 1
+                perform = self.vacuum_action(vacuums[robot_no], command.strip())
+                actions.append(perform)
+
+                if logger is not None:
+                    logger.log(perform, robot_no, command.strip())
+                if stop is not None and stop(self, vacuums[robot_no]):
+                    stopped = True
+                    break
+            if logger is not logs:
+                logger.close()
+            if stopped:
+                break
+
+        if not headless:
+            print(vacuums)
+
+    def perform_cleaning_ticks(self, instructions, vacuums=None, logs=None, headless=False, stop=None):
+        """
+        execute robot movement from a command file with the robots taking turns:
+        every tick each robot performs its next command, in order of robot number,
+        so robots meet each other while they move instead of one after the other
+
+        args:
+        - instructions (str): file path to instruction set
+        - vacuums (list): list of vacuum states, one for each robot, the simulation's own vacuums if None
+        - logs: paths to log files for each robot, one action_log.ActionLogger for all robots, or None to only keep the actions in self.actions
+        - headless (bool): if True nothing is printed, otherwise the grid is printed after every tick
+        - stop: optional function stop(sim, vacuums) called after every tick with all the vacuums,
+          when it returns True the run ends (see sim_core.all_clean)
+
+        returns:
+        - int: number of ticks run
+        """
+        if vacuums is None:
+            vacuums = self.vacuums
+        return self.run_ticks(group_command_by_robot_no(instructions), vacuums, logs, headless, stop)
+
+    def perform_autonomous(self, vacuums=None, max_ticks=None, stop=None):
+        """
+        lets the robots clean without a command file, taking turns like perform_cleaning_ticks:
+        every robot keeps going after the nearest dirty tile it can reach (see autonomous)
+
+        args:
+        - vacuums (list): list of vacuum states, one for each robot, the simulation's own vacuums if None
+        - max_ticks (int): most ticks to run, None for no limit
+        - stop: optional function stop(sim, vacuums) called after every tick, the run ends when it returns True
+
+        returns:
+        - dict: "ticks", "performed" (one bytearray of action opcodes per robot), "dirty_left" and "stopped"
+        """
+        if vacuums is None:
+            vacuums = self.vacuums
+        return Autopilot(self, vacuums).run(max_ticks, stop)
+
+    def mark_robots(self, robots, vacuums):
+        """
+        puts an 'r' marker under every robot standing on an empty tile
+
+        args:
+        - robots (list): robot numbers
+        - vacuums (list): list of vacuum states, one for each robot
+        """
+        for robot_no in robots:
+            robot_row, robot_col = vacuums[robot_no][0], vacuums[robot_no][1]
+            if self.obstruction_space[robot_row][robot_col] is None:
+                self.obstruction_space[robot_row][robot_col] = "r"
+
+    def tick_robot(self, vacuum, command):
+        """
+        performs one robot's command for a tick
+
+        args:
+        - vacuum (list): robot state [row, col, direction]
+        - command (str): action to perform
+
+        returns:
+        - str: the final action taken
+        """
+        perform = self.vacuum_action(vacuum, command.strip())
+        # slipping off the grid skips placing the marker, put it back so the others still see the robot
+        if self.obstruction_space[vacuum[0]][vacuum[1]] is None:
+            self.obstruction_space[vacuum[0]][vacuum[1]] = "r"
+        return perform
+
+    def write_tick_logs(self, logs, all_command=None):
+        """
+        writes the actions of every robot to its log file
+
+        args:
+        - logs: paths to text log files for each robot, one action_log.ActionLogger for all robots
+          (the actions are written in tick order), or None
+        - all_command (dict): commands of each robot number, to mark bumped forward commands in binary logs
+        """
+        if isinstance(logs, ActionLogger):
+            # one action per robot per tick, in robot order, like run_ticks performed them
+            robots = sorted(self.actions)
+            for tick in range(max([len(actions) for actions in self.actions.values()], default=0)):
+                for robot_no in robots:
+                    if tick < len(self.actions[robot_no]):
+                        command = all_command[robot_no][tick].strip() if all_command is not None else None
+                        logs.log(self.actions[robot_no][tick], robot_no, command)
+        # logs are written at the end, thousands of robots would not fit in the open file limit
+        elif logs is not None:
+            for robot_no, actions in self.actions.items():
+                with open(logs[robot_no], "w") as fl:
+                    fl.write("".join([perform + "\n" for perform in actions]))
+
+    def perform_cleaning_parallel(self, instructions, vacuums=None, logs=None, workers=4):
+        """
+        runs a command file like perform_cleaning_ticks, on worker processes that each own a band
+        of rows of the grid (see run_ticks_parallel), nothing is printed
+
+        args:
+        - instructions (str): file path to instruction set
+        - vacuums (list): list of vacuum states, one for each robot, the simulation's own vacuums if None
+        - logs: paths to log files for each robot, one action_log.ActionLogger for all robots, or None to only keep the actions in self.actions
+        - workers (int): number of worker processes
+
+        returns:
+        - int: number of ticks run
+        """
+        if vacuums is None:
+            vacuums = self.vacuums
+        return self.run_ticks_parallel(group_command_by_robot_no(instructions), vacuums, workers, logs)
+
+    def run_ticks(self, all_command, vacuums, logs=None, headless=False, stop=None):
+        """
+        runs grouped commands round-robin, one command per robot per tick
+
+        robots meet through the 'r' markers of the obstruction space: a robot facing another
+        robot turns left (see vacuum_action). every robot is marked before the first tick so the
+        robots that have not moved yet are seen as well
+
+        args:
+        - all_command (dict): commands of each robot number, as from group_command_by_robot_no
+        - vacuums (list): list of vacuum states, one for each robot
+        - logs: paths to log files for each robot, one action_log.ActionLogger for all robots (one that
+          keeps the changed tiles gets every action as it is performed), or None
+        - headless (bool): if True nothing is printed
+        - stop: optional function stop(sim, vacuums) called after every tick, the run ends when it returns True
+
+        returns:
+        - int: number of ticks run
+        """
+        robots = sorted(all_command)
+        self.mark_robots(robots, vacuums)
+        # a log that keeps the changed tiles gets every action as it is performed, from the marked grids
+        keeps_tiles = isinstance(logs, ActionLogger) and logs.keeps_tiles
+        if keeps_tiles:
+            logs.snapshot()
+
+        # next command of each robot, robots drop out of the turn order when they run out
+        cursors = dict.fromkeys(robots, 0)
+        self.actions = {robot_no: [] for robot_no in robots}
+        active = [robot_no for robot_no in robots if all_command[robot_no]]
+        ticks = 0
+
+        while active:
+            still_active = []
+            for robot_no in active:
+                commands = all_command[robot_no]
+                perform = self.tick_robot(vacuums[robot_no], commands[cursors[robot_no]])
+                self.actions[robot_no].append(perform)
+                if keeps_tiles:
+                    logs.log(perform, robot_no, commands[cursors[robot_no]].strip())
+
+                cursors[robot_no] += 1
+                if cursors[robot_no] < len(commands):
+                    still_active.append(robot_no)
+            active = still_active
+            ticks += 1
+
+            if not headless:
+                print("TICK", ticks)
+                self.print_space(vacuums)
+            if stop is not None and stop(self, vacuums):
+                break
+
+        if not keeps_tiles:
+            self.write_tick_logs(logs, all_command)
+        if not headless:
+            print(vacuums)
+        return ticks
+
+    def run_ticks_parallel(self, all_command, vacuums, workers=4, logs=None):
+        """
+        runs grouped commands like run_ticks, with the grid split into bands of rows that are
+        each owned by a worker process, and ends in exactly the same state as run_ticks
+
+        a robot only reads and changes tiles within FOOTPRINT steps of where it starts the tick,
+        so two robots more than 2 * FOOTPRINT apart give the same result in either order. every tick:
+        - robots whose footprint lies inside one band go to that band's worker, which runs them
+          in robot order, in parallel with the other workers
+        - robots whose footprint crosses a band border are deferred, and so is every robot near
+          an earlier deferred robot (it has to act after it). after the workers report back, the
+          deferred robots run here in robot order, and the tiles they touched are sent to the
+          workers with the next tick
+        - a tick where a robot cleans a True tile (which clears the 'r' markers of the whole grid)
+          runs here completely, and the workers get fresh copies of their bands afterwards
+
+        nothing is printed. the bands only pay off with several cores and many robots per band,
+        a robot's action is cheap next to sending it to a worker
+
+        args:
+        - all_command (dict): commands of each robot number, as from group_command_by_robot_no
+        - vacuums (list): list of vacuum states, one for each robot
+        - workers (int): number of bands / worker processes
+        - logs: paths to log files for each robot, one action_log.ActionLogger for all robots that does
+          not keep the changed tiles, or None
+
+        returns:
+        - int: number of ticks run
+        """
+        if isinstance(logs, ActionLogger) and logs.keeps_tiles:
+            raise ValueError("the parallel ticks cannot keep the changed tiles in the log, use perform_cleaning_ticks")
+        cleaning_space, obstruction_space = self.cleaning_space, self.obstruction_space
+        n_rows, n_cols = len(cleaning_space), len(cleaning_space[0])
+        robots = sorted(all_command)
+        self.mark_robots(robots, vacuums)
+
+        height = -(-n_rows // max(1, workers))
+        bands = [(start, min(start + height, n_rows)) for start in range(0, n_rows, height)]
+        conns, procs = [], []
+        for start, stop in bands:
+            conn, child = multiprocessing.Pipe()
+            proc = multiprocessing.Process(
+                target=tile_worker,
+                args=(child, [list(row) for row in cleaning_space[start:stop]], [list(row) for row in obstruction_space[start:stop]]),
+                daemon=True
+            )
+            proc.start()
+            child.close()
+            conns.append(conn)
+            procs.append(proc)
+
+        cursors = dict.fromkeys(robots, 0)
+        self.actions = {robot_no: [] for robot_no in robots}
+        active = [robot_no for robot_no in robots if all_command[robot_no]]
+        # tiles changed here that the workers have not seen yet
+        patched = set()
+        ticks = 0
+
+        try:
+            while active:
+                commands = {robot_no: all_command[robot_no][cursors[robot_no]].strip() for robot_no in active}
+
+                if any([commands[robot_no] == "clean" and cleaning_space[vacuums[robot_no][0]][vacuums[robot_no][1]] is True for robot_no in active]):
+                    for robot_no in active:
+                        self.actions[robot_no].append(self.tick_robot(vacuums[robot_no], commands[robot_no]))
+                    for conn, (start, stop) in zip(conns, bands):
+                        conn.send(("reset", [list(row) for row in cleaning_space[start:stop]], [list(row) for row in obstruction_space[start:stop]]))
+                    patched = set()
+                else:
+                    jobs = [[] for _ in bands]
+                    deferred = []
+                    # deferred robot positions, bucketed so the nearby ones are found without a full scan
+                    buckets = {}
+                    reach = 2 * FOOTPRINT
+                    for robot_no in active:
+                        robot_row, robot_col, robot_dir = vacuums[robot_no]
+                        band = robot_row // height
+                        start, stop = bands[band]
+                        near = max(robot_row - FOOTPRINT, 0) < start or min(robot_row + FOOTPRINT, n_rows - 1) >= stop
+                        bucket_row, bucket_col = robot_row // (reach + 1), robot_col // (reach + 1)
+                        if buckets and not near:
+                            for other_row in range(bucket_row - 1, bucket_row + 2):
+                                for other_col in range(bucket_col - 1, bucket_col + 2):
+                                    for row, col in buckets.get((other_row, other_col), ()):
+                                        if abs(row - robot_row) <= reach and abs(col - robot_col) <= reach:
+                                            near = True
+                        if near:
+                            deferred.append(robot_no)
+                            buckets.setdefault((bucket_row, bucket_col), []).append((robot_row, robot_col))
+                        else:
+                            jobs[band].append((robot_no, [robot_row - start, robot_col, robot_dir], commands[robot_no]))
+
+                    patches = [[] for _ in bands]
+                    for row, col in patched:
+                        start = bands[row // height][0]
+                        patches[row // height].append((row - start, col, cleaning_space[row][col], obstruction_space[row][col]))
+                    patched = set()
+                    for conn, patch, band_jobs in zip(conns, patches, jobs):
+                        conn.send(("tick", patch, band_jobs))
+
+                    performed = {}
+                    for conn, (start, stop) in zip(conns, bands):
+                        results, cells = conn.recv()
+                        for robot_no, vacuum, perform in results:
+                            self.visit(vacuums[robot_no][0], vacuums[robot_no][1])
+                            vacuums[robot_no][0], vacuums[robot_no][1], vacuums[robot_no][2] = vacuum[0] + start, vacuum[1], vacuum[2]
+                            self.visit(vacuums[robot_no][0], vacuums[robot_no][1])
+                            performed[robot_no] = perform
+                        for row, col, cell, obstruction in cells:
+                            # through set_tile, so the tile counts stay right
+                            self.set_tile(row + start, col, cell)
+                            obstruction_space[row + start][col] = obstruction
+
+                    for robot_no in deferred:
+                        patched.update(action_tiles(vacuums[robot_no], commands[robot_no], n_rows, n_cols))
+                        performed[robot_no] = self.tick_robot(vacuums[robot_no], commands[robot_no])
+                    for robot_no in active:
+                        self.actions[robot_no].append(performed[robot_no])
+
+                still_active = []
+                for robot_no in active:
+                    cursors[robot_no] += 1
+                    if cursors[robot_no] < len(all_command[robot_no]):
+                        still_active.append(robot_no)
+                active = still_active
+                ticks += 1
+        finally:
+            for conn, proc in zip(conns, procs):
+                conn.send(("stop",))
+                conn.close()
+                proc.join()
+
+        self.write_tick_logs(logs, all_command)
+        return ticks
+
+def action_tiles(vacuum, command, n_rows, n_cols):
     """
-    calculate the new position of the robot based on direction
+    gets the tiles one action can change: the robot's own tile and, when moving forward,
+    the next two tiles ahead (the tile moved to, and where a pushed cat or a slip ends up)
 
     args:
-    - n_row, n_col (int): current coordinates
-    - robot_dir (str): one of "N", "NE", ..., "NW"
+    - vacuum (list): robot state [row, col, direction] before the action
+    - command (str): action to perform
+    - n_rows, n_cols (int): size of the grid
 
     returns:
-    - tuple: new (row, col) after moving one step in direction
+    - list: (row, col) of the tiles inside the grid
     """
-    match robot_dir:
-      case "N":
-          n_row -= 1
-      case "NE":
-          n_col += 1
-          n_row -= 1
-      case "E":
-          n_col += 1
-      case "SE":
-          n_col += 1
-          n_row += 1
-      case "S":
-          n_row += 1
-      case "SW":
-          n_col -= 1
-          n_row += 1
-      case "W":
-          n_col -= 1
-      case "NW":
-          n_row -= 1
-          n_col -= 1
-    return n_row, n_col
-
-def vacuum_action(vacuum, action):
+    tiles = [(vacuum[0], vacuum[1])]
+    if command.strip() == "forward":
+        n_row, n_col = vacuum[0], vacuum[1]
+        for _ in range(FOOTPRINT):
+            n_row, n_col = get_new_position(n_row, n_col, vacuum[2])
+            if 0 <= n_row < n_rows and 0 <= n_col < n_cols:
+                tiles.append((n_row, n_col))
+    return tiles
+
+def tile_worker(conn, cleaning_rows, obstruction_rows):
     """
-    makes the robot perform an action like move, turn, or clean
+    worker process of Simulation.run_ticks_parallel, owns one band of rows of the grid
+
+    messages from the coordinator:
+    - ("tick", patches, jobs): applies the patched tiles, runs the jobs (robot number, vacuum in
+      band coordinates, command) in order, and answers with the results of the robots and the
+      tiles they touched
+    - ("reset", cleaning_rows, obstruction_rows): replaces the band
+    - ("stop",): ends the worker
 
     args:
-    - vacuum (list): robot state [row, col, direction]
-    - action (str): action to perform ("turn-left", "turn-right", "forward", "clean")
+    - conn (Connection): pipe to the coordinator
+    - cleaning_rows, obstruction_rows (list): the band's rows of both grids
+    """
+    sim = Simulation(cleaning_rows, obstruction_rows)
+    while True:
+        message = conn.recv()
+        if message[0] == "stop":
+            break
+        if message[0] == "reset":
+            sim.cleaning_space, sim.obstruction_space = message[1], message[2]
+            continue
+
+        _, patches, jobs = message
+        for row, col, cell, obstruction in patches:
+            sim.cleaning_space[row][col] = cell
+            sim.obstruction_space[row][col] = obstruction
+
+        n_rows, n_cols = len(sim.cleaning_space), len(sim.cleaning_space[0])
+        results = []
+        # tiles the robots may change and what was on them, only the ones that did change are sent back
+        before = {}
+        for robot_no, vacuum, command in jobs:
+            for row, col in action_tiles(vacuum, command, n_rows, n_cols):
+                if (row, col) not in before:
+                    before[(row, col)] = (sim.cleaning_space[row][col], sim.obstruction_space[row][col])
+            results.append((robot_no, vacuum, sim.tick_robot(vacuum, command)))
+        cells = []
+        for (row, col), (cell, obstruction) in before.items():
+            if sim.cleaning_space[row][col] != cell or sim.obstruction_space[row][col] != obstruction:
+                cells.append((row, col, sim.cleaning_space[row][col], sim.obstruction_space[row][col]))
+        conn.send((results, cells))
+    conn.close()
+
+# simulation behind the module level functions, it always works on the global grids above
+module_sim = None
+
+def module_simulation():
+    """
+    gets the simulation that works on the module's cleaning_space and obstruction_space
 
     returns:
-    - str: the final action taken (may change due to obstacles)
+    - Simulation: the shared simulation, pointed at the current global grids
     """
-    global cleaning_space
-    global obstruction_space
-
-    robot_row, robot_col, robot_dir = vacuum
-    obstruction_space[robot_row][robot_col] = None  # temporarily remove robot from current cell
-    n_row, n_col = robot_row, robot_col
-
-    # list of possible directions
-    all_dir = ["N","NE","E","SE","S","SW","W","NW"]
-    final_action = ""
-
-    # process the action (turn-left, turn-right, clean, forward)
-    match action:
-        # turn the robot 90 degrees left from its current direction
-        case "turn-left":
-            robot_dir = all_dir[((all_dir.index(robot_dir)-1) % len(all_dir))] 
-            final_action = action
-        # turn the robot 90 degrees right from its current direction
-        case "turn-right":
-            robot_dir = all_dir[((all_dir.index(robot_dir)+1) % len(all_dir))] 
-            final_action = action
-        # clean the current tile
-        case "clean":
-            match (cleaning_space[robot_row][robot_col]):
-                case True:
-                    # full cleaning: remove robot from all spots
-                    for i in range (len(obstruction_space)):
-                        for j in range (len(obstruction_space[i])):
-                            if obstruction_space[i][j] == "r":
-                                obstruction_space[i][j] = None
-                    cleaning_space[robot_row][robot_col] = None
-                case "l":
-                    cleaning_space[robot_row][robot_col] = "l"
-                case "d":
-                    cleaning_space[robot_row][robot_col] = None
-            final_action = action
-        # move forward
-        case "forward":
-            n_row, n_col = get_new_position(n_row, n_col, robot_dir)
-            if validate_bounds(n_row, n_col):
-                match obstruction_space[n_row][n_col]:
-                    # if a cat is in the way, move the cat ahead and turn right
-                    case "c":
-                        cat_row, cat_col = get_new_position(n_row, n_col, robot_dir)
-                        if (validate_bounds(cat_row, cat_col) and obstruction_space[cat_row][cat_col] == None):
-                            obstruction_space[n_row][n_col] = None
-                            obstruction_space[cat_row][cat_col] = "c"
-                        # if blocked, turn right
-                        robot_dir = all_dir[((all_dir.index(robot_dir)+1) % len(all_dir))]
-                        final_action = "turn-right"
-                    # if there's a wall, turn right
-                    case "w":
-                        robot_dir = all_dir[((all_dir.index(robot_dir)+1) % len(all_dir))]
-                        final_action = "turn-right"
-                    
-                    # if encounteres another robot, turn left
-                    case "r":
-                        robot_dir = all_dir[((all_dir.index(robot_dir)-1) % len(all_dir))]
-                        final_action = "turn-left"
-                    case None:
-                        match (cleaning_space[robot_row][robot_col]):
-                            case "d":
-                                match cleaning_space[n_row][n_col]: 
-                                    case None:
-                                        cleaning_space[n_row][n_col] = "d"
-                                    case "l":
-                                        cleaning_space[n_row][n_col] = "m"
-                            case "l":
-                                # the vacuum is on water, slips and moves 2 positions
-                                old_row, old_col = n_row, n_col
-                                n_row, n_col = get_new_position(n_row, n_col, robot_dir)
-                                if not validate_bounds(n_row, n_col):
-                                    robot_dir = all_dir[((all_dir.index(robot_dir)+1) % len(all_dir))]
-                                    final_action = "turn-right"
-                                    vacuum[0] = robot_row
-                                    vacuum[1] = robot_col
-                                    vacuum[2] = robot_dir
-                                    return final_action
-                                else: 
-                                    match (cleaning_space[n_row][n_col]):
-                                        case None:
-                                            cleaning_space[old_row][old_col] = "l"
-                                        case "d": 
-                                            cleaning_space[old_row][old_col] = "m"
-                                        case "l":
-                                            cleaning_space[old_row][old_col] = "l"
-                            # if vacuum is on mud, spread mud to the nexr tile
-                            case "m":
-                                cleaning_space[n_row][n_col] = "m"
-                        robot_row, robot_col = n_row, n_col
-                        final_action = "forward"
-            else:
-                # move invalid, turn right
-                robot_dir = all_dir[((all_dir.index(robot_dir)+1) % len(all_dir))]
-                final_action = "turn-right"
+    global module_sim
 
-    # update vacuum state and place robot again
-    vacuum[0] = robot_row
-    vacuum[1] = robot_col
-    vacuum[2] = robot_dir
-    obstruction_space[robot_row][robot_col] = "r"
-    return final_action
+    if module_sim is None:
+        module_sim = Simulation(cleaning_space, obstruction_space)
+    module_sim.cleaning_space = cleaning_space
+    module_sim.obstruction_space = obstruction_space
+    # the globals may have been edited in place since the last call
+    module_sim.forget_indexes()
+    return module_sim
 
-def group_command_by_robot_no(command_file):
+def validate_bounds(n_row, n_col):
     """
-    reads robot commands from a file and groups them by robot number
-
-    args:
-    - command_file (str): path to command file
+    checks if the given position is within the global cleaning_space (see Simulation.validate_bounds)
+    """
+    return module_simulation().validate_bounds(n_row, n_col)
 
-    returns:
-    - dict: keys are robot numbers, values are list of commands
+def vacuum_action(vacuum, action):
     """
-    command = {}
-    f = open(command_file, "r")
-    for line in f.readlines():
-        command_split = line.split()
-        robot_no, robot_commands = int(command_split[0]), command_split[1].split(",")
+    performs an action on the global grids (see Simulation.vacuum_action)
+    """
+    return module_simulation().vacuum_action(vacuum, action)
 
-        if (robot_no in command):
-            command[robot_no] += robot_commands
-        else:
-            command[robot_no] = robot_commands
+def perform_cleaning(instructions, vacuums, logs, headless=False, stop=None):
+    """
+    runs a command file on the global grids (see Simulation.perform_cleaning)
+    """
+    module_simulation().perform_cleaning(instructions, vacuums, logs, headless, stop)
 
-    return command
+def perform_cleaning_ticks(instructions, vacuums, logs, headless=False, stop=None):
+    """
+    runs a command file on the global grids, robots taking turns (see Simulation.perform_cleaning_ticks)
+    """
+    return module_simulation().perform_cleaning_ticks(instructions, vacuums, logs, headless, stop)
 
-def perform_cleaning(instructions, vacuums, logs):
+def perform_autonomous(vacuums, max_ticks=None, stop=None):
+    """
+    lets the robots clean the global grids on their own (see Simulation.perform_autonomous)
     """
-    execute robot movement from a command file and log each move
+    return module_simulation().perform_autonomous(vacuums, max_ticks, stop)
 
-    args:
-    - instructions (str): file path to instruction set
-    - vacuums (list): list of vacuum states, one for each robot
-    - logs (list): paths to log files for each robot
+def perform_cleaning_parallel(instructions, vacuums, logs, workers=4):
+    """
+    runs a command file on the global grids with worker processes (see Simulation.perform_cleaning_parallel)
     """
-    f = open(instructions, "r")
-    idx = 1
-    
-    all_command = group_command_by_robot_no(instructions)
-
-    for robot_no, arr_robot_commands in all_command.items():
-        open(logs[robot_no], 'w').close()
-        fl = open(logs[robot_no], 'a')
-
-        for command in arr_robot_commands:
-            print("THIS ONE FOR ROBOT NO:", robot_no)
-            for row_index, row in enumerate(cleaning_space):
-                for col_index, cell in enumerate(row):
-                    if obstruction_space[row_index][col_index] is not None:
-                        print(obstruction_space[row_index][col_index], end='')
-                    elif (row_index, col_index) in vacuums:
-                        print("r", end='')
-                    elif cell:
-                        print(".", end='')
-                    else:
-                        print(".", end='')
-                print()
-            idx += 1
-            perform = vacuum_action(vacuums[robot_no], command.strip()) 
-
-            fl.write(perform + '\n')
-        fl.close()
-
-    print(vacuums)
-
-    f.close()
+    return module_simulation().perform_cleaning_parallel(instructions, vacuums, logs, workers)
 
 # WARNING!!! *DO NOT* REMOVE THIS LINE
 # THIS ENSURES THAT THE CODE BELOW ONLY RUNS WHEN YOU HIT THE GREEN `Run` BUTTON, AND NOT THE BLUE `Test` BUTTON
@@ -0,0 +1,903 @@
+"""
+this program is the engine behind the four robot simulators, so moving, turning, cleaning and
+the fast paths are written once instead of in every simulator
+
+what differs between the simulators is kept in a rule set, chosen when a simulation is created:
+- PLAIN: robot_revolution, a grid of True (clean) and False (dirty) without obstructions
+- OBSTACLES: unexpected_obstruction, adds walls ('w'), cats ('c') that get pushed and a robot marker ('r')
+- STICKY: sticky_businness, dirt ('d'), water ('l'), mud ('m') and soap ('s') follow the tile rules
+- SCRUB: scrub_a_dub_dub, sticky tiles with many robots, each keeping its own marker
+
+the simulator modules subclass Simulation with their rule set and keep their own
+module level grids and functions
+"""
+
+from collections import Counter
+from itertools import chain
+
+from action_log import ActionLogger
+from autonomous import Autopilot
+from checkpoints import Checkpoints
+from dirt_index import DirtIndex
+from grid_render import render_step
+from robot_commands import (
+    DELTA_COL, DELTA_ROW, DIR_INDEX, DIRECTIONS, OP_CLEAN, OP_FORWARD, OP_NOOP, OP_TURN_LEFT, OP_TURN_RIGHT,
+    command_source, compile_commands, compile_runs, expand_runs, run_compressed, steps_in_bounds, write_action_log
+)
+from grids import CLEANING_VALUES
+from tile_rules import EDGE_CODE, KEEP, N_CODES, N_TARGETS, OTHER_CODE, STICKY_TABLE, TILE_CODE, forward_index
+
+# rule sets
+# - obstacles: the simulation has an obstruction space
+# - floor: "smear" (leaving a dirty (False) tile dirties the next one) or a compiled tile_rules table
+# - clean_to: what clean leaves on the tile
+# - clean_only: the tiles clean works on, None for every tile
+# - robot_ahead: action when facing a robot marker, "" (stay) or "turn-left"
+# - markers: None, "index" (one robot, markers kept in the occupancy index) or
+#   "own" (each robot lifts its own marker and puts it back, for many robots)
+# - echo: when vacuum_action prints the vacuum, None, "always" or "slip" (slipping against the edge)
+PLAIN = {
+    "name": "plain",
+    "obstacles": False,
+    "floor": "smear",
+    "clean_to": True,
+    "clean_only": None,
+    "robot_ahead": "",
+    "markers": None,
+    "echo": None
+}
+OBSTACLES = dict(PLAIN, name="obstacles", obstacles=True, markers="index", echo="always")
+STICKY = dict(OBSTACLES, name="sticky", floor=STICKY_TABLE, clean_to=None, echo="slip")
+SCRUB = dict(STICKY, name="scrub", clean_only=(True, "d"), robot_ahead="turn-left", markers="own", echo=None)
+
+RULE_SETS = {rules["name"]: rules for rules in (PLAIN, OBSTACLES, STICKY, SCRUB)}
+
+# list of possible directions, clockwise
+ALL_DIR = ["N", "NE", "E", "SE", "S", "SW", "W", "NW"]
+
+def get_new_position(n_row, n_col, robot_dir):
+    """
+    calculate the new position of the robot based on direction
+
+    args:
+    - n_row, n_col (int): current coordinates
+    - robot_dir (str): one of "N", "NE", ..., "NW"
+
+    returns:
+    - tuple: new (row, col) after moving one step in direction
+    """
+    match robot_dir:
+      case "N":
+          n_row -= 1
+      case "NE":
+          n_col += 1
+          n_row -= 1
+      case "E":
+          n_col += 1
+      case "SE":
+          n_col += 1
+          n_row += 1
+      case "S":
+          n_row += 1
+      case "SW":
+          n_col -= 1
+          n_row += 1
+      case "W":
+          n_col -= 1
+      case "NW":
+          n_row -= 1
+          n_col -= 1
+    return n_row, n_col
+
+def turn(robot_dir, step):
+    """
+    args:
+    - robot_dir (str): current direction
+    - step (int): -1 to turn left, 1 to turn right
+
+    returns:
+    - str: the new direction
+    """
+    return ALL_DIR[(ALL_DIR.index(robot_dir) + step) % len(ALL_DIR)]
+
+def dirt_values(rules):
+    """
+    args:
+    - rules (dict): a rule set
+
+    returns:
+    - set: the tile values clean turns into a clean tile (True or None), the dirt a robot goes after
+    """
+    clean_only = rules["clean_only"]
+    return {
+        value for value in CLEANING_VALUES
+        if value is not None and value is not True and (clean_only is None or value in clean_only)
+    }
+
+def all_clean(sim, vacuum=None):
+    """
+    stop condition for perform_cleaning, ends the run once the whole cleaning space is clean
+
+    args:
+    - sim: the simulation
+    - vacuum (list): state of the robot, not used
+
+    returns:
+    - bool: True when every tile is clean (True or None)
+    """
+    return sim.is_clean()
+
+class Simulation:
+    """
+    one cleaning run with its own grids, robot(s), rule set and action log,
+    so any number of simulations can run in the same process
+    """
+
+    def __init__(self, cleaning_space, obstruction_space=None, vacuum=None, rules=PLAIN):
+        """
+        args:
+        - cleaning_space (list): the cleaning space grid, changed in place (pass a copy to keep the original)
+        - obstruction_space (list): the obstruction space grid, changed in place, None for the plain rules
+        - vacuum (list): optional robot state [row, column, direction], used when perform_cleaning gets none
+        - rules (dict): rule set, PLAIN, OBSTACLES, STICKY or SCRUB
+        """
+        self.cleaning_space = cleaning_space
+        self.obstruction_space = obstruction_space
+        self.vacuum = vacuum
+        self.rules = rules
+        # actions performed in the last perform_cleaning call
+        self.actions = []
+        # index of the robot ('r') and cat ('c') cells of the obstruction space, so moving the robot
+        # only touches the cells that change instead of scanning the whole grid (used by the "index" markers)
+        # it is rebuilt with one scan whenever the obstruction space is replaced by another grid or
+        # forgotten (see forget_indexes), and when a robot cell it lists turns out to hold something else
+        self.occupancy = {"grid": None, "robots": set(), "cats": set()}
+        # how many tiles of the cleaning space hold every value, and which tiles (row * columns + col)
+        # a robot has stood on, kept up to date by every action so completion and coverage checks need
+        # no scan. the counts are only taken the first time a check asks for them (see get_counts),
+        # so running on a huge grid never reads the tiles the robots do not touch.
+        # like the occupancy index they start over when the cleaning space is replaced by another grid,
+        # forget_indexes() only drops the counts, rebuild_tallies() starts the visited tiles over too
+        self.tallies = {"grid": None, "counts": None, "visited": set()}
+        # spatial index of the dirty tiles (see dirt_index), only built when something asks for it
+        # (the autonomous mode), from then on every tile write keeps it up to date
+        self.dirt_index = None
+
+    def rebuild_occupancy(self):
+        """
+        scans the obstruction space once and rebuilds the occupancy index from it
+        """
+        robots = set()
+        cats = set()
+        if hasattr(self.obstruction_space, "positions"):
+            # packed grids can find the markers without going through every tile
+            robots.update(self.obstruction_space.positions("r"))
+            cats.update(self.obstruction_space.positions("c"))
+        else:
+            for i in range(len(self.obstruction_space)):
+                for j in range(len(self.obstruction_space[i])):
+                    if self.obstruction_space[i][j] == "r":
+                        robots.add((i, j))
+                    elif self.obstruction_space[i][j] == "c":
+                        cats.add((i, j))
+
+        self.occupancy["grid"] = self.obstruction_space
+        self.occupancy["robots"] = robots
+        self.occupancy["cats"] = cats
+
+    def forget_indexes(self):
+        """
+        drops the occupancy index, the tile counts and the dirt index, so they are taken again from
+        the grids the next time they are needed. for grids that may have been edited in place since
+        the last action, like the module level grids between two calls of the module functions
+        """
+        self.occupancy["grid"] = None
+        self.tallies["counts"] = None
+        self.dirt_index = None
+
+    def get_occupancy(self):
+        """
+        gets the occupancy index of the obstruction space
+
+        returns:
+        - dict: "robots" and "cats" are sets of (row, col) positions
+        """
+        if self.occupancy["grid"] is not self.obstruction_space:
+            self.rebuild_occupancy()
+        return self.occupancy
+
+    def clear_robots(self):
+        """
+        removes every robot marker from the obstruction space, touching only the indexed cells
+        (the "own" markers are not indexed, there the whole grid is scanned)
+        """
+        if self.rules["markers"] == "own":
+            for i in range(len(self.obstruction_space)):
+                for j in range(len(self.obstruction_space[i])):
+                    if self.obstruction_space[i][j] == "r":
+                        self.obstruction_space[i][j] = None
+            return
+
+        robots = self.get_occupancy()["robots"]
+        if any(self.obstruction_space[i][j] != "r" for i, j in robots):
+            # the grid was edited in place behind the index, it may hold markers the index misses
+            self.rebuild_occupancy()
+            robots = self.occupancy["robots"]
+        for i, j in robots:
+            self.obstruction_space[i][j] = None
+        robots.clear()
+
+    def place_robot(self, n_row, n_col):
+        """
+        puts the robot marker on a cell and records it in the index
+
+        args:
+        - n_row (int): row of the robot
+        - n_col (int): column of the robot
+        """
+        if self.rules["markers"] == "own":
+            self.obstruction_space[n_row][n_col] = "r"
+            return
+
+        index = self.get_occupancy()
+        if self.obstruction_space[n_row][n_col] == "c":
+            index["cats"].discard((n_row, n_col))
+        self.obstruction_space[n_row][n_col] = "r"
+        index["robots"].add((n_row, n_col))
+
+    def move_cat(self, cat_row, cat_col, n_row, n_col):
+        """
+        moves a cat to a new cell and records it in the index
+
+        args:
+        - cat_row, cat_col (int): current position of the cat
+        - n_row, n_col (int): where the cat goes
+        """
+        self.obstruction_space[cat_row][cat_col] = None
+        self.obstruction_space[n_row][n_col] = "c"
+        if self.rules["markers"] != "own":
+            cats = self.get_occupancy()["cats"]
+            cats.discard((cat_row, cat_col))
+            cats.add((n_row, n_col))
+
+    def rebuild_tallies(self):
+        """
+        starts the tallies over for the current cleaning space, the tile counts are taken again
+        when they are next asked for and no tile is visited yet
+        """
+        self.tallies["grid"] = self.cleaning_space
+        self.tallies["counts"] = None
+        self.tallies["visited"] = set()
+
+    def get_tallies(self):
+        """
+        gets the tallies of the cleaning space, without counting its tiles
+
+        returns:
+        - dict: "counts" (Counter of tile values, None until get_counts is called) and
+          "visited" (set of the tiles a robot stood on, as row * columns + col)
+        """
+        if self.tallies["grid"] is not self.cleaning_space:
+            self.rebuild_tallies()
+        return self.tallies
+
+    def get_counts(self):
+        """
+        gets the tile counts of the cleaning space, counting the tiles the first time.
+        packed and sparse grids count them from their own storage instead of tile by tile
+
+        returns:
+        - Counter: number of tiles holding every value
+        """
+        tallies = self.get_tallies()
+        if tallies["counts"] is None:
+            grid = self.cleaning_space
+            tallies["counts"] = grid.counts() if hasattr(grid, "counts") else Counter(chain.from_iterable(grid))
+        return tallies["counts"]
+
+    def set_tile(self, n_row, n_col, value):
+        """
+        changes one tile of the cleaning space and its count
+
+        args:
+        - n_row, n_col (int): position of the tile
+        - value: new value of the tile
+        """
+        counts = self.get_tallies()["counts"]
+        if counts is not None:
+            counts[self.cleaning_space[n_row][n_col]] -= 1
+            counts[value] += 1
+        self.cleaning_space[n_row][n_col] = value
+        if self.dirt_index is not None and self.dirt_index.grid is self.cleaning_space:
+            self.dirt_index.update(n_row, n_col, value)
+
+    def visit(self, n_row, n_col):
+        """
+        records that a robot stood on a tile
+
+        args:
+        - n_row, n_col (int): position of the tile
+        """
+        self.get_tallies()["visited"].add(n_row * len(self.cleaning_space[0]) + n_col)
+
+    def tile_count(self, value):
+        """
+        args:
+        - value: a tile value, like False, 'd' or 'l'
+
+        returns:
+        - int: number of tiles of the cleaning space holding it
+        """
+        return self.get_counts()[value]
+
+    def dirty_count(self):
+        """
+        returns:
+        - int: number of tiles that are not clean (anything but True or None)
+        """
+        counts = self.get_counts()
+        return len(self.cleaning_space) * len(self.cleaning_space[0]) - counts[None] - counts[True]
+
+    def is_clean(self):
+        """
+        returns:
+        - bool: True when every tile of the cleaning space is clean (True or None)
+        """
+        return self.dirty_count() == 0
+
+    def coverage(self):
+        """
+        returns:
+        - float: share of the tiles a robot has stood on, from 0 to 1
+        """
+        return len(self.get_tallies()["visited"]) / (len(self.cleaning_space) * len(self.cleaning_space[0]))
+
+    def get_dirt_index(self):
+        """
+        gets the spatial index of the dirty tiles, built with one scan the first time
+        and again when the cleaning space is replaced by another grid
+
+        returns:
+        - DirtIndex: index of the tiles holding dirt (see dirt_values)
+        """
+        if self.dirt_index is None or self.dirt_index.grid is not self.cleaning_space:
+            self.dirt_index = DirtIndex.from_grid(self.cleaning_space, dirt_values(self.rules))
+        return self.dirt_index
+
+    def validate_bounds(self, n_row, n_col):
+        """
+        checks if the given position is within the cleanup area
+
+        args:
+        - n_row (int): row number to check
+        - n_col (int): column number to check
+
+        returns:
+        - bool: True if the position is valid, False if it is out of bounds
+        """
+        return n_row < len(self.cleaning_space) and n_col < len(self.cleaning_space[0]) and n_row >= 0 and n_col >= 0
+
+    def vacuum_action(self, vacuum, action, echo=True):
+        """
+        makes the robot perform an action like move, turn, or clean
+
+        args:
+        - vacuum (list): the current state of the robot as [row, column, direction]
+        - action (str): the option robot should do ('turn-left', 'turn-right', 'clean', 'forward')
+        - echo (bool): print the vacuum state when the rule set asks for it (turned off in headless mode)
+
+        returns:
+        - str: the actual action the robot ended performing
+        """
+        rules = self.rules
+        grid = self.cleaning_space
+        obst = self.obstruction_space
+        robot_row, robot_col, robot_dir = vacuum
+        n_row, n_col = robot_row, robot_col
+        self.visit(robot_row, robot_col)
+        if rules["markers"] == "own":
+            obst[robot_row][robot_col] = None  # temporarily remove robot from current cell
+
+        final_action = ""
+
+        # process the action (turn-left, turn-right, clean, forward)
+        match action:
+            # turn the robot 90 degrees left from its current direction
+            case "turn-left":
+                robot_dir = turn(robot_dir, -1)
+                final_action = action
+            # turn the robot 90 degrees right from its current direction
+            case "turn-right":
+                robot_dir = turn(robot_dir, 1)
+                final_action = action
+            # clean the current tile
+            case "clean":
+                cell = grid[robot_row][robot_col]
+                if rules["markers"] is not None and cell == True:
+                    # full cleaning: remove robot from all spots
+                    self.clear_robots()
+                if rules["clean_only"] is None or cell in rules["clean_only"]:
+                    self.set_tile(robot_row, robot_col, rules["clean_to"])
+                final_action = action
+            # move forward
+            case "forward":
+                n_row, n_col = get_new_position(n_row, n_col, robot_dir)
+                if not self.validate_bounds(n_row, n_col):
+                    # if the move goes out of bounds, turn right
+                    robot_dir = turn(robot_dir, 1)
+                    final_action = "turn-right"
+                else:
+                    blocker = obst[n_row][n_col] if rules["obstacles"] else None
+                    if blocker == "c":
+                        # if a cat is in the way, move the cat ahead and turn right
+                        cat_row, cat_col = get_new_position(n_row, n_col, robot_dir)
+                        if self.validate_bounds(cat_row, cat_col) and obst[cat_row][cat_col] == None:
+                            self.move_cat(n_row, n_col, cat_row, cat_col)
+                        robot_dir = turn(robot_dir, 1)
+                        final_action = "turn-right"
+                    elif blocker == "w":
+                        # if there's a wall, turn right
+                        robot_dir = turn(robot_dir, 1)
+                        final_action = "turn-right"
+                    elif blocker == "r" and rules["robot_ahead"] == "turn-left":
+                        # if encounteres another robot, turn left
+                        robot_dir = turn(robot_dir, -1)
+                        final_action = "turn-left"
+                    elif blocker is None:
+                        if rules["floor"] == "smear":
+                            if grid[robot_row][robot_col] == False:
+                                self.set_tile(n_row, n_col, False)
+                        else:
+                            # what the step does to the floor comes from the tile rules (see tile_rules)
+                            cur_code = TILE_CODE.get(grid[robot_row][robot_col], OTHER_CODE)
+                            target_code = 0
+                            if rules["floor"]["needs_target"][cur_code]:
+                                slip_row, slip_col = get_new_position(n_row, n_col, robot_dir)
+                                if self.validate_bounds(slip_row, slip_col):
+                                    target_code = TILE_CODE.get(grid[slip_row][slip_col], OTHER_CODE)
+                                else:
+                                    target_code = EDGE_CODE
+                            next_code = TILE_CODE.get(grid[n_row][n_col], OTHER_CODE)
+                            written, moved = rules["floor"]["table"][forward_index(cur_code, next_code, target_code)]
+
+                            if moved == 0:
+                                # the robot would slip out of bounds, it turns right and stays,
+                                # its marker is not put back
+                                robot_dir = turn(robot_dir, 1)
+                                vacuum[0] = robot_row
+                                vacuum[1] = robot_col
+                                vacuum[2] = robot_dir
+                                if echo and rules["echo"] == "slip":
+                                    print(vacuum)
+                                return "turn-right"
+                            if written != KEEP:
+                                self.set_tile(n_row, n_col, written)
+                            if moved == 2:
+                                n_row, n_col = slip_row, slip_col
+                        robot_row, robot_col = n_row, n_col
+                        self.visit(robot_row, robot_col)
+                        final_action = "forward"
+
+        # update the vacuum position and direction after the action
+        vacuum[0] = robot_row
+        vacuum[1] = robot_col
+        vacuum[2] = robot_dir
+
+        if echo and rules["echo"] == "always":
+            print((vacuum))
+        # place the robot marker again, only the old and the new cell are touched
+        if rules["markers"] == "index":
+            self.clear_robots()
+            self.place_robot(robot_row, robot_col)
+        elif rules["markers"] == "own":
+            obst[robot_row][robot_col] = "r"
+        return final_action
+
+    def perform_cleaning(self, instructions, vacuum=None, log=None, headless=False, renderer=None, stop=None):
+        """
+        reads instructions from a file,
+        moves the robot step by step, and keeps track of each move
+
+        args:
+        - instructions: path to a text file with commands for the robot, an open file or pipe,
+          or any iterable of commands, read one command at a time (see robot_commands.command_source)
+        - vacuum (list): the robot's starting position and direction in [row, column, direction] format,
+          the simulation's own vacuum if None
+        - log: file path to write the robot's actual actions as text, an action_log.ActionLogger
+          (left open, for binary logs), or None for no log file
+        - headless (bool): if True nothing is printed
+        - renderer (dict): optional renderer from grid_render.new_renderer, used instead of
+          printing the whole grid before every command
+        - stop: optional function stop(sim, vacuum) called after every command, when it returns True
+          the run ends without reading the rest of the commands (see all_clean)
+
+        returns:
+        - dict: "steps" (commands processed), "actions" (actions actually performed), "vacuum" (final state)
+          and "stopped" (True if stop ended the run)
+        """
+        if vacuum is None:
+            vacuum = self.vacuum
+        quiet = headless or renderer is not None
+        actions = []
+        self.actions = actions
+
+        logger = log
+        if isinstance(log, str):
+            logger = ActionLogger(log)
+
+        commands = command_source(instructions)
+
+        if renderer is not None:
+            render_step(renderer, 0, self.cleaning_space, self.obstruction_space, vacuum)
+
+        idx = 1
+        stopped = False
+        for command in commands:
+            if quiet:
+                idx += 1
+                # robot markers are cleared wherever they are, let the renderer look at them too
+                markers = ()
+                if renderer is not None and self.obstruction_space is not None:
+                    markers = tuple(self.get_occupancy()["robots"])
+                perform = self.vacuum_action(vacuum, command, echo=False)
+                actions.append(perform)
+                if logger is not None:
+                    logger.log(perform, command=command)
+                if renderer is not None:
+                    render_step(renderer, idx - 1, self.cleaning_space, self.obstruction_space, vacuum, markers)
+            else:
+                print("PROCESS ", idx)
+                obst = self.obstruction_space
+                for row_index, row in enumerate(self.cleaning_space):
+                    for col_index, cell in enumerate(row):
+                        # the plain rules have no obstruction space, only the robot and the tiles are shown
+                        if obst is not None and obst[row_index][col_index] is not None:
+                            print(obst[row_index][col_index], end='')
+                        elif (row_index, col_index) == (vacuum[0], vacuum[1]):
+                            print("r", end='')
+                        elif cell:
+                            print(".", end='')
+                        else:
+                            print(".", end='')
+                    print()
+                idx += 1
+                perform = self.vacuum_action(vacuum, command)
+                actions.append(perform)
+                if logger is not None:
+                    logger.log(perform, command=command)
+
+            if stop is not None and stop(self, vacuum):
+                stopped = True
+                break
+
+        commands.close()
+        if logger is not log:
+            logger.close()
+
+        return {"steps": idx - 1, "actions": actions, "vacuum": list(vacuum), "stopped": stopped}
+
+    def run_program(self, program, vacuum):
+        """
+        runs a compiled program (see robot_commands.compile_commands) on the vacuum,
+        gives the same grids and actions as calling vacuum_action for every command
+        but does not print anything
+
+        args:
+        - program (array): opcodes to run
+        - vacuum (list): the robot's starting state as [row, column, direction], updated in place
+
+        returns:
+        - bytearray: opcode of the action the robot actually performed for every command
+        """
+        rules = self.rules
+        grid = self.cleaning_space
+        obst = self.obstruction_space
+        n_rows, n_cols = len(grid), len(grid[0])
+        obstacles = rules["obstacles"]
+        markers = rules["markers"]
+        cats = self.get_occupancy()["cats"] if markers == "index" else None
+        smear = rules["floor"] == "smear"
+        if not smear:
+            table, needs_target, plain = rules["floor"]["table"], rules["floor"]["needs_target"], rules["floor"]["plain"]
+        tile_code = TILE_CODE.get
+        clean_to, clean_only = rules["clean_to"], rules["clean_only"]
+        turn_left_at_robot = rules["robot_ahead"] == "turn-left"
+        robot_row, robot_col = vacuum[0], vacuum[1]
+        robot_dir = DIR_INDEX[vacuum[2]]
+        # cell holding the robot marker, -1 until the first step drops any old markers
+        mark_row = mark_col = -1
+        performed = bytearray(len(program))
+        tallies = self.get_tallies()
+        counts, visited = tallies["counts"], tallies["visited"]
+        # the dirt index is only kept up to date while it belongs to this grid
+        dirt = self.dirt_index if self.dirt_index is not None and self.dirt_index.grid is grid else None
+        if len(program):
+            visited.add(robot_row * n_cols + robot_col)
+            if markers == "own":
+                # the first action lifts the robot's own marker
+                obst[robot_row][robot_col] = None
+
+        for step, op in enumerate(program):
+            if op == OP_FORWARD:
+                n_row = robot_row + DELTA_ROW[robot_dir]
+                n_col = robot_col + DELTA_COL[robot_dir]
+                if 0 <= n_row < n_rows and 0 <= n_col < n_cols:
+                    blocker = obst[n_row][n_col] if obstacles else None
+                    if blocker is None:
+                        if smear:
+                            if grid[robot_row][robot_col] == False:
+                                if counts is not None:
+                                    counts[grid[n_row][n_col]] -= 1
+                                    counts[False] += 1
+                                grid[n_row][n_col] = False
+                                if dirt is not None:
+                                    dirt.add(n_row, n_col)
+                        else:
+                            # one lookup in the tile rules, the index is forward_index(cur, next, target),
+                            # leaving a plain tile (a clean one) needs no lookup at all
+                            cur_code = tile_code(grid[robot_row][robot_col], OTHER_CODE)
+                            if not plain[cur_code]:
+                                target_code = 0
+                                if needs_target[cur_code]:
+                                    s_row = n_row + DELTA_ROW[robot_dir]
+                                    s_col = n_col + DELTA_COL[robot_dir]
+                                    if 0 <= s_row < n_rows and 0 <= s_col < n_cols:
+                                        target_code = tile_code(grid[s_row][s_col], OTHER_CODE)
+                                    else:
+                                        target_code = EDGE_CODE
+                                written, moved = table[(cur_code * N_CODES + tile_code(grid[n_row][n_col], OTHER_CODE)) * N_TARGETS + target_code]
+                                if moved == 0:
+                                    # vacuum_action returns early here, the robot marker is not put back
+                                    robot_dir = (robot_dir + 1) & 7
+                                    performed[step] = OP_TURN_RIGHT
+                                    if markers == "own" and mark_row >= 0:
+                                        obst[mark_row][mark_col] = None
+                                        mark_row = mark_col = -1
+                                    continue
+                                if written != KEEP:
+                                    if counts is not None:
+                                        counts[grid[n_row][n_col]] -= 1
+                                        counts[written] += 1
+                                    grid[n_row][n_col] = written
+                                    if dirt is not None:
+                                        dirt.update(n_row, n_col, written)
+                                if moved == 2:
+                                    # the vacuum slips over the next tile and lands one further
+                                    n_row, n_col = s_row, s_col
+                                    if cats is not None and obst[n_row][n_col] == "c":
+                                        # landing on a cat replaces it with the robot
+                                        cats.discard((n_row, n_col))
+                        robot_row, robot_col = n_row, n_col
+                        visited.add(robot_row * n_cols + robot_col)
+                        performed[step] = OP_FORWARD
+                    elif blocker == "c":
+                        cat_row = n_row + DELTA_ROW[robot_dir]
+                        cat_col = n_col + DELTA_COL[robot_dir]
+                        if 0 <= cat_row < n_rows and 0 <= cat_col < n_cols and obst[cat_row][cat_col] == None:
+                            self.move_cat(n_row, n_col, cat_row, cat_col)
+                        robot_dir = (robot_dir + 1) & 7
+                        performed[step] = OP_TURN_RIGHT
+                    elif blocker == "w":
+                        robot_dir = (robot_dir + 1) & 7
+                        performed[step] = OP_TURN_RIGHT
+                    elif blocker == "r" and turn_left_at_robot:
+                        robot_dir = (robot_dir - 1) & 7
+                        performed[step] = OP_TURN_LEFT
+                    else:
+                        performed[step] = OP_NOOP
+                else:
+                    robot_dir = (robot_dir + 1) & 7
+                    performed[step] = OP_TURN_RIGHT
+            elif op == OP_TURN_RIGHT:
+                robot_dir = (robot_dir + 1) & 7
+                performed[step] = OP_TURN_RIGHT
+            elif op == OP_TURN_LEFT:
+                robot_dir = (robot_dir - 1) & 7
+                performed[step] = OP_TURN_LEFT
+            elif op == OP_CLEAN:
+                cell = grid[robot_row][robot_col]
+                if markers == "own" and cell == True:
+                    # clears the markers of every robot, this one is put back below
+                    self.clear_robots()
+                    mark_row = mark_col = -1
+                if clean_only is None or cell in clean_only:
+                    if counts is not None:
+                        counts[cell] -= 1
+                        counts[clean_to] += 1
+                    grid[robot_row][robot_col] = clean_to
+                    if dirt is not None:
+                        dirt.discard(robot_row, robot_col)
+                performed[step] = OP_CLEAN
+            else:
+                performed[step] = OP_NOOP
+
+            # move the robot marker, the index is brought up to date after the loop
+            if markers is not None and (robot_row != mark_row or robot_col != mark_col):
+                if mark_row < 0:
+                    if markers == "index":
+                        self.clear_robots()
+                    self.place_robot(robot_row, robot_col)
+                else:
+                    obst[mark_row][mark_col] = None
+                    obst[robot_row][robot_col] = "r"
+                mark_row, mark_col = robot_row, robot_col
+
+        if markers == "index" and mark_row >= 0:
+            robots = self.get_occupancy()["robots"]
+            robots.clear()
+            robots.add((mark_row, mark_col))
+
+        vacuum[0] = robot_row
+        vacuum[1] = robot_col
+        vacuum[2] = DIRECTIONS[robot_dir]
+        return performed
+
+    def forward_run(self, vacuum, count):
+        """
+        moves the robot up to count steps straight ahead in one call, changing the floor like
+        single forward steps do. it stops before the first wall, cat, robot or the edge of the grid
+        and on the first tile where the robot would slip, a single forward step handles that one
+
+        args:
+        - vacuum (list): the robot's state as [row, column, direction], updated in place
+        - count (int): most steps to take
+
+        returns:
+        - int: steps taken
+        """
+        rules = self.rules
+        grid = self.cleaning_space
+        obst = self.obstruction_space if rules["obstacles"] else None
+        robot_row, robot_col = vacuum[0], vacuum[1]
+        robot_dir = DIR_INDEX[vacuum[2]]
+        d_row, d_col = DELTA_ROW[robot_dir], DELTA_COL[robot_dir]
+        count = min(count, steps_in_bounds(robot_row, robot_col, robot_dir, len(grid), len(grid[0])))
+
+        row, col = robot_row, robot_col
+        steps = 0
+        tallies = self.get_tallies()
+        counts, visited = tallies["counts"], tallies["visited"]
+        dirt = self.dirt_index if self.dirt_index is not None and self.dirt_index.grid is grid else None
+        n_cols = len(grid[0])
+        if rules["floor"] == "smear":
+            # once the robot stands on a dirty tile every tile after it gets dirty
+            smear = grid[robot_row][robot_col] == False
+            while steps < count:
+                if obst is not None and obst[row + d_row][col + d_col] is not None:
+                    break
+                row += d_row
+                col += d_col
+                if smear:
+                    if counts is not None:
+                        counts[grid[row][col]] -= 1
+                        counts[False] += 1
+                    grid[row][col] = False
+                    if dirt is not None:
+                        dirt.add(row, col)
+                elif grid[row][col] == False:
+                    smear = True
+                visited.add(row * n_cols + col)
+                steps += 1
+        else:
+            table, needs_target, tile_code = rules["floor"]["table"], rules["floor"]["needs_target"], TILE_CODE.get
+            while steps < count:
+                cur_code = tile_code(grid[row][col], OTHER_CODE)
+                if needs_target[cur_code] or (obst is not None and obst[row + d_row][col + d_col] is not None):
+                    break
+                written, moved = table[(cur_code * N_CODES + tile_code(grid[row + d_row][col + d_col], OTHER_CODE)) * N_TARGETS]
+                if moved != 1:
+                    break
+                row += d_row
+                col += d_col
+                if written != KEEP:
+                    if counts is not None:
+                        counts[grid[row][col]] -= 1
+                        counts[written] += 1
+                    grid[row][col] = written
+                    if dirt is not None:
+                        dirt.update(row, col, written)
+                visited.add(row * n_cols + col)
+                steps += 1
+
+        if steps:
+            self.visit(robot_row, robot_col)
+            if rules["markers"] == "index":
+                # the marker of the first step of a program also drops any old markers
+                self.clear_robots()
+                self.place_robot(row, col)
+            elif rules["markers"] == "own":
+                self.obstruction_space[robot_row][robot_col] = None
+                self.place_robot(row, col)
+            vacuum[0], vacuum[1] = row, col
+        return steps
+
+    def perform_cleaning_compiled(self, instructions, vacuum=None, log=None):
+        """
+        same as perform_cleaning, but compiles the file first and runs the opcodes
+        without printing the grid on every step
+
+        args:
+        - instructions (str): path to a text file with commands for the robot
+        - vacuum (list): the robot's starting position and direction in [row, column, direction] format,
+          the simulation's own vacuum if None
+        - log: file path to write the robot's actual actions as text, an action_log.ActionLogger
+          (left open, for binary logs), or None for no log file
+
+        returns:
+        - bytearray: opcode of the action the robot actually performed for every command
+        """
+        if vacuum is None:
+            vacuum = self.vacuum
+        if isinstance(log, ActionLogger) and log.keeps_tiles:
+            raise ValueError("perform_cleaning_compiled cannot keep the changed tiles in the log, use perform_cleaning")
+        program = compile_commands(instructions)
+        performed = self.run_program(program, vacuum)
+        if isinstance(log, ActionLogger):
+            log.log_program(performed, program)
+        elif log is not None:
+            write_action_log(log, performed)
+        return performed
+
+    def perform_cleaning_runs(self, instructions, vacuum=None, log=None):
+        """
+        same as perform_cleaning_compiled, but keeps the commands as runs (see robot_commands.run_compressed),
+        which is much faster for files with long runs of the same command like 'forward*500'
+
+        args:
+        - instructions (str): path to a text file with commands for the robot, plain or compressed
+        - vacuum (list): the robot's starting position and direction in [row, column, direction] format,
+          the simulation's own vacuum if None
+        - log: file path to write the robot's actual actions as text, an action_log.ActionLogger
+          (left open, for binary logs), or None for no log file
+
+        returns:
+        - bytearray: opcode of the action the robot actually performed for every command
+        """
+        if vacuum is None:
+            vacuum = self.vacuum
+        if isinstance(log, ActionLogger) and log.keeps_tiles:
+            raise ValueError("perform_cleaning_runs cannot keep the changed tiles in the log, use perform_cleaning")
+        with open(instructions, "r") as f:
+            ops, counts = compile_runs(f)
+        performed = run_compressed(self, ops, counts, vacuum)
+        if isinstance(log, ActionLogger):
+            log.log_program(performed, expand_runs(ops, counts))
+        elif log is not None:
+            write_action_log(log, performed)
+        return performed
+
+    def perform_cleaning_checkpointed(self, instructions, vacuum=None, interval=1000, keep=None):
+        """
+        same as perform_cleaning_compiled, but records keyframes and per step deltas, so the state
+        at any step can be looked at afterwards (see checkpoints)
+
+        args:
+        - instructions (str): path to a text file with commands for the robot
+        - vacuum (list): the robot's starting position and direction in [row, column, direction] format,
+          the simulation's own vacuum if None
+        - interval (int): steps between keyframes
+        - keep (int): keyframes kept, None to keep every keyframe
+
+        returns:
+        - Checkpoints: the recording, see Checkpoints.state_at
+        """
+        checkpoints = Checkpoints(self, vacuum, interval, keep)
+        checkpoints.perform_cleaning(instructions)
+        return checkpoints
+
+    def perform_autonomous(self, vacuum=None, max_ticks=None, stop=None):
+        """
+        lets the robot clean without a command file, it keeps going after the nearest dirty tile
+        it can reach until there is none left (see autonomous)
+
+        args:
+        - vacuum (list): the robot's starting position and direction in [row, column, direction] format,
+          the simulation's own vacuum if None
+        - max_ticks (int): most actions to perform, None for no limit
+        - stop: optional function stop(sim, vacuums) called after every action, the run ends when it returns True
+
+        returns:
+        - dict: "ticks" (actions performed), "performed" (bytearray of the robot's action opcodes, in a list),
+          "dirty_left" (dirty tiles left) and "stopped" (True if stop or max_ticks ended the run)
+        """
+        return Autopilot(self, [vacuum if vacuum is not None else self.vacuum]).run(max_ticks, stop)
@@ -0,0 +1,115 @@
+"""
+this program keeps what moving forward does to the floor of sticky_businness and
+scrub_a_dub_dub as a table of rules, instead of nested match statements in every simulator
+
+a rule looks at three tiles of the cleaning space along the robot's direction:
+- the tile under the robot
+- the next tile, which the robot moves onto (it has no obstruction, those are handled before)
+- the tile after that, where the robot lands when it slips (EDGE when it is outside the grid)
+
+and says what is written on the next tile and how many tiles the robot moves:
+- 1: a normal step
+- 2: the robot slips over the next tile
+- 0: the robot would slip out of the grid, it turns right instead and stays where it is
+
+the rules are compiled into one flat list indexed by the codes of the three tiles, so a step
+is a single lookup. a new kind of tile only needs new rules (and a code in grids.CLEANING_VALUES)
+"""
+
+from grids import CLEANING_VALUES
+
+# rule patterns and results
+ANY = "any"
+EDGE = "edge"
+KEEP = "keep"
+
+# (tile under the robot, next tile, tile after it) -> (written on the next tile, tiles moved)
+# the first rule that matches is used, no match means a normal step that changes nothing
+STICKY_RULES = (
+    # dirt is smeared onto the next tile, turning water into mud
+    (("d", None, ANY), ("d", 1)),
+    (("d", "l", ANY), ("m", 1)),
+    # the vacuum slips on water, what is left behind depends on where it lands
+    (("l", ANY, EDGE), (KEEP, 0)),
+    (("l", ANY, None), ("l", 2)),
+    (("l", ANY, "d"), ("m", 2)),
+    (("l", ANY, "l"), ("l", 2)),
+    (("l", ANY, ANY), (KEEP, 2)),
+    # mud is smeared onto the next tile
+    (("m", ANY, ANY), ("m", 1)),
+)
+
+# code of every tile value, anything unknown gets OTHER_CODE and the slip target outside the grid EDGE_CODE
+TILE_CODE = {value: code for code, value in enumerate(CLEANING_VALUES)}
+OTHER_CODE = len(CLEANING_VALUES)
+EDGE_CODE = OTHER_CODE + 1
+N_CODES = OTHER_CODE + 1
+N_TARGETS = EDGE_CODE + 1
+
+def matches(pattern, value):
+    """
+    checks one tile against a rule pattern
+
+    args:
+    - pattern: ANY, EDGE or a tile value
+    - value: tile value, EDGE, or OTHER_CODE for an unknown tile
+
+    returns:
+    - bool: True if the pattern accepts the tile
+    """
+    if pattern == ANY:
+        return True
+    # True == 1 and False == 0, so None / True / False are compared by identity
+    if pattern is None or pattern is True or pattern is False:
+        return pattern is value
+    return type(value) is str and pattern == value
+
+def compile_forward_rules(rules):
+    """
+    compiles rules into a lookup table
+
+    args:
+    - rules (tuple): ((tile, next tile, tile after), (written, tiles moved)) pairs, see STICKY_RULES
+
+    returns:
+    - dict: "table" is a list of (written, tiles moved) indexed by forward_index,
+      "needs_target" says for every tile code whether its rules look at the tile after the next one,
+      "plain" says for every tile code whether leaving it is always a normal step that changes nothing
+    """
+    values = CLEANING_VALUES + (OTHER_CODE,)
+    targets = values + (EDGE,)
+    table = [(KEEP, 1)] * (N_CODES * N_CODES * N_TARGETS)
+    needs_target = [False] * N_CODES
+
+    for cur_code, cur in enumerate(values):
+        for next_code, nxt in enumerate(values):
+            for target_code, target in enumerate(targets):
+                for (cur_pattern, next_pattern, target_pattern), result in rules:
+                    if matches(cur_pattern, cur) and matches(next_pattern, nxt) and matches(target_pattern, target):
+                        table[forward_index(cur_code, next_code, target_code)] = result
+                        break
+
+    for (cur_pattern, next_pattern, target_pattern), result in rules:
+        if target_pattern != ANY:
+            for cur_code, cur in enumerate(values):
+                if matches(cur_pattern, cur):
+                    needs_target[cur_code] = True
+
+    plain = [
+        all([table[forward_index(cur_code, next_code, target_code)] == (KEEP, 1) for next_code in range(N_CODES) for target_code in range(N_TARGETS)])
+        for cur_code in range(N_CODES)
+    ]
+    return {"table": table, "needs_target": needs_target, "plain": plain}
+
+def forward_index(cur_code, next_code, target_code):
+    """
+    args:
+    - cur_code, next_code (int): codes of the tile under the robot and the next tile
+    - target_code (int): code of the tile after that, 0 when the rules do not look at it
+
+    returns:
+    - int: position of the rule result in the compiled table
+    """
+    return (cur_code * N_CODES + next_code) * N_TARGETS + target_code
+
+STICKY_TABLE = compile_forward_rules(STICKY_RULES)
@@ -13,6 +13,9 @@ the vacuum is also able to:
 the program will update and print the grid after each command the robot receives
 """
 
+import sim_core
+from sim_core import OBSTACLES, get_new_position
+
 # the cleaning space grid (True = clean, False = dirty)
 cleaning_space = [
     [True, True, True, True, True, True, True],
@@ -58,180 +61,95 @@ obstruction_space = [
 #     [None, None, None]
 # ]
 
-def validate_bounds(n_row,n_col):
+class Simulation(sim_core.Simulation):
     """
-    checks if the given position is within the cleanup area
-
-    args:
-    - n_row (int): row number to check
-    - n_col (int): column number to check
-
-    returns:
-   -  bool: True if the position is valid, False if it is out of bounds
+    one cleaning run with its own grids, robot and action log, run by the shared engine with
+    the obstacle rules (see sim_core), so any number of simulations can run in the same process
+    (the module level functions below use one simulation over the global grids)
     """
-    global cleaning_space
-    
-    return n_row < len(cleaning_space) and n_col < len(cleaning_space[0]) and n_row >= 0 and n_col >= 0
 
-def get_new_position(n_row, n_col, robot_dir):
-    """
-    calculate where the robot will move next based on its current direction
+    def __init__(self, cleaning_space, obstruction_space, vacuum=None):
+        """
+        args:
+        - cleaning_space (list): the cleaning space grid, changed in place (pass a copy to keep the original)
+        - obstruction_space (list): the obstruction space grid, changed in place
+        - vacuum (list): optional robot state [row, column, direction], used when perform_cleaning gets none
+        """
+        super().__init__(cleaning_space, obstruction_space, vacuum, OBSTACLES)
 
-    args:
-    - row (int): the robot's current row
-    - col (int): the robot's current column
-    - direction (str): the direction it's facing
+# simulation behind the module level functions, it always works on the global grids above
+module_sim = None
 
-    returns:
-    - tuple: the updated row / col position after moving one step
+def module_simulation():
     """
-    match robot_dir:
-      case "N":
-          n_row -= 1
-      case "NE":
-          n_col += 1
-          n_row -= 1
-      case "E":
-          n_col += 1
-      case "SE":
-          n_col += 1
-          n_row += 1
-      case "S":
-          n_row += 1
-      case "SW":
-          n_col -= 1
-          n_row += 1
-      case "W":
-          n_col -= 1
-      case "NW":
-          n_row -= 1
-          n_col -= 1
-    return n_row, n_col
+    gets the simulation that works on the module's cleaning_space and obstruction_space
 
-def vacuum_action(vacuum, action):
+    returns:
+    - Simulation: the shared simulation, pointed at the current global grids
     """
-    makes the robot perform an action like move, turn, or clean
+    global module_sim
 
-    args:
-    - vacuum (list): the current state of the robot as [row, column, direction]
-    - action (str): the option robot should do ('turn left', 'turn right', 'clean', 'forward'
+    if module_sim is None:
+        module_sim = Simulation(cleaning_space, obstruction_space)
+    module_sim.cleaning_space = cleaning_space
+    module_sim.obstruction_space = obstruction_space
+    # the globals may have been edited in place since the last call
+    module_sim.forget_indexes()
+    return module_sim
 
-    result:
-    -  str: the actual action the robot ended performing
+def rebuild_occupancy():
     """
-    global cleaning_space
-    global obstruction_space
-
-    robot_row, robot_col, robot_dir = vacuum
-    n_row, n_col = robot_row, robot_col
-
-    # list of possible directions
-    all_dir = ["N","NE","E","SE","S","SW","W","NW"]
-
-    final_action = ""
-
-    # process the action (turn-left, turn-right, clean, forward)
-    match action:
-        # turn the robot 90 degrees left from its current direction
-        case "turn-left":
-            robot_dir = all_dir[((all_dir.index(robot_dir)-1) % len(all_dir))]
-            final_action = action
-        # turn the robot 90 degrees right from its current direction
-        case "turn-right":
-            robot_dir = all_dir[((all_dir.index(robot_dir)+1) % len(all_dir))]
-            final_action = action
-        # clean the current tile
-        case "clean":
-            if(cleaning_space[robot_row][robot_col] == True):
-                for i in range (len(obstruction_space)):
-                  for j in range (len(obstruction_space[i])):
-                    if obstruction_space[i][j] == "r":
-                        obstruction_space[i][j] = None
-
-            cleaning_space[robot_row][robot_col] = True
-            final_action = action
-        #move forward
-        case "forward":
-            n_row, n_col = get_new_position(n_row, n_col, robot_dir)
-            if validate_bounds(n_row, n_col):
-              match obstruction_space[n_row][n_col]:
-                  # if a cat is in the way, move the cat ahead and turn right
-                  case "c":
-                    cat_row, cat_col = get_new_position(n_row, n_col, robot_dir)
-                    if (validate_bounds(cat_row, cat_col) and obstruction_space[cat_row][cat_col] == None):
-                      obstruction_space[n_row][n_col] = None
-                      obstruction_space[cat_row][cat_col] = "c"
-                      
-                    robot_dir = all_dir[((all_dir.index(robot_dir)+1) % len(all_dir))]
-                    final_action = "turn-right"
-                        
-                  # if there's a wall, turn right
-                  case "w":
-                    robot_dir = all_dir[((all_dir.index(robot_dir)+1) % len(all_dir))]
-                    final_action = "turn-right"
-                 # proceed to move if new position is clear  
-                  case None:
-                    if (cleaning_space[robot_row][robot_col] == False):
-                      cleaning_space[n_row][n_col] = False
-                    robot_row, robot_col = n_row,n_col
-                    final_action = "forward"
-            else:
-                # if the move goes out of bounds, turn right
-                robot_dir = all_dir[((all_dir.index(robot_dir)+1) % len(all_dir))]
-                final_action = "turn-right"
+    rebuilds the occupancy index of the global obstruction_space (see Simulation.rebuild_occupancy)
+    """
+    module_simulation().rebuild_occupancy()
 
-    # update the vacuum position and direction after the action
-    vacuum[0] = robot_row
-    vacuum[1] = robot_col
-    vacuum[2] = robot_dir
+def get_occupancy():
+    """
+    gets the occupancy index of the global obstruction_space (see Simulation.get_occupancy)
+    """
+    return module_simulation().get_occupancy()
 
-    print((vacuum))
-    for i in range (len(obstruction_space)):
-      for j in range (len(obstruction_space[i])):
-        if obstruction_space[i][j] == "r":
-            obstruction_space[i][j] = None
+def validate_bounds(n_row,n_col):
+    """
+    checks if the given position is within the global cleaning_space (see Simulation.validate_bounds)
+    """
+    return module_simulation().validate_bounds(n_row, n_col)
 
-    obstruction_space[robot_row][robot_col] = "r"
+def vacuum_action(vacuum, action, echo=True):
+    """
+    performs an action on the global grids (see Simulation.vacuum_action)
+    """
+    return module_simulation().vacuum_action(vacuum, action, echo)
 
-    # print(cleaning_space)
-    # print(obstruction_space)
-    return final_action
+def perform_cleaning(instructions, vacuum, log, headless=False, renderer=None, stop=None):
+    """
+    runs a command file on the global grids (see Simulation.perform_cleaning)
+    """
+    return module_simulation().perform_cleaning(instructions, vacuum, log, headless, renderer, stop)
 
-def perform_cleaning(instructions, vacuum, log):
+def run_program(program, vacuum):
     """
-    reads instructions from a file, 
-    moves the robot step by step, and keeps track of each move
-    
-    args:
-    - instructions (str): path to a text file with commands for the robot
-    - vacuum (list): the robot's starting position and direction in [row, column, direction] format
-    - log (str): file path to write the robot's actual actions
+    runs a compiled program on the global grids (see Simulation.run_program)
     """
-    open(log, 'w').close()
+    return module_simulation().run_program(program, vacuum)
 
-    f = open(instructions, "r")
-    fl = open(log, 'a')
+def perform_cleaning_compiled(instructions, vacuum, log):
+    """
+    runs a compiled command file on the global grids (see Simulation.perform_cleaning_compiled)
+    """
+    return module_simulation().perform_cleaning_compiled(instructions, vacuum, log)
 
-    idx = 1
-    for line in f.readlines():
-        print("PROCESS ", idx)
-        for row_index,row in enumerate(cleaning_space):
-          for col_index,cell in enumerate(row):
-              if obstruction_space[row_index][col_index] is not None:
-                  print(obstruction_space[row_index][col_index],end='')
-              elif (row_index,col_index) == (vacuum[0],vacuum[1]):
-                  print("r",end='')
-              elif cell:
-                  print(".",end='')
-              else:
-                  print(".",end='')
-          print()
-        idx += 1
-        perform = vacuum_action(vacuum, line.strip())  
-        fl.write(perform + '\n')
+def perform_cleaning_runs(instructions, vacuum, log):
+    """
+    runs a command file as runs on the global grids (see Simulation.perform_cleaning_runs)
+    """
+    return module_simulation().perform_cleaning_runs(instructions, vacuum, log)
 
-    f.close()
-    fl.close()
+def perform_autonomous(vacuum, max_ticks=None, stop=None):
+    """
+    lets the robot clean the global grids on its own (see Simulation.perform_autonomous)
+    """
+    return module_simulation().perform_autonomous(vacuum, max_ticks, stop)
 
 # WARNING!!! *DO NOT* REMOVE THIS LINE
 # THIS ENSURES THAT THE CODE BELLOW ONLY RUNS WHEN YOU HIT THE GREEN `Run` BUTTON, AND NOT THE BLUE `Test` BUTTON